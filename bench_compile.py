@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark evaluating one formula over many parameter values.
+
+Compares, per evaluation:
+
+- text:        substituting the values into the expression text and calling
+               CalculatorCLI.parse_expression (distinct values miss the
+               expression cache, so every call is parsed)
+- interpreted: the cached bytecode of calculator_expr run with a variables
+               mapping, through the Calculator methods
+- compiled:    Calculator.compile, recording history
+- no history:  Calculator.compile(..., history=False)
+"""
+
+import argparse
+import random
+import time
+
+import calculator_expr
+from calculator import Calculator
+from calculator_cli import CalculatorCLI
+
+FORMULAS = ['sqrt(x^2 + y^2)', 'log(x, 2) * sin(y) + x / (y + 1)']
+
+
+def text(formula, points):
+    cli = CalculatorCLI(interactive=False, calculator=Calculator(history_capacity=1000))
+    parse_expression = cli.parse_expression
+    for x, y in points:
+        parse_expression(formula.replace('x', repr(x)).replace('y', repr(y)))
+
+
+def interpreted(formula, points):
+    calc = Calculator(history_capacity=1000)
+    evaluate = calculator_expr.compile_expression(formula).evaluate
+    for x, y in points:
+        evaluate(calc, {'x': x, 'y': y})
+
+
+def compiled(formula, points):
+    function = Calculator(history_capacity=1000).compile(formula, params=['x', 'y'])
+    for x, y in points:
+        function(x, y)
+
+
+def no_history(formula, points):
+    function = Calculator().compile(formula, params=['x', 'y'], history=False)
+    for x, y in points:
+        function(x, y)
+
+
+VARIANTS = {'text': text, 'interpreted': interpreted, 'compiled': compiled,
+            'no history': no_history}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    rng = random.Random(1)
+    points = [(rng.uniform(1, 100), rng.uniform(1, 100)) for _ in range(args.points)]
+    for formula in FORMULAS:
+        print(formula)
+        best = {}
+        for _ in range(args.repeat):
+            for name, func in VARIANTS.items():
+                calculator_expr.clear_cache()
+                # The text variant is slow enough that a tenth of the points suffices
+                sample = points[:len(points) // 10] if name == 'text' else points
+                start = time.perf_counter()
+                func(formula, sample)
+                elapsed = (time.perf_counter() - start) / len(sample)
+                best[name] = min(best.get(name, elapsed), elapsed)
+        for name, seconds in best.items():
+            print(f"  {name:12} {seconds * 1e9:9.0f} ns/eval {best['interpreted'] / seconds:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for daemon-backed CLI calls.
+
+Compares, per call:
+
+- bare:      `python -c pass`, interpreter startup alone
+- cold:      `python calc.py <expr>`, a fresh interpreter evaluating locally
+- daemon:    `python calc.py --daemon <expr>`, a fresh interpreter running
+             the thin client against a warm daemon
+- daemon -S: the same without the site module, which the client does not need
+- request:   one request/response round trip from an already running
+             process, i.e. what a client without interpreter startup (a shell
+             builtin, an editor plugin, a long-lived script) pays
+
+The daemon runs on a private socket in a temporary directory and is stopped
+at the end. Process calls still pay interpreter startup; the daemon only
+removes the calculator's own import and setup cost from each call.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from calculator_client import request, spawn_daemon
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXPRESSION = '5 + 3 * 2'
+
+
+def _environment(socket_path):
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = HERE
+    env['CALCULATOR_SOCKET'] = socket_path
+    return env
+
+
+def time_process(args, runs, env):
+    """Wall-clock seconds of each of runs interpreter invocations."""
+    command = [sys.executable] + args
+    subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)  # warm the caches
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def time_requests(path, runs):
+    """Seconds of each of runs in-process round trips to the daemon."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        request([EXPRESSION], path, spawn=False)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _percentile(times, fraction):
+    times = sorted(times)
+    return times[min(int(len(times) * fraction), len(times) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=30, help="process calls per variant")
+    parser.add_argument('--requests', type=int, default=2000, help="in-process round trips")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'calculator.sock')
+        env = _environment(path)
+        spawn_daemon(path)
+        try:
+            script = os.path.join(HERE, 'calc.py')
+            results = {
+                'bare': time_process(['-c', 'pass'], args.runs, env),
+                'cold': time_process([script, EXPRESSION], args.runs, env),
+                'daemon': time_process([script, '--daemon', EXPRESSION], args.runs, env),
+                'daemon -S': time_process(['-S', script, '--daemon', EXPRESSION], args.runs, env),
+                'request': time_requests(path, args.requests),
+            }
+        finally:
+            request([':shutdown'], path, spawn=False)
+    
+    print(f"{'variant':10} {'p50 ms':>9} {'p99 ms':>9} {'best ms':>9}")
+    for name, times in results.items():
+        print(f"{name:10} {statistics.median(times) * 1e3:9.3f} "
+              f"{_percentile(times, 0.99) * 1e3:9.3f} {min(times) * 1e3:9.3f}")
+    bare = min(results['bare'])
+    print("\nBest-case time above bare startup:")
+    for name in ('cold', 'daemon', 'daemon -S'):
+        print(f"  {name:10} {(min(results[name]) - bare) * 1e3:+7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk evaluation of an error-heavy input set.
+
+Compares exception-based evaluation, as batch mode used to work (the
+compiled bytecode without its operator checks, so Calculator methods raise
+CalculatorError for domain errors and malformed lines raise ValueError), with
+the non-raising try_parse_expression that batch mode now uses. Both share
+the expression cache. Inputs mix valid lines with lines that fail with
+domain errors (division by zero, negative square roots, bad logarithms and
+factorials) or bad syntax.
+"""
+
+import argparse
+import random
+import time
+
+import calculator_expr
+from calculator import Calculator, CalculatorError
+from calculator_cli import MEMORY_COMMANDS, CalculatorCLI
+
+GOOD = ['{a} + {b}', '{a} * {b} - {c}', 'sqrt {a}', '{a} / {b}', 'log {a} {b}', '({a} + {b}) ^ 2']
+BAD = ['{a} / 0', 'sqrt -{a}', 'log -{a}', '{a} mod ({b} - {b})', '(0 - {a})!', '{a} +', '{a} $ {b}']
+
+
+def make_lines(count, error_rate, distinct, seed=1):
+    """count expressions, error_rate of them invalid, with `distinct` operand choices."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        template = rng.choice(BAD if rng.random() < error_rate else GOOD)
+        a, b, c = (rng.randrange(2, 2 + distinct) for _ in range(3))
+        lines.append(template.format(a=a, b=b, c=c))
+    return lines
+
+
+def _run_unchecked(code, calculator):
+    """The bytecode loop ignoring operator checks: Calculator methods raise."""
+    stack = []
+    push = stack.append
+    for op, arg in code:
+        if op == calculator_expr.CONST:
+            push(arg)
+        elif op == calculator_expr.NEG:
+            stack[-1] = -stack[-1]
+        else:
+            handler, argc, kwargs, check = arg
+            args = stack[-argc:]
+            del stack[-argc:]
+            if op == calculator_expr.CALL:
+                push(getattr(calculator, handler)(*args, **kwargs))
+            else:
+                push(handler(calculator, *args, **kwargs))
+    return float(stack[0])
+
+
+def raising(cli, lines):
+    """Exception-based evaluation: one raise per bad line."""
+    calculator = cli.calculator
+    compile_expression = calculator_expr.compile_expression
+    errors = 0
+    for line in lines:
+        tokens = line.split()  # parse_expression's memory command checks
+        if tokens[0] in MEMORY_COMMANDS:
+            continue
+        try:
+            _run_unchecked(compile_expression(line).code, calculator)
+        except CalculatorError:
+            errors += 1
+        except Exception:
+            errors += 1
+    return errors
+
+
+def non_raising(cli, lines):
+    """The status-returning API."""
+    errors = 0
+    try_parse_expression = cli.try_parse_expression
+    for line in lines:
+        if try_parse_expression(line)[1]:
+            errors += 1
+    return errors
+
+
+def compare(cli, lines, repeat):
+    """Best seconds of each variant, alternating them so drift hits both alike."""
+    best = {raising: float('inf'), non_raising: float('inf')}
+    errors = {}
+    for _ in range(repeat):
+        for func in best:
+            cli.calculator.reset()
+            calculator_expr.clear_cache()
+            start = time.perf_counter()
+            errors[func] = func(cli, lines)
+            best[func] = min(best[func], time.perf_counter() - start)
+    assert errors[raising] == errors[non_raising]
+    return best[raising], best[non_raising]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--error-rates', default='0,0.2,0.5',
+                        help="comma-separated shares of failing lines (default: 0,0.2,0.5)")
+    parser.add_argument('--distinct', type=int, default=20,
+                        help="operand values per position; controls expression cache hits")
+    args = parser.parse_args()
+    
+    cli = CalculatorCLI(interactive=False, calculator=Calculator(history_capacity=1000))
+    print(f"{'error rate':>10} {'raising ns/line':>16} {'status ns/line':>15} {'speedup':>8}")
+    for rate in (float(value) for value in args.error_rates.split(',')):
+        lines = make_lines(args.lines, rate, args.distinct)
+        slow, fast = compare(cli, lines, args.repeat)
+        print(f"{rate:10.0%} {slow / len(lines) * 1e9:16.0f} {fast / len(lines) * 1e9:15.0f} "
+              f"{slow / fast:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark the process-pool evaluator against the serial parse_expression loop.
+"""
+
+import argparse
+import os
+import random
+import time
+
+from calculator_cli import CalculatorCLI
+from calculator_parallel import evaluate_parallel
+
+EXPRESSIONS = [
+    "5 + 3", "(1 + 2) * 3", "2 ^ 10", "sqrt 16", "sin 90 deg",
+    "log 8 2", "10 mod 3", "7! / 3", "1 / 0", "ln 2 + log10 100",
+]
+
+
+def make_lines(count, seed=0):
+    """Build a reproducible list of expressions."""
+    rng = random.Random(seed)
+    return [rng.choice(EXPRESSIONS) for _ in range(count)]
+
+
+def time_serial(lines):
+    cli = CalculatorCLI(interactive=False)
+    start = time.perf_counter()
+    for _ in cli.evaluate_lines(lines):
+        pass
+    return time.perf_counter() - start
+
+
+def time_parallel(lines, workers, chunk_size):
+    start = time.perf_counter()
+    for _ in evaluate_parallel(lines, workers, chunk_size):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lines', type=int, default=500000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    
+    lines = make_lines(args.lines)
+    serial = time_serial(lines)
+    print(f"{args.lines} expressions, chunk size {args.chunk_size}")
+    print(f"{'mode':>12} {'seconds':>9} {'lines/s':>12} {'speedup':>8}")
+    print(f"{'serial':>12} {serial:9.3f} {args.lines / serial:12.0f} {1.0:8.2f}")
+    
+    workers = 1
+    while True:
+        elapsed = time_parallel(lines, workers, args.chunk_size)
+        print(f"{f'{workers} workers':>12} {elapsed:9.3f} {args.lines / elapsed:12.0f} "
+              f"{serial / elapsed:8.2f}")
+        if workers >= args.max_workers:
+            break
+        workers = min(workers * 2, args.max_workers)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Load-test client for calculator_server.py.
+
+Opens several connections, pipelines requests on each of them and reports
+the sustained request rate. Without --port it spawns a local server first.
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+
+EXPRESSIONS = [b"5 + 3", b"sqrt 16", b"2 ^ 10", b"(1 + 2) * 3", b"log 8 2", b"1 / 0"]
+
+
+async def run_connection(host, port, session, requests, depth):
+    """Send requests in pipelined windows of depth lines; return responses seen."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f":session {session}\n".encode())
+    await reader.readline()
+    
+    sent = received = 0
+    while received < requests:
+        window = min(depth, requests - sent)
+        if window:
+            block = b"\n".join(EXPRESSIONS[(sent + i) % len(EXPRESSIONS)]
+                               for i in range(window)) + b"\n"
+            writer.write(block)
+            sent += window
+        await writer.drain()
+        target = sent
+        while received < target:
+            data = await reader.read(1 << 16)
+            if not data:
+                raise ConnectionError("server closed the connection")
+            received += data.count(b"\n")
+    writer.close()
+    return received
+
+
+async def load_test(host, port, connections, requests, depth):
+    start = time.perf_counter()
+    counts = await asyncio.gather(*(
+        run_connection(host, port, f"bench-{i}", requests, depth)
+        for i in range(connections)))
+    elapsed = time.perf_counter() - start
+    return sum(counts), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="port of a running server")
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=50000,
+                        help="requests per connection")
+    parser.add_argument('--depth', type=int, default=1000,
+                        help="pipelined requests in flight per connection")
+    args = parser.parse_args()
+    
+    server = None
+    port = args.port
+    if port is None:
+        server = subprocess.Popen(
+            [sys.executable, "calculator_server.py", "--host", args.host, "--port", "0"],
+            stdout=subprocess.PIPE, text=True)
+        port = int(server.stdout.readline().rsplit(":", 1)[1])
+    try:
+        total, elapsed = asyncio.run(load_test(
+            args.host, port, args.connections, args.requests, args.depth))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    
+    print(f"{total} requests over {args.connections} connections "
+          f"(pipeline depth {args.depth}) in {elapsed:.3f}s")
+    print(f"{total / elapsed:,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for one-shot CLI use.
+
+Compares the wall-clock time of `python calc.py <expr>` with bare
+interpreter startup, and uses -X importtime to list every module the
+one-shot path imports on top of the interpreter's own. Exits with status 1
+if the overhead exceeds --max-overhead-ms or a module that one-shot use
+should never need is imported.
+
+Bytecode caching is forced on for the child processes, since a cold
+compile of every module on each run is not what deployments see.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules the one-shot path must not import
+FORBIDDEN = ('typing', 're', 'argparse', 'json', 'csv', 'collections', 'array')
+
+COMMANDS = {
+    'bare interpreter': ['-c', 'pass'],
+    'calc.py': [os.path.join(HERE, 'calc.py'), '5 + 3 * 2'],
+    'calculator_cli.py': [os.path.join(HERE, 'calculator_cli.py'), '5 + 3 * 2'],
+    'python -m calculator_cli': ['-m', 'calculator_cli', '5 + 3 * 2'],
+}
+
+
+def _environment():
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = HERE
+    return env
+
+
+def best_time(args, runs, env):
+    """Best wall-clock seconds of running the interpreter with args."""
+    command = [sys.executable] + args
+    subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)  # warm the caches
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def import_times(args, env):
+    """Map module -> (self µs, cumulative µs) from -X importtime."""
+    command = [sys.executable, '-X', 'importtime'] + args
+    result = subprocess.run(command, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--max-overhead-ms', type=float, default=10.0,
+                        help="allowed calc.py time above bare startup (default: 10)")
+    args = parser.parse_args()
+    env = _environment()
+    
+    times = {name: best_time(command, args.runs, env) for name, command in COMMANDS.items()}
+    bare = times['bare interpreter']
+    print(f"{'command':26} {'best ms':>9} {'overhead':>9}")
+    for name, seconds in times.items():
+        print(f"{name:26} {seconds * 1e3:9.1f} {(seconds - bare) * 1e3:9.1f}")
+    
+    baseline = import_times(COMMANDS['bare interpreter'], env)
+    one_shot = import_times(COMMANDS['calc.py'], env)
+    extra = {name: cost for name, cost in one_shot.items() if name not in baseline}
+    print(f"\nModules imported by calc.py beyond bare startup ({len(extra)}):")
+    for name, (self_us, cumulative_us) in sorted(extra.items(), key=lambda item: -item[1][1]):
+        print(f"  {name:28} {self_us:7d} µs self {cumulative_us:7d} µs cumulative")
+    
+    failures = []
+    overhead_ms = (times['calc.py'] - bare) * 1e3
+    if overhead_ms > args.max_overhead_ms:
+        failures.append(f"startup overhead {overhead_ms:.1f} ms > {args.max_overhead_ms} ms")
+    failures.extend(f"imports {name}" for name in FORBIDDEN if name in extra)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
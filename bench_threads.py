@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark a shared ConcurrentCalculator against a Calculator behind one lock.
+
+Run it on a free-threaded CPython build (python3.13t or later, with
+PYTHON_GIL=0) to see throughput grow with the thread count; with the GIL
+both variants stay flat.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from calculator import Calculator
+from calculator_concurrent import ConcurrentCalculator
+
+
+def _work(calc, operations):
+    add = calc.add
+    multiply = calc.multiply
+    memory_add = calc.memory_add
+    for i in range(operations):
+        add(i, 1.0)
+        multiply(i, 2.0)
+        if i & 15 == 0:
+            memory_add(1.0)
+
+
+class LockedCalculator:
+    """A plain Calculator with every call serialized on one lock."""
+    
+    def __init__(self):
+        self.calculator = Calculator(history_capacity=None)
+        self.lock = threading.Lock()
+    
+    def __getattr__(self, name):
+        method = getattr(self.calculator, name)
+        lock = self.lock
+        
+        def locked(*args):
+            with lock:
+                return method(*args)
+        
+        return locked
+
+
+def run(make_calculator, threads, operations):
+    """Return calls per second with the given number of threads."""
+    calc = make_calculator()
+    workers = [threading.Thread(target=_work, args=(calc, operations)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    calls = threads * (operations * 2 + (operations + 15) // 16)
+    return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--operations', type=int, default=200000, help="iterations per thread")
+    parser.add_argument('--max-threads', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'threads':>8} {'concurrent/s':>14} {'scaling':>8} {'locked/s':>14} {'scaling':>8}")
+    
+    concurrent = lambda: ConcurrentCalculator(history_capacity=None)
+    base_concurrent = base_locked = None
+    threads = 1
+    while True:
+        rate = run(concurrent, threads, args.operations)
+        locked = run(LockedCalculator, threads, args.operations)
+        base_concurrent = base_concurrent or rate
+        base_locked = base_locked or locked
+        print(f"{threads:8d} {rate:14.0f} {rate / base_concurrent:8.2f} "
+              f"{locked:14.0f} {locked / base_locked:8.2f}")
+        if threads >= args.max_threads:
+            break
+        threads = min(threads * 2, args.max_threads)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
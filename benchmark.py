@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Calculator microbenchmark suite.
+
+Times every Calculator operation, history recording, parse_expression per
+expression shape and history growth (with peak memory via tracemalloc).
+Results are saved as JSON baselines; compare flags regressions.
+
+    python benchmark.py run -o baseline.json
+    python benchmark.py run -o current.json
+    python benchmark.py compare baseline.json current.json --threshold 0.10
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+
+from calculator import Calculator
+from calculator_cli import CalculatorCLI
+from calculator_history import OP_ADD
+import calculator_expr
+
+
+# name -> statement, timed against a Calculator named calc
+OPERATIONS = {
+    'add': "calc.add(5.0, 3.0)",
+    'subtract': "calc.subtract(5.0, 3.0)",
+    'multiply': "calc.multiply(5.0, 3.0)",
+    'divide': "calc.divide(5.0, 3.0)",
+    'power': "calc.power(2.0, 10.0)",
+    'square_root': "calc.square_root(16.0)",
+    'modulo': "calc.modulo(10.0, 3.0)",
+    'factorial': "calc.factorial(20)",
+    'factorial_exact_10000': "calc.factorial(10000, exact=True)",
+    'sin': "calc.sin(1.0)",
+    'sin_degrees': "calc.sin(90.0, degrees=True)",
+    'cos': "calc.cos(1.0)",
+    'tan': "calc.tan(1.0)",
+    'log': "calc.log(8.0)",
+    'log_base': "calc.log(8.0, 2.0)",
+    'log10': "calc.log10(1000.0)",
+    'memory_store': "calc.memory_store(42.0)",
+    'memory_add': "calc.memory_add(1.0)",
+    'memory_recall': "calc.memory_recall()",
+    'add_to_history': "calc._add_to_history(OP_ADD, 5.0, 3.0, 8.0)",
+    'get_history_100': "calc.get_history()",
+}
+
+# Expression shapes timed through CalculatorCLI.parse_expression
+EXPRESSIONS = {
+    'binary': "5 + 3",
+    'binary_compact': "5+3",
+    'function': "sqrt 16",
+    'function_parens': "sqrt(16)",
+    'degrees': "sin 90 deg",
+    'log_base': "log 8 2",
+    'factorial': "5!",
+    'precedence': "1 + 2 * 3 ^ 2",
+    'nested': "((1 + 2) * (3 + 4)) / (5 - 6 * 2)",
+    'memory': "ms 42",
+}
+
+HISTORY_SIZES = (10 ** 4, 10 ** 5, 10 ** 6)
+
+
+def _time(statement, namespace, repeat):
+    """Best time per call in nanoseconds."""
+    timer = timeit.Timer(statement, globals=namespace)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1e9
+
+
+def bench_operations(repeat):
+    results = {}
+    for name, statement in OPERATIONS.items():
+        calc = Calculator()
+        for i in range(100):
+            calc.add(i, 1)
+        namespace = {'calc': calc, 'OP_ADD': OP_ADD}
+        results[f"op.{name}"] = {'ns_per_op': _time(statement, namespace, repeat)}
+    return results
+
+
+def bench_expressions(repeat):
+    results = {}
+    cli = CalculatorCLI(interactive=False)
+    for name, source in EXPRESSIONS.items():
+        namespace = {'cli': cli, 'source': source, 'calculator_expr': calculator_expr}
+        results[f"parse.{name}"] = {
+            'ns_per_op': _time("cli.parse_expression(source)", namespace, repeat)}
+        results[f"parse.{name}.uncached"] = {'ns_per_op': _time(
+            "calculator_expr.clear_cache(); cli.parse_expression(source)", namespace, repeat)}
+    return results
+
+
+def _grow_history(size):
+    calc = Calculator(history_capacity=None)
+    add = calc.add
+    for i in range(size):
+        add(float(i), 1.0)
+    return calc
+
+
+def bench_history_growth(sizes):
+    """Time history growth, then measure its peak memory in a separate pass."""
+    results = {}
+    for size in sizes:
+        start = time.perf_counter()
+        _grow_history(size)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        calc = _grow_history(size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"history.grow_{size}"] = {
+            'ns_per_op': elapsed / size * 1e9,
+            'peak_bytes': peak,
+        }
+        del calc
+    return results
+
+
+def run_suite(quick=False):
+    """Run every benchmark and return the results document."""
+    repeat = 2 if quick else 5
+    sizes = HISTORY_SIZES[:2] if quick else HISTORY_SIZES
+    results = {}
+    results.update(bench_operations(repeat))
+    results.update(bench_expressions(repeat))
+    results.update(bench_history_growth(sizes))
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Return (rows, regressions) comparing two results documents."""
+    rows = []
+    regressions = []
+    base_results = baseline['results']
+    for name, entry in current['results'].items():
+        if name not in base_results:
+            continue
+        for metric in ('ns_per_op', 'peak_bytes'):
+            if metric not in entry or metric not in base_results[name]:
+                continue
+            old = base_results[name][metric]
+            new = entry[metric]
+            ratio = new / old if old else float('inf')
+            regressed = ratio > 1 + threshold
+            rows.append((name, metric, old, new, ratio, regressed))
+            if regressed:
+                regressions.append(f"{name}.{metric}")
+    return rows, regressions
+
+
+def print_results(document):
+    for name, entry in document['results'].items():
+        line = f"{name:40} {entry['ns_per_op']:12.1f} ns"
+        if 'peak_bytes' in entry:
+            line += f" {entry['peak_bytes'] / 1e6:10.2f} MB peak"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculator benchmark suite")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help="run the suite")
+    run.add_argument('-o', '--output', help="write results to this JSON file")
+    run.add_argument('--quick', action='store_true', help="fewer repeats, smaller histories")
+    cmp = commands.add_parser('compare', help="compare results against a baseline")
+    cmp.add_argument('baseline')
+    cmp.add_argument('current', nargs='?', help="results file (default: run the suite now)")
+    cmp.add_argument('--threshold', type=float, default=0.10,
+                     help="allowed slowdown as a fraction (default: 0.10)")
+    args = parser.parse_args(argv)
+    
+    if args.command == 'run':
+        document = run_suite(args.quick)
+        print_results(document)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2, sort_keys=True)
+        return 0
+    
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current, encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        current = run_suite()
+    rows, regressions = compare(baseline, current, args.threshold)
+    for name, metric, old, new, ratio, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:40} {metric:10} {old:14.1f} {new:14.1f} {ratio:7.2f}x {flag}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        return 1
+    print(f"\nNo regressions above {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
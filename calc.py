@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+One-shot calculator entry point for shell scripts.
+
+    python calc.py 5 + 3
+    python calc.py -e "sqrt 16" -e "2 ^ 10"
+    python calc.py --daemon 5 + 3
+
+Equivalent to calculator_cli.py, but as a tiny script the interpreter only
+compiles these few lines; the calculator modules load from cached bytecode.
+With --daemon only the thin client is loaded and the expressions are
+evaluated by a background daemon (see calculator_daemon.py).
+"""
+
+import sys
+
+if sys.argv[1:2] == ['--daemon']:
+    from calculator_client import main
+else:
+    from calculator_cli import main
+
+sys.exit(main())
\ No newline at end of file
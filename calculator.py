@@ -3,13 +3,135 @@ Calculator Application
 A comprehensive calculator with basic and advanced operations, memory functions, and history tracking.
 """
 
+from __future__ import annotations
+
 import math
-from typing import List, Union, Optional
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Iterator, List, Tuple, Union, Optional
+
+from calculator_factorial import (
+    DEFAULT_MAX_DIGITS, MAX_FLOAT_FACTORIAL, factorial_approx, factorial_digits,
+    factorial_exact,
+)
+from calculator_history import (
+    DEFAULT_CAPACITY, History,
+    OP_ADD, OP_SUBTRACT, OP_MULTIPLY, OP_DIVIDE, OP_POWER, OP_SQUARE_ROOT,
+    OP_MODULO, OP_FACTORIAL, OP_SIN, OP_COS, OP_TAN, OP_SIN_DEG, OP_COS_DEG,
+    OP_TAN_DEG, OP_LN, OP_LOG, OP_LOG10, OP_MEMORY_STORE, OP_MEMORY_RECALL,
+    OP_MEMORY_CLEAR, OP_MEMORY_ADD, OP_MEMORY_SUBTRACT,
+)
+
+
+# Error codes: CalculatorError.code, and the status of the non-raising
+# try_* evaluation APIs and of batch results
+OK = 0
+DIVISION_BY_ZERO = 1
+MODULO_BY_ZERO = 2
+NEGATIVE_SQUARE_ROOT = 3
+NON_POSITIVE_LOG = 4
+INVALID_LOG_BASE = 5
+POWER_OVERFLOW = 6
+POWER_DOMAIN = 7
+FACTORIAL_DOMAIN = 8
+FACTORIAL_TOO_LARGE = 9
+HISTORY_FULL = 10
+DOMAIN_ERROR = 11
+INVALID_INPUT = 12
+CALCULATION_ERROR = 13
+UNDEFINED_VARIABLE = 14
+CIRCULAR_DEFINITION = 15
+SHAPE_MISMATCH = 16
+SINGULAR_MATRIX = 17
+
+ERROR_MESSAGES = {
+    DIVISION_BY_ZERO: "Division by zero is not allowed",
+    MODULO_BY_ZERO: "Modulo by zero is not allowed",
+    NEGATIVE_SQUARE_ROOT: "Cannot calculate square root of negative number",
+    NON_POSITIVE_LOG: "Logarithm is only defined for positive numbers",
+    INVALID_LOG_BASE: "Logarithm base must be positive and not equal to 1",
+    POWER_OVERFLOW: "Power operation failed: result too large",
+    POWER_DOMAIN: "Power operation failed: result is not a real number",
+    FACTORIAL_DOMAIN: "Factorial is only defined for non-negative integers",
+    FACTORIAL_TOO_LARGE: "Number too large for factorial calculation",
+    HISTORY_FULL: "History is full",
+    DOMAIN_ERROR: "Argument outside the domain of the operation",
+    INVALID_INPUT: "Invalid input",
+    CALCULATION_ERROR: "Calculation failed",
+    UNDEFINED_VARIABLE: "Undefined variable",
+    CIRCULAR_DEFINITION: "Circular definition",
+    SHAPE_MISMATCH: "Matrix shapes do not match",
+    SINGULAR_MATRIX: "Matrix is singular",
+}
+
+# Default cap on the digits of a powmod modulus or exponent; pow with two
+# 2000-digit operands takes about a second
+POWMOD_MAX_DIGITS = 2000
 
 
 class CalculatorError(Exception):
-    """Custom exception for calculator errors."""
-    pass
+    """Custom exception for calculator errors; code is one of the error codes above."""
+    
+    def __init__(self, message: Optional[str] = None, code: int = CALCULATION_ERROR):
+        super().__init__(ERROR_MESSAGES.get(code, "") if message is None else message)
+        self.code = code
+    
+    @classmethod
+    def from_code(cls, code: int, detail: Optional[str] = None) -> CalculatorError:
+        """The error for code with its ERROR_MESSAGES text, followed by ': detail' if given."""
+        message = ERROR_MESSAGES[code]
+        return cls(message if detail is None else f"{message}: {detail}", code)
+
+
+# Pure computations shared by the Calculator methods and the memo cache
+
+def _power(base: Union[int, float], exponent: Union[int, float]) -> float:
+    try:
+        result = base ** exponent
+    except ZeroDivisionError:
+        raise CalculatorError.from_code(DIVISION_BY_ZERO)
+    except OverflowError:
+        raise CalculatorError.from_code(POWER_OVERFLOW)
+    except ValueError:
+        raise CalculatorError.from_code(POWER_DOMAIN)
+    if isinstance(result, complex):  # negative base, fractional exponent
+        raise CalculatorError.from_code(POWER_DOMAIN)
+    try:
+        return float(result)
+    except OverflowError:  # exact int result too large for a float
+        raise CalculatorError.from_code(POWER_OVERFLOW)
+
+
+def _square_root(number: Union[int, float]) -> float:
+    return float(math.sqrt(number))
+
+
+def _check_angle(angle: Union[int, float]) -> None:
+    if not math.isfinite(angle):
+        raise CalculatorError.from_code(DOMAIN_ERROR, "trigonometric functions need a finite angle")
+
+
+def _sin(angle: Union[int, float], degrees: bool) -> float:
+    return float(math.sin(math.radians(angle) if degrees else angle))
+
+
+def _cos(angle: Union[int, float], degrees: bool) -> float:
+    return float(math.cos(math.radians(angle) if degrees else angle))
+
+
+def _tan(angle: Union[int, float], degrees: bool) -> float:
+    return float(math.tan(math.radians(angle) if degrees else angle))
+
+
+def _log(number: Union[int, float], base: Union[int, float]) -> float:
+    if base == math.e:
+        return float(math.log(number))
+    return float(math.log(number, base))
+
+
+def _log10(number: Union[int, float]) -> float:
+    return float(math.log10(number))
 
 
 class Calculator:
@@ -18,153 +140,473 @@ class Calculator:
     memory functions, and calculation history.
     """
     
-    def __init__(self):
-        """Initialize the calculator with empty memory and history."""
+    def __init__(self, history_capacity: Optional[int] = DEFAULT_CAPACITY,
+                 history_policy: str = 'overwrite', memo=None, metrics=None,
+                 history_path: Optional[str] = None, result_cache=None):
+        """
+        Initialize the calculator with empty memory and history.
+        
+        The history keeps at most history_capacity records (None for no
+        limit); history_policy is 'overwrite', 'discard' or 'error'.
+        memo enables memoization of the pure functions: True creates a
+        per-instance MemoCache, or pass a MemoCache to share one. metrics
+        works the same way with a Metrics registry (see enable_metrics).
+        With history_path the history is kept in an append-only log file
+        that survives restarts; call close() to commit it. result_cache is
+        the path of a persistent ResultCache database, or a ResultCache to
+        share; expressions, exact factorials and sweep summaries found in it
+        are not recomputed.
+        """
         self.memory: float = 0.0
-        self.history: List[str] = []
+        if history_path is None:
+            self.history: History = History(history_capacity, history_policy)
+        else:
+            from calculator_history_log import HistoryLog
+            self.history = HistoryLog(history_path, history_capacity, history_policy)
         self.last_result: Optional[float] = None
+        self._history_index = None
+        if memo is True:
+            from calculator_memo import MemoCache
+            memo = MemoCache()
+        self.memo = None if memo is False else memo
+        self._owns_result_cache = result_cache is not None and not hasattr(result_cache, 'lookup')
+        if self._owns_result_cache:
+            from calculator_result_cache import ResultCache
+            result_cache = ResultCache(result_cache)
+        self.result_cache = result_cache
+        self.metrics = None
+        if metrics:
+            self.enable_metrics(None if metrics is True else metrics)
     
-    def _add_to_history(self, operation: str, result: float) -> None:
-        """Add an operation to the calculation history."""
-        self.history.append(f"{operation} = {result}")
+    def _add_to_history(self, op: int, a, b, result) -> None:
+        """Record an operation in the calculation history."""
+        self.history.record(op, a, b, result)
         self.last_result = result
     
+    def _compute(self, op: str, func, *args):
+        """Evaluate a pure function, through the memo cache when enabled."""
+        if self.memo is None:
+            return func(*args)
+        return self.memo.lookup(op, func, args)
+    
     def add(self, a: Union[int, float], b: Union[int, float]) -> float:
         """Add two numbers."""
         result = float(a + b)
-        self._add_to_history(f"{a} + {b}", result)
+        self._add_to_history(OP_ADD, a, b, result)
         return result
     
     def subtract(self, a: Union[int, float], b: Union[int, float]) -> float:
         """Subtract b from a."""
         result = float(a - b)
-        self._add_to_history(f"{a} - {b}", result)
+        self._add_to_history(OP_SUBTRACT, a, b, result)
         return result
     
     def multiply(self, a: Union[int, float], b: Union[int, float]) -> float:
         """Multiply two numbers."""
         result = float(a * b)
-        self._add_to_history(f"{a} × {b}", result)
+        self._add_to_history(OP_MULTIPLY, a, b, result)
         return result
     
     def divide(self, a: Union[int, float], b: Union[int, float]) -> float:
         """Divide a by b."""
         if b == 0:
-            raise CalculatorError("Division by zero is not allowed")
+            raise CalculatorError.from_code(DIVISION_BY_ZERO)
         result = float(a / b)
-        self._add_to_history(f"{a} ÷ {b}", result)
+        self._add_to_history(OP_DIVIDE, a, b, result)
         return result
     
-    def power(self, base: Union[int, float], exponent: Union[int, float]) -> float:
-        """Raise base to the power of exponent."""
-        try:
-            result = float(base ** exponent)
-            self._add_to_history(f"{base} ^ {exponent}", result)
+    def power(self, base: Union[int, float], exponent: Union[int, float], exact: bool = False,
+              max_digits: Optional[int] = DEFAULT_MAX_DIGITS) -> Union[int, float]:
+        """
+        Raise base to the power of exponent.
+        
+        By default the result is a float, so it overflows above about 1e308.
+        With exact=True an integer base and a non-negative integer exponent
+        give an exact int of any size, as long as the estimated result has at
+        most max_digits digits (None disables the guard).
+        """
+        if exact:
+            from calculator_power import exact_power, integer_text
+            
+            result = exact_power(base, exponent, max_digits)
+            if abs(result) <= 1 << 53:
+                self._add_to_history(OP_POWER, int(base), int(exponent), result)
+            else:
+                self.history.append(
+                    f"{integer_text(int(base))} ^ {int(exponent)} = {integer_text(result)}")
+                self.last_result = result
             return result
-        except (OverflowError, ValueError) as e:
-            raise CalculatorError(f"Power operation failed: {str(e)}")
+        result = self._compute('power', _power, base, exponent)
+        self._add_to_history(OP_POWER, base, exponent, result)
+        return result
+    
+    def powmod(self, base: int, exponent: int, modulus: int,
+               max_digits: Optional[int] = POWMOD_MAX_DIGITS) -> int:
+        """
+        Calculate base ** exponent % modulus exactly with three-argument pow.
+        
+        The modulus and the exponent may have at most max_digits digits each
+        (None disables the guard). See calculator_power.
+        """
+        from calculator_power import integer_text, powmod
+        
+        result = powmod(base, exponent, modulus, max_digits)
+        operands = ', '.join(integer_text(int(value)) for value in (base, exponent, modulus))
+        self.history.append(f"powmod({operands}) = {integer_text(result)}")
+        self.last_result = result
+        return result
     
     def square_root(self, number: Union[int, float]) -> float:
         """Calculate the square root of a number."""
         if number < 0:
-            raise CalculatorError("Cannot calculate square root of negative number")
-        result = float(math.sqrt(number))
-        self._add_to_history(f"√{number}", result)
+            raise CalculatorError.from_code(NEGATIVE_SQUARE_ROOT)
+        result = self._compute('square_root', _square_root, number)
+        self._add_to_history(OP_SQUARE_ROOT, number, 0.0, result)
         return result
     
     def modulo(self, a: Union[int, float], b: Union[int, float]) -> float:
         """Calculate a modulo b."""
         if b == 0:
-            raise CalculatorError("Modulo by zero is not allowed")
+            raise CalculatorError.from_code(MODULO_BY_ZERO)
         result = float(a % b)
-        self._add_to_history(f"{a} mod {b}", result)
+        self._add_to_history(OP_MODULO, a, b, result)
         return result
     
-    def factorial(self, n: int) -> int:
-        """Calculate the factorial of n."""
+    def factorial(self, n: int, exact: bool = False,
+                  max_digits: Optional[int] = DEFAULT_MAX_DIGITS) -> int:
+        """
+        Calculate the factorial of n.
+        
+        By default n is limited to 170 so the result still fits in a float.
+        With exact=True any n is accepted as long as the estimated result
+        has at most max_digits digits (None disables the guard).
+        """
         if not isinstance(n, int) or n < 0:
-            raise CalculatorError("Factorial is only defined for non-negative integers")
-        if n > 170:  # Prevent overflow
-            raise CalculatorError("Number too large for factorial calculation")
-        result = math.factorial(n)
-        self._add_to_history(f"{n}!", result)
+            raise CalculatorError.from_code(FACTORIAL_DOMAIN)
+        if n > MAX_FLOAT_FACTORIAL:
+            if not exact:  # Prevent overflow
+                raise CalculatorError.from_code(FACTORIAL_TOO_LARGE)
+            digits = factorial_digits(n)
+            if max_digits is not None and digits > max_digits:
+                raise CalculatorError.from_code(
+                    FACTORIAL_TOO_LARGE, f"{n}! would have about {digits} digits (limit {max_digits})")
+            if self.result_cache is None:
+                result = factorial_exact(n)
+            else:
+                result = self.result_cache.lookup(f"factorial {n}", factorial_exact, n)
+            self.history.append(f"{n}! = <{digits}-digit integer>")
+            self.last_result = result
+            return result
+        result = self._compute('factorial', factorial_exact, n)
+        self._add_to_history(OP_FACTORIAL, n, 0, result)
         return result
     
+    def factorial_approx(self, n: int) -> Tuple[float, int]:
+        """Approximate n! as (mantissa, exponent) via log-gamma, for any size of n."""
+        if not isinstance(n, int) or n < 0:
+            raise CalculatorError.from_code(FACTORIAL_DOMAIN)
+        mantissa, exponent = factorial_approx(n)
+        self.history.append(f"{n}! ≈ {mantissa:.10g}e+{exponent}")
+        return mantissa, exponent
+    
     def sin(self, angle: Union[int, float], degrees: bool = False) -> float:
         """Calculate sine of an angle."""
-        if degrees:
-            angle = math.radians(angle)
-        result = float(math.sin(angle))
-        unit = "°" if degrees else "rad"
-        self._add_to_history(f"sin({angle}{unit})", result)
+        _check_angle(angle)
+        result = self._compute('sin', _sin, angle, degrees)
+        self._add_to_history(OP_SIN_DEG if degrees else OP_SIN, angle, 0.0, result)
         return result
     
     def cos(self, angle: Union[int, float], degrees: bool = False) -> float:
         """Calculate cosine of an angle."""
-        if degrees:
-            angle = math.radians(angle)
-        result = float(math.cos(angle))
-        unit = "°" if degrees else "rad"
-        self._add_to_history(f"cos({angle}{unit})", result)
+        _check_angle(angle)
+        result = self._compute('cos', _cos, angle, degrees)
+        self._add_to_history(OP_COS_DEG if degrees else OP_COS, angle, 0.0, result)
         return result
     
     def tan(self, angle: Union[int, float], degrees: bool = False) -> float:
         """Calculate tangent of an angle."""
-        if degrees:
-            angle = math.radians(angle)
-        result = float(math.tan(angle))
-        unit = "°" if degrees else "rad"
-        self._add_to_history(f"tan({angle}{unit})", result)
+        _check_angle(angle)
+        result = self._compute('tan', _tan, angle, degrees)
+        self._add_to_history(OP_TAN_DEG if degrees else OP_TAN, angle, 0.0, result)
         return result
     
     def log(self, number: Union[int, float], base: Union[int, float] = math.e) -> float:
         """Calculate logarithm of number with given base (default: natural log)."""
         if number <= 0:
-            raise CalculatorError("Logarithm is only defined for positive numbers")
+            raise CalculatorError.from_code(NON_POSITIVE_LOG)
         if base <= 0 or base == 1:
-            raise CalculatorError("Logarithm base must be positive and not equal to 1")
+            raise CalculatorError.from_code(INVALID_LOG_BASE)
         
+        result = self._compute('log', _log, number, base)
         if base == math.e:
-            result = float(math.log(number))
-            self._add_to_history(f"ln({number})", result)
+            self._add_to_history(OP_LN, number, 0.0, result)
         else:
-            result = float(math.log(number, base))
-            self._add_to_history(f"log_{base}({number})", result)
+            self._add_to_history(OP_LOG, number, base, result)
         return result
     
     def log10(self, number: Union[int, float]) -> float:
         """Calculate base-10 logarithm of number."""
         if number <= 0:
-            raise CalculatorError("Logarithm is only defined for positive numbers")
-        result = float(math.log10(number))
-        self._add_to_history(f"log₁₀({number})", result)
+            raise CalculatorError.from_code(NON_POSITIVE_LOG)
+        result = self._compute('log10', _log10, number)
+        self._add_to_history(OP_LOG10, number, 0.0, result)
         return result
     
+    def batch(self, operation: str, a, b=None, degrees: bool = False):
+        """
+        Apply an operation element-wise to arrays or sequences of operands.
+        
+        Domain errors do not raise; they are reported per element in the
+        returned BatchResult. A single summary entry is added to the history.
+        """
+        from calculator_batch import evaluate
+        
+        result = evaluate(operation, a, b, degrees)
+        failed = result.error_count
+        self.history.append(
+            f"batch {operation}[{len(result)}] = {len(result) - failed} ok, {failed} errors")
+        return result
+    
+    # Number theory (see calculator_number_theory)
+    def is_prime(self, n: int) -> bool:
+        """Whether n is prime: exact below 3.3e23, probabilistic above."""
+        from calculator_number_theory import is_prime
+        from calculator_power import integer_text
+        
+        result = is_prime(n)
+        self.history.append(f"isprime({integer_text(int(n))}) = {result}")
+        return result
+    
+    def next_prime(self, n: int) -> int:
+        """Return the smallest prime greater than n."""
+        from calculator_number_theory import next_prime
+        from calculator_power import integer_text
+        
+        result = next_prime(n)
+        self.history.append(f"nextprime({integer_text(int(n))}) = {integer_text(result)}")
+        self.last_result = result
+        return result
+    
+    def factorize(self, n: int) -> Dict[int, int]:
+        """Return the prime factorization of n >= 1 as {prime: exponent}."""
+        from calculator_number_theory import factorize, format_factors
+        from calculator_power import integer_text
+        
+        result = factorize(n)
+        self.history.append(f"factor({integer_text(int(n))}) = {format_factors(result)}")
+        return result
+    
+    def gcd(self, *values: int) -> int:
+        """Return the greatest common divisor of integers."""
+        from calculator_number_theory import gcd
+        
+        return self._integer_function('gcd', gcd, values)
+    
+    def lcm(self, *values: int) -> int:
+        """Return the least common multiple of integers."""
+        from calculator_number_theory import lcm
+        
+        return self._integer_function('lcm', lcm, values)
+    
+    def _integer_function(self, name: str, func, values) -> int:
+        from calculator_power import integer_text
+        
+        result = func(*values)
+        operands = ', '.join(integer_text(int(value)) for value in values)
+        self.history.append(f"{name}({operands}) = {integer_text(result)}")
+        self.last_result = result
+        return result
+    
+    def prime_count(self, start: int, stop: int) -> int:
+        """
+        Count the primes p with start <= p < stop (stop at most 10**10).
+        
+        The range is sieved segment by segment in bounded memory; see
+        calculator_number_theory.PrimeSieve.
+        """
+        from calculator_number_theory import sieve
+        
+        result = sieve.count(int(start), int(stop))
+        self.history.append(f"primes[{int(start)}, {int(stop)}) = {result} primes")
+        self.last_result = result
+        return result
+    
+    def primes(self, start: int, stop: int) -> Iterator[int]:
+        """Iterate over the primes p with start <= p < stop (stop at most 10**10)."""
+        from calculator_number_theory import sieve
+        
+        return sieve.primes(int(start), int(stop))
+    
+    def powmod_batch(self, bases, exponents, modulus,
+                     max_digits: Optional[int] = POWMOD_MAX_DIGITS):
+        """
+        Calculate powmod element-wise over arrays or sequences of operands.
+        
+        Errors are reported per element in the returned BatchResult, as in
+        batch. A single summary entry is added to the history.
+        """
+        from calculator_power import powmod_batch
+        
+        result = powmod_batch(bases, exponents, modulus, max_digits)
+        failed = result.error_count
+        self.history.append(
+            f"batch powmod[{len(result)}] = {len(result) - failed} ok, {failed} errors")
+        return result
+    
+    def sweep(self, expression: str, start: float, stop: float, step: float,
+              variable: str = 'x', output=None, variables=None, chunk_size: Optional[int] = None):
+        """
+        Evaluate expression over start, start + step, ... stop for variable.
+        
+        Points are evaluated in chunks (vectorized with NumPy) and, with
+        output, written to it as they are computed. Returns a SweepSummary
+        (min, max, their positions and a trapezoid integral); a single summary
+        entry is added to the history. See calculator_sweep. Without output,
+        the summary is looked up in and stored to the result cache.
+        """
+        from calculator_sweep import DEFAULT_CHUNK_SIZE, sweep
+        
+        cache = self.result_cache if output is None else None
+        summary = sweep(expression, start, stop, step, variable, output, variables,
+                        chunk_size or DEFAULT_CHUNK_SIZE, cache)
+        failed = summary.errors
+        self.history.append(f"sweep {expression} for {variable} = {start}..{stop} step {step} "
+                            f"= {summary.count - failed} ok, {failed} errors")
+        return summary
+    
+    def aggregate(self, func: str, values, q: float = 0.5) -> Optional[float]:
+        """
+        count, sum, mean, variance, stdev, min, max, median or quantile (q) of values.
+        
+        values is an iterable of numbers, a path or an open text file of
+        numbers; it is consumed in one streaming pass in constant memory
+        (see calculator_stats). The result becomes the last result and is
+        recorded once in the history.
+        """
+        from calculator_stats import FUNCTIONS, collect
+        
+        if func not in FUNCTIONS:
+            raise CalculatorError(f"Unknown aggregate: {func}")
+        stats = collect(values)
+        result = stats.value(func, q)
+        label = f"quantile {q}" if func == 'quantile' else func
+        self.history.append(f"{label}[{stats.count}] = {result}")
+        self.last_result = result
+        return result
+    
+    def describe(self, values):
+        """
+        StreamStats (count, sum, mean, variance, extremes, quantiles) of values in one pass.
+        
+        Accepts the same sources as aggregate. The mean becomes the last
+        result and one summary entry is added to the history.
+        """
+        from calculator_stats import collect
+        
+        stats = collect(values)
+        self.history.append(f"describe[{stats.count}] = mean {stats.mean}, stdev {stats.stdev}")
+        self.last_result = stats.mean
+        return stats
+    
+    def matrix(self, operation: str, a, b=None, degrees: bool = False):
+        """
+        Apply matmul, solve, inverse, determinant, transpose or an element-wise
+        batch operation to matrices.
+        
+        Operands are 2-D arrays, calculator_matrix.Matrix objects or nested
+        sequences; NumPy is used when installed. The history entry records
+        shapes, not elements. A determinant also becomes the last result.
+        """
+        from calculator_matrix import evaluate, shape_text
+        
+        result = evaluate(operation, a, b, degrees)
+        operands = shape_text(a) if b is None else f"{shape_text(a)}, {shape_text(b)}"
+        self.history.append(f"matrix {operation} {operands} = {shape_text(result)}")
+        if operation == 'determinant':
+            self.last_result = result
+        return result
+    
+    def compile(self, expression: str, params: Optional[List[str]] = None, history: bool = True):
+        """
+        Compile expression into a Python function of params for repeated evaluation.
+        
+        The function applies the same domain checks as the methods and records
+        its operations in this calculator's history unless history is False.
+        See calculator_codegen.
+        """
+        from calculator_codegen import compile_function
+        
+        return compile_function(expression, params, self, history)
+    
     # Memory operations
     def memory_store(self, value: Union[int, float]) -> None:
         """Store a value in memory."""
         self.memory = float(value)
-        self.history.append(f"M = {value}")
+        self.history.record(OP_MEMORY_STORE, value)
     
     def memory_recall(self) -> float:
         """Recall the value stored in memory."""
-        self.history.append(f"MR = {self.memory}")
+        self.history.record(OP_MEMORY_RECALL, 0.0, 0.0, self.memory)
         return self.memory
     
     def memory_clear(self) -> None:
         """Clear the memory."""
         self.memory = 0.0
-        self.history.append("MC")
+        self.history.record(OP_MEMORY_CLEAR)
     
     def memory_add(self, value: Union[int, float]) -> None:
         """Add a value to memory."""
         self.memory += float(value)
-        self.history.append(f"M+ {value} = {self.memory}")
+        self.history.record(OP_MEMORY_ADD, value, 0.0, self.memory)
     
     def memory_subtract(self, value: Union[int, float]) -> None:
         """Subtract a value from memory."""
         self.memory -= float(value)
-        self.history.append(f"M- {value} = {self.memory}")
+        self.history.record(OP_MEMORY_SUBTRACT, value, 0.0, self.memory)
+    
+    # Instrumentation
+    def enable_metrics(self, metrics=None):
+        """
+        Count calls, errors and latency of every operation.
+        
+        The operation methods are wrapped on this instance only, so a
+        calculator without metrics pays no overhead. Returns the Metrics
+        registry, which may be shared between calculators.
+        """
+        from calculator_metrics import INSTRUMENTED_OPERATIONS, Metrics
+        
+        self.disable_metrics()
+        if metrics is None:
+            metrics = Metrics()
+        for name in INSTRUMENTED_OPERATIONS:
+            method = getattr(type(self), name).__get__(self)
+            setattr(self, name, metrics.instrument(name, method))
+        self.count_rejected = metrics.reject
+        if self.memo is not None:
+            metrics.watch_cache('memo', self.memo)
+        if self.result_cache is not None:
+            metrics.watch_cache('results', self.result_cache)
+        self.metrics = metrics
+        return metrics
+    
+    def disable_metrics(self) -> None:
+        """Remove the instrumentation wrappers."""
+        if self.metrics is None:
+            return
+        from calculator_metrics import INSTRUMENTED_OPERATIONS
+        
+        for name in INSTRUMENTED_OPERATIONS:
+            self.__dict__.pop(name, None)
+        self.__dict__.pop('count_rejected', None)
+        self.metrics = None
+    
+    def count_rejected(self, operation: str, code: int) -> None:
+        """
+        Count a call that an operator check rejected before it reached the method.
+        
+        Does nothing unless metrics are enabled, when it records the call
+        and its error as the instrumented method would have.
+        """
     
     # Utility methods
     def clear_history(self) -> None:
@@ -173,8 +615,38 @@ class Calculator:
         self.last_result = None
     
     def get_history(self) -> List[str]:
-        """Get the calculation history."""
-        return self.history.copy()
+        """Get the calculation history as rendered text."""
+        return self.history.render()
+    
+    def iter_history(self, last: Optional[int] = None) -> Iterator[str]:
+        """Iterate over rendered history entries, optionally only the last n."""
+        return self.history.iter_text(last)
+    
+    def _query(self, filters):
+        """Return the history index (built on first use) and the query for filters."""
+        from calculator_query import HistoryIndex, make_query
+        
+        query = make_query(**filters)
+        index = self._history_index
+        if index is None or index.history is not self.history:
+            index = self._history_index = HistoryIndex(self.history)
+        return index, query
+    
+    def query_history(self, last: Optional[int] = None, **filters):
+        """
+        Return matching history records as HistoryEntry tuples, oldest first.
+        
+        Filters are op (a name such as 'divide' or a list of names), since
+        and until (timestamps) and min_result / max_result (inclusive). Pass
+        last to keep only the most recent n matches.
+        """
+        index, query = self._query(filters)
+        return index.find(query, last)
+    
+    def aggregate_history(self, func: str = 'count', **filters) -> Optional[float]:
+        """count, sum, min, max or mean of the results matching the filters."""
+        index, query = self._query(filters)
+        return index.aggregate(func, query)
     
     def get_last_result(self) -> Optional[float]:
         """Get the last calculation result."""
@@ -185,6 +657,12 @@ class Calculator:
         self.memory = 0.0
         self.history.clear()
         self.last_result = None
+    
+    def close(self) -> None:
+        """Commit and close a persistent history and a result cache opened from a path."""
+        self.history.close()
+        if self._owns_result_cache:
+            self.result_cache.close()
 
 
 if __name__ == "__main__":
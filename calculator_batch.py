@@ -0,0 +1,238 @@
+"""
+Calculator Batch Operations
+Vectorized evaluation of calculator operations over arrays of operands.
+Uses NumPy ufuncs when available and falls back to pure Python otherwise.
+"""
+
+import math
+from array import array
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from calculator import (  # error codes re-exported for BatchResult.errors
+    DIVISION_BY_ZERO, DOMAIN_ERROR, ERROR_MESSAGES, INVALID_LOG_BASE, MODULO_BY_ZERO,
+    NEGATIVE_SQUARE_ROOT, NON_POSITIVE_LOG, OK, POWER_DOMAIN, POWER_OVERFLOW, CalculatorError,
+)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+
+UNARY_OPERATIONS = ('square_root', 'sin', 'cos', 'tan', 'log10')
+BINARY_OPERATIONS = ('add', 'subtract', 'multiply', 'divide', 'power', 'modulo')
+OPERATIONS = UNARY_OPERATIONS + BINARY_OPERATIONS + ('log',)
+
+Operand = Union[int, float, Sequence[float], Any]
+
+
+class BatchResult:
+    """Results of a batch operation together with per-element error codes."""
+    
+    def __init__(self, operation: str, values: Any, errors: Any):
+        """Wrap result values and error codes (0 means the element succeeded)."""
+        self.operation = operation
+        self.values = values
+        self.errors = errors
+    
+    def __len__(self) -> int:
+        if np is not None and isinstance(self.values, np.ndarray):
+            return int(self.values.size)
+        return len(self.values)
+    
+    @property
+    def mask(self) -> Any:
+        """Boolean mask that is true where the element failed."""
+        if np is not None and isinstance(self.errors, np.ndarray):
+            return self.errors != OK
+        return [code != OK for code in self.errors]
+    
+    @property
+    def error_count(self) -> int:
+        """Number of elements that failed."""
+        if np is not None and isinstance(self.errors, np.ndarray):
+            return int(np.count_nonzero(self.errors))
+        return sum(1 for code in self.errors if code != OK)
+    
+    def iter_errors(self) -> Iterator[Tuple[int, str]]:
+        """Yield (index, message) for every failed element."""
+        errors = self.errors
+        if np is not None and isinstance(errors, np.ndarray):
+            errors = errors.ravel()
+        for index, code in enumerate(errors):
+            if code != OK:
+                yield index, ERROR_MESSAGES[int(code)]
+    
+    def __repr__(self) -> str:
+        return (f"BatchResult({self.operation!r}, size={len(self)}, "
+                f"errors={self.error_count})")
+
+
+def _check_operation(operation: str, b: Optional[Operand]) -> None:
+    """Validate the operation name and its arity."""
+    if operation not in OPERATIONS:
+        raise CalculatorError(f"Unknown batch operation: {operation}")
+    if operation in BINARY_OPERATIONS and b is None:
+        raise CalculatorError(f"Batch operation '{operation}' needs two operands")
+    if operation in UNARY_OPERATIONS and b is not None:
+        raise CalculatorError(f"Batch operation '{operation}' takes one operand")
+
+
+def evaluate(operation: str, a: Operand, b: Optional[Operand] = None,
+             degrees: bool = False) -> BatchResult:
+    """Evaluate operation element-wise, using NumPy when it is installed."""
+    _check_operation(operation, b)
+    if np is not None:
+        return _evaluate_numpy(operation, a, b, degrees)
+    return _evaluate_python(operation, a, b, degrees)
+
+
+# NumPy implementation
+
+def _evaluate_numpy(operation: str, a: Operand, b: Optional[Operand],
+                    degrees: bool) -> BatchResult:
+    """Evaluate with NumPy ufuncs; failed elements are NaN in the result."""
+    x = np.atleast_1d(np.asarray(a, dtype=np.float64))
+    y = None
+    if b is not None:
+        try:
+            x, y = np.broadcast_arrays(x, np.asarray(b, dtype=np.float64))
+        except ValueError as e:
+            raise CalculatorError(f"Batch operands have incompatible shapes: {e}")
+    
+    errors = np.zeros(x.shape, dtype=np.uint8)
+    out = np.full(x.shape, np.nan)
+    
+    with np.errstate(all='ignore'):
+        if operation == 'add':
+            np.add(x, y, out=out)
+        elif operation == 'subtract':
+            np.subtract(x, y, out=out)
+        elif operation == 'multiply':
+            np.multiply(x, y, out=out)
+        elif operation == 'divide':
+            bad = y == 0
+            errors[bad] = DIVISION_BY_ZERO
+            np.divide(x, y, out=out, where=~bad)
+        elif operation == 'modulo':
+            bad = y == 0
+            errors[bad] = MODULO_BY_ZERO
+            np.mod(x, y, out=out, where=~bad)
+        elif operation == 'power':
+            np.power(x, y, out=out)
+            errors[(x == 0) & (y < 0)] = DIVISION_BY_ZERO
+            errors[np.isnan(out) & ~np.isnan(x) & ~np.isnan(y)] = POWER_DOMAIN
+            errors[np.isinf(out) & np.isfinite(x) & np.isfinite(y) & (errors == OK)] = POWER_OVERFLOW
+            out[errors != OK] = np.nan
+        elif operation == 'square_root':
+            bad = x < 0
+            errors[bad] = NEGATIVE_SQUARE_ROOT
+            np.sqrt(x, out=out, where=~bad)
+        elif operation in ('sin', 'cos', 'tan'):
+            errors[~np.isfinite(x)] = DOMAIN_ERROR
+            if degrees:
+                x = np.radians(x)
+            getattr(np, operation)(x, out=out, where=errors == OK)
+        elif operation == 'log10':
+            bad = x <= 0
+            errors[bad] = NON_POSITIVE_LOG
+            np.log10(x, out=out, where=~bad)
+        elif operation == 'log':
+            bad = x <= 0
+            errors[bad] = NON_POSITIVE_LOG
+            np.log(x, out=out, where=~bad)
+            if y is not None:
+                bad_base = (y <= 0) | (y == 1)
+                errors[bad_base & ~bad] = INVALID_LOG_BASE
+                ok = errors == OK
+                np.divide(out, np.log(y), out=out, where=ok)
+                out[~ok] = np.nan
+    
+    return BatchResult(operation, out, errors)
+
+
+# Pure-Python fallback
+
+def _scalar_error(operation: str, x: float, y: Optional[float]) -> int:
+    """Return the error code for a single element, or OK."""
+    if operation == 'divide' and y == 0:
+        return DIVISION_BY_ZERO
+    if operation == 'modulo' and y == 0:
+        return MODULO_BY_ZERO
+    if operation == 'square_root' and x < 0:
+        return NEGATIVE_SQUARE_ROOT
+    if operation in ('log', 'log10') and x <= 0:
+        return NON_POSITIVE_LOG
+    if operation == 'log' and y is not None and (y <= 0 or y == 1):
+        return INVALID_LOG_BASE
+    if operation == 'power' and x == 0 and y < 0:
+        return DIVISION_BY_ZERO
+    if operation in ('sin', 'cos', 'tan') and not math.isfinite(x):
+        return DOMAIN_ERROR
+    return OK
+
+
+_SCALAR_FUNCTIONS: Dict[str, Callable[..., float]] = {
+    'add': lambda x, y: x + y,
+    'subtract': lambda x, y: x - y,
+    'multiply': lambda x, y: x * y,
+    'divide': lambda x, y: x / y,
+    'modulo': lambda x, y: x % y,
+    'power': lambda x, y: x ** y,
+    'square_root': math.sqrt,
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'log10': math.log10,
+    'log': lambda x, y: math.log(x) if y is None else math.log(x, y),
+}
+
+
+def _as_list(values: Operand) -> List[float]:
+    """Convert a scalar or a sequence of numbers to a list of floats."""
+    if isinstance(values, (int, float)):
+        return [float(values)]
+    return [float(v) for v in values]
+
+
+def _evaluate_python(operation: str, a: Operand, b: Optional[Operand],
+                     degrees: bool) -> BatchResult:
+    """Evaluate element by element; failed elements are NaN in the result."""
+    xs = _as_list(a)
+    ys: List[Optional[float]] = [None] * len(xs)
+    if b is not None:
+        ys = _as_list(b)
+        if len(xs) == 1 and len(ys) > 1:
+            xs = xs * len(ys)
+        elif len(ys) == 1:
+            ys = ys * len(xs)
+        elif len(xs) != len(ys):
+            raise CalculatorError(
+                f"Batch operands have different lengths: {len(xs)} and {len(ys)}")
+    
+    func = _SCALAR_FUNCTIONS[operation]
+    unary = operation in UNARY_OPERATIONS
+    values = array('d', bytes(8 * len(xs)))
+    errors = array('B', bytes(len(xs)))
+    
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        code = _scalar_error(operation, x, y)
+        if code == OK:
+            if degrees and operation in ('sin', 'cos', 'tan'):
+                x = math.radians(x)
+            try:
+                result = func(x) if unary else func(x, y)
+            except OverflowError:
+                code = POWER_OVERFLOW
+            except ValueError:
+                code = DOMAIN_ERROR
+            else:
+                if isinstance(result, complex):
+                    code = POWER_DOMAIN
+                else:
+                    values[i] = result
+        if code != OK:
+            values[i] = math.nan
+            errors[i] = code
+    
+    return BatchResult(operation, values, errors)
\ No newline at end of file
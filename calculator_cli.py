@@ -3,18 +3,94 @@ Calculator Command Line Interface
 Interactive command-line interface for the calculator application.
 """
 
+from __future__ import annotations
+
 import sys
-from typing import List, Optional
-from calculator import Calculator, CalculatorError
+from calculator import INVALID_INPUT, OK, UNDEFINED_VARIABLE, Calculator, CalculatorError
+from calculator_expr import try_compile_expression
+from calculator_operators import PREFIX, registry
+
+# Startup cost matters for one-shot use from scripts: typing is only needed
+# by type checkers, and argparse, csv and json are imported when first used.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import argparse
+    from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+    
+    from calculator_variables import VariableGraph
+    
+    BatchRow = Tuple[int, str, Optional[float], Optional[str]]
+
+# Number of formatted lines collected before each write in batch mode
+BATCH_CHUNK_LINES = 4096
+BATCH_BUFFER_SIZE = 1 << 20
+
+# Commands that evaluate their argument and update memory
+MEMORY_COMMANDS = ('ms', 'm+', 'm-')
+
+INVALID_INPUT_PREFIX = "Invalid input: "
+
+# Streaming statistics commands and the Calculator.aggregate function of each
+STATISTICS_COMMANDS = {
+    'sum': 'sum', 'mean': 'mean', 'var': 'variance', 'stdev': 'stdev',
+    'median': 'median', 'quantile': 'quantile', 'describe': None,
+}
+
+# Functions of the exact command: Calculator method and operand count (None: any)
+EXACT_FUNCTIONS = {
+    'powmod': ('powmod', 3), 'gcd': ('gcd', None), 'lcm': ('lcm', None),
+    'isprime': ('is_prime', 1), 'nextprime': ('next_prime', 1),
+}
+
+# The primes command lists the primes of ranges with at most this many
+PRIMES_SHOWN = 100
+
+
+def _split_command(text: str) -> Tuple[str, Optional[str]]:
+    """
+    (first word in lower case, the rest of text) of a command line.
+    
+    A command is a whole first word followed by an argument or nothing. If
+    an infix operator or '=' follows instead, as in 'sum + 1', the line is
+    an expression and the rest is None.
+    """
+    parts = text.split(None, 1)
+    if not parts:
+        return '', None
+    if len(parts) == 1:
+        return parts[0].lower(), ''
+    rest = parts[1]
+    first = rest.split(None, 1)[0]
+    if rest[0] == '=' or (first in registry and registry.lookup(first).kind != PREFIX):
+        return parts[0].lower(), None
+    return parts[0].lower(), rest
+
+
+def _raise_error(code: int, message: str) -> None:
+    """Raise what the raising API always raised for a (code, message) status."""
+    if code == INVALID_INPUT:
+        raise ValueError(message[len(INVALID_INPUT_PREFIX):])
+    raise CalculatorError(message, code)
 
 
 class CalculatorCLI:
     """Command-line interface for the calculator."""
     
-    def __init__(self):
+    def __init__(self, interactive: bool = True, calculator: Optional[Calculator] = None):
         """Initialize the CLI with a calculator instance."""
-        self.calculator = Calculator()
+        self.calculator = calculator if calculator is not None else Calculator()
         self.running = True
+        self.interactive = interactive
+        # Created on the first assignment; _values is its name -> value mapping
+        self.variables: Optional[VariableGraph] = None
+        self._values: Optional[Dict[str, float]] = None
+        # Matrices by name (2-D arrays, or calculator_matrix.Matrix without NumPy)
+        self.matrices: Dict[str, object] = {}
+    
+    def notify(self, message: str) -> None:
+        """Print an informational message (suppressed in batch mode)."""
+        if self.interactive:
+            print(message)
     
     def display_welcome(self) -> None:
         """Display welcome message and instructions."""
@@ -22,44 +98,26 @@ class CalculatorCLI:
         print("         PYTHON CALCULATOR")
         print("=" * 50)
         print("\nAvailable operations:")
-        print("  Basic: +, -, *, /, ^, sqrt, mod, !")
-        print("  Trigonometric: sin, cos, tan")
-        print("  Logarithmic: ln, log, log10")
+        for line in registry.summary_lines():
+            print(f"  {line}")
         print("  Memory: ms, mr, mc, m+, m-")
-        print("  Utility: history, clear, reset, help, quit")
+        print("  Variables: <name> = <expr>, vars, deps, recalc")
+        print("  Tables: sweep <expr> x from <a> to <b> step <s>")
+        print("  Statistics: sum, mean, var, stdev, median, quantile, describe")
+        print("  Matrices: matrix <name> = @<file> | [1 2; 3 4] | <op> <a> [<b>]")
+        print("  Exact integers: exact <a> ^ <b>, exact powmod <a> <b> <m>, factor, primes")
+        print("  Utility: history, stats, clear, reset, help, quit")
         print("\nType 'help' for detailed instructions.")
         print("Type 'quit' or 'exit' to exit the calculator.")
         print("-" * 50)
     
     def display_help(self) -> None:
         """Display detailed help information."""
-        help_text = """
+        help_text = f"""
 CALCULATOR HELP
 ===============
 
-Basic Operations:
-  <num1> + <num2>     Addition
-  <num1> - <num2>     Subtraction
-  <num1> * <num2>     Multiplication
-  <num1> / <num2>     Division
-  <num1> ^ <num2>     Power (exponentiation)
-  <num1> mod <num2>   Modulo
-  sqrt <num>          Square root
-  <num>!              Factorial
-
-Trigonometric Functions:
-  sin <angle>         Sine (in radians)
-  cos <angle>         Cosine (in radians)
-  tan <angle>         Tangent (in radians)
-  sin <angle> deg     Sine (in degrees)
-  cos <angle> deg     Cosine (in degrees)
-  tan <angle> deg     Tangent (in degrees)
-
-Logarithmic Functions:
-  ln <num>            Natural logarithm
-  log <num>           Natural logarithm (same as ln)
-  log10 <num>         Base-10 logarithm
-  log <num> <base>    Logarithm with custom base
+{registry.help_text()}
 
 Memory Operations:
   ms <num>            Store number in memory
@@ -68,26 +126,94 @@ Memory Operations:
   m+ <num>            Add to memory
   m- <num>            Subtract from memory
 
+Variables:
+  <name> = <expr>     Define or redefine a variable; variables that use it
+                      are recomputed, e.g. x = 3 then y = x ^ 2 + 1
+  vars                List variables and their values
+  deps <name>         Show what a variable reads and which variables use it
+  recalc [<name>]     Recompute all variables, or one and those using it
+
+Tables:
+  sweep <expr> <var> from <a> to <b> step <s> [chunk <n>] [summary] [> <file>]
+                      Evaluate expr for var = a, a + s, ... b, one line per
+                      point; summary prints only min, max and the integral,
+                      > file writes the points to file
+
+Statistics (of numbers separated by spaces or commas, or @<file>):
+  sum <nums>          Compensated sum
+  mean <nums>         Mean
+  var <nums>          Sample variance
+  stdev <nums>        Sample standard deviation
+  median <nums>       Approximate median
+  quantile <q> <nums> Approximate q-quantile (0 <= q <= 1)
+  describe <nums>     All of the above, with min, max and quartiles
+
+Matrices (names are case-sensitive):
+  matrix <name> = @<file>        Load a CSV or .npy file (.npy is memory-mapped)
+  matrix <name> = [1 2; 3 4]     Rows separated by ';'
+  matrix <name> = <op> <a> [<b>] matmul, solve, inverse or transpose of
+                                 matrices, or an element-wise operation
+                                 (add, subtract, multiply, divide, power,
+                                 modulo, square_root, sin, cos, tan, log,
+                                 log10) of a matrix and a matrix or number
+  matrix det <name>              Determinant
+  matrix show <name>             Print the elements
+  matrix save <name> <file>      Write a CSV or .npy file
+  matrix                         List matrices and their shapes
+
+Exact Integers (operands are integer literals, including 0x, 0o and 0b,
+or expressions with integer values):
+  exact <a> ^ <b>     a to the power b as an exact integer (up to
+                      1000000 digits)
+  exact powmod <a> <b> <m>
+                      a ^ b mod m as an exact integer; b < 0 uses the
+                      inverse of a modulo m
+  exact gcd|lcm <a> <b> [...]
+                      Greatest common divisor or least common multiple
+  exact isprime|nextprime <n>
+                      Primality (exact below 3.3e23) or the next prime
+  factor <n>          Prime factorization, e.g. 360 = 2^3 × 3^2 × 5
+  primes <a> <b>      Count the primes in [a, b), b up to 10^10, and list
+                      them if there are at most 100
+
 Utility Commands:
   history             Show calculation history
+  history where <cond> [and <cond>...]
+                      Show matching entries; conditions are op = divide[,mod],
+                      result > 1e6 (< <= > >= =) and within 1h (s, m, h, d)
+  history <agg> [where ...]
+                      count, sum, min, max or mean of the matching results
+  stats on|off        Enable or disable per-operation metrics
+  stats               Show call counts, errors and latency per operation
+  stats export <file> Write metrics as JSON (.json) or Prometheus text
+  stats reset         Clear collected metrics
   clear               Clear history
   reset               Reset calculator (clear memory and history)
   help                Show this help
   quit/exit           Exit calculator
 
+Expressions:
+  Operators follow the usual precedence (^ before * / mod before + -)
+  and can be grouped with parentheses; spaces are optional.
+  Functions accept f x or f(x) forms, e.g. sqrt(16), log(8, 2).
+
 Examples:
   5 + 3
+  (5+3) * 2 ^ 2
   sqrt 16
   sin 90 deg
   2 ^ 8
   ms 42
   mr
+  rate = 0.05
+  total = 1000 * (1 + rate) ^ 10
 """
         print(help_text)
     
     def parse_input(self, user_input: str) -> Optional[float]:
         """Parse user input and execute the corresponding operation."""
-        user_input = user_input.strip().lower()
+        raw_input = user_input.strip()
+        user_input = raw_input.lower()
         
         if not user_input:
             return None
@@ -102,8 +228,19 @@ Examples:
             self.display_help()
             return None
         
-        if user_input == 'history':
-            self.show_history()
+        command, argument = _split_command(raw_input)
+        if argument is None:
+            command = None  # an expression starting with a command word
+        
+        if command == 'history':
+            if argument:
+                self.query_history(argument.lower())
+            else:
+                self.show_history()
+            return None
+        
+        if command == 'stats':
+            self.handle_stats(argument.split(None, 1))
             return None
         
         if user_input == 'clear':
@@ -127,119 +264,455 @@ Examples:
             print("Memory cleared.")
             return None
         
+        # Handle variable commands
+        if user_input == 'vars':
+            self.show_variables()
+            return None
+        
+        if command == 'deps' and argument:
+            self.show_dependencies(argument.lower())
+            return None
+        
+        if command in STATISTICS_COMMANDS and argument:
+            return self.run_statistic(command, argument)
+        
+        if command == 'matrix':
+            return self.run_matrix(argument)
+        
+        if command == 'factor' and argument:
+            self.run_factor(argument)
+            return None
+        
+        if command == 'primes' and argument:
+            self.run_primes(argument.split())
+            return None
+        
+        if command == 'exact' and argument:
+            return self.run_exact(argument)
+        
+        if command == 'sweep' and argument:
+            self.run_sweep(argument)
+            return None
+        
+        if command == 'recalc':
+            self.recalculate(argument.lower() or None)
+            return None
+        
         # Parse mathematical expressions
         try:
-            return self.parse_expression(user_input)
-        except CalculatorError as e:
-            print(f"Error: {e}")
-            return None
+            result, code, message = self.try_parse_expression(user_input)
         except Exception as e:
             print(f"Invalid input: {e}")
             return None
+        if code:
+            print(message if code == INVALID_INPUT else f"Error: {message}")
+        return result
+    
+    def try_parse_expression(self, expression: str) -> Tuple[Optional[float], int, Optional[str]]:
+        """
+        Evaluate an expression, assignment or memory command without raising.
+        
+        Returns (result, OK, None) or (None, code, message) with an error code
+        from calculator; messages of INVALID_INPUT start with 'Invalid input:'.
+        """
+        name, equals, source = expression.partition('=')
+        if equals and name.strip().isidentifier():
+            return self.try_assign(name.strip(), source)
+        tokens = expression.split()
+        if not tokens:
+            return None, INVALID_INPUT, INVALID_INPUT_PREFIX + "Empty expression"
+        command = tokens[0]
+        if command in MEMORY_COMMANDS and len(tokens) >= 2:
+            value, code, message = self.try_evaluate(' '.join(tokens[1:]))
+            if code:
+                return None, code, message
+            calculator = self.calculator
+            try:
+                if command == 'ms':
+                    calculator.memory_store(value)
+                    self.notify(f"Stored {value} in memory.")
+                    return value, OK, None
+                if command == 'm+':
+                    calculator.memory_add(value)
+                    self.notify(f"Added {value} to memory. Memory: {calculator.memory}")
+                else:
+                    calculator.memory_subtract(value)
+                    self.notify(f"Subtracted {value} from memory. Memory: {calculator.memory}")
+            except CalculatorError as e:
+                return None, e.code, str(e)
+            return calculator.memory, OK, None
+        compiled = try_compile_expression(expression)
+        status = compiled.try_evaluate(self.calculator, self._values)
+        if status[1] == UNDEFINED_VARIABLE:
+            from calculator_variables import RESERVED_NAMES
+            
+            reserved = sorted(compiled.variables & RESERVED_NAMES)
+            if reserved:
+                return (None, UNDEFINED_VARIABLE,
+                        f"Undefined variable: {reserved[0]} is a reserved name, not a variable")
+        return status
     
     def parse_expression(self, expression: str) -> float:
         """Parse and evaluate mathematical expressions."""
-        tokens = expression.split()
-        
-        if len(tokens) == 0:
-            raise ValueError("Empty expression")
+        result, code, message = self.try_parse_expression(expression)
+        if code:
+            _raise_error(code, message)
+        return result
+    
+    def try_evaluate(self, expression: str) -> Tuple[Optional[float], int, Optional[str]]:
+        """Compile an infix expression (cached) and run it without raising."""
+        return try_compile_expression(expression).try_evaluate(self.calculator, self._values)
+    
+    def evaluate(self, expression: str) -> float:
+        """Compile an infix expression (cached) and run it on the calculator."""
+        result, code, message = self.try_evaluate(expression)
+        if code:
+            _raise_error(code, message)
+        return result
+    
+    def try_assign(self, name: str, source: str) -> Tuple[Optional[float], int, Optional[str]]:
+        """Define variable name as source, recomputing its dependents, without raising."""
+        if self.variables is None:
+            from calculator_variables import VariableGraph
+            self.variables = VariableGraph(self.calculator)
+            self._values = self.variables.values
+        return self.variables.try_define(name, source)
+    
+    def show_variables(self) -> None:
+        """Display every variable with its definition and value."""
+        if not self.variables:
+            print("No variables defined.")
+            return
+        for cell in self.variables:
+            state = cell.value if cell.code == OK else f"Error: {cell.message}"
+            print(f"  {cell.name} = {cell.source}  ->  {state}")
+    
+    def show_dependencies(self, name: str) -> None:
+        """Display what variable name reads and which variables read it."""
+        variables = self.variables
+        cell = variables.get(name) if variables is not None else None
+        dependents = variables.dependents(name) if variables is not None else []
+        if cell is None and not dependents:
+            print(f"Unknown variable: {name}")
+            return
+        if cell is None:
+            print(f"{name} is not defined.")
+        else:
+            print(f"{name} = {cell.source}")
+            print(f"Depends on: {', '.join(sorted(cell.dependencies)) or '(nothing)'}")
+        print(f"Used by: {', '.join(dependents) or '(nothing)'}")
+    
+    def recalculate(self, name: Optional[str] = None) -> None:
+        """Recompute all variables, or name and every variable downstream of it."""
+        variables = self.variables
+        if name is not None and (variables is None or name not in variables):
+            print(f"Unknown variable: {name}")
+            return
+        if variables is None:
+            print("No variables defined.")
+            return
+        order = variables.recalculate(None if name is None else [name])
+        print(f"Recalculated {len(order)} variable{'s' if len(order) != 1 else ''}.")
+    
+    def run_sweep(self, command: str) -> None:
+        """Handle 'sweep <expr> <var> from <a> to <b> step <s> [chunk <n>] [summary] [> <file>]'."""
+        command, redirect, path = command.partition('>')
+        path = path.strip()
+        head, keyword, tail = command.lower().rpartition(' from ')
+        words = head.split()
+        if not keyword or len(words) < 2:
+            print("Usage: sweep <expr> <var> from <a> to <b> step <s> [chunk <n>] [summary] [> <file>]")
+            return
+        variable, expression = words[-1], ' '.join(words[:-1])
+        tokens = tail.split()
+        summary_only = tokens[-1:] == ['summary']
+        if summary_only:
+            tokens.pop()
+        # Group the words after 'from' by keyword: a to b step s [chunk n]
+        parts = {'from': []}
+        current = parts['from']
+        for token in tokens:
+            if token in ('to', 'step', 'chunk') and token not in parts:
+                current = parts[token] = []
+            else:
+                current.append(token)
+        if 'to' not in parts or 'step' not in parts or redirect and not path:
+            print("Usage: sweep <expr> <var> from <a> to <b> step <s> [chunk <n>] [summary] [> <file>]")
+            return
+        bounds = {}
+        for name, words in parts.items():
+            value, code, message = self.try_evaluate(' '.join(words))
+            if code:
+                print(f"Invalid sweep {name}: {message}")
+                return
+            bounds[name] = value
+        chunk = int(bounds['chunk']) if 'chunk' in bounds else None
+        output = None
+        try:
+            if path:
+                output = open(path, 'w', encoding='utf-8', buffering=BATCH_BUFFER_SIZE)
+            elif not summary_only:
+                output = sys.stdout
+            summary = self.calculator.sweep(expression, bounds['from'], bounds['to'], bounds['step'],
+                                            variable, output, self._values, chunk)
+        except (CalculatorError, ValueError, OSError) as e:
+            print(f"Error: {e}")
+            return
+        finally:
+            if output is not None and output is not sys.stdout:
+                output.close()
+        if path:
+            print(f"Wrote {summary.count} points to {path}.")
+        if path or summary_only:
+            for line in summary.lines():
+                print(line)
+    
+    def run_statistic(self, command: str, args: str) -> Optional[float]:
+        """Handle sum, mean, var, stdev, median, quantile and describe."""
+        from calculator_stats import read_numbers
         
-        # Handle single number factorial
-        if len(tokens) == 1 and tokens[0].endswith('!'):
-            num_str = tokens[0][:-1]
+        q = 0.5
+        if command == 'quantile':
+            q_text, _, args = args.partition(' ')
             try:
-                num = int(float(num_str))
-                return float(self.calculator.factorial(num))
+                q = float(q_text)
             except ValueError:
-                raise ValueError("Invalid factorial expression")
-        
-        # Handle memory store
-        if len(tokens) == 2 and tokens[0] == 'ms':
-            value = float(tokens[1])
-            self.calculator.memory_store(value)
-            print(f"Stored {value} in memory.")
-            return value
+                print("Usage: quantile <q> <numbers or @file>")
+                return None
+        args = args.strip()
+        source = args[1:].strip() if args.startswith('@') else read_numbers([args])
+        try:
+            if command == 'describe':
+                stats = self.calculator.describe(source)
+                for line in stats.lines():
+                    print(line)
+                return None
+            result = self.calculator.aggregate(STATISTICS_COMMANDS[command], source, q)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}")
+            return None
+        if result is None:
+            print("Not enough numbers.")
+        return result
+    
+    def run_matrix(self, command: str) -> Optional[float]:
+        """Handle the matrix commands; returns the determinant for 'matrix det'."""
+        import calculator_matrix
         
-        # Handle memory add/subtract
-        if len(tokens) == 2 and tokens[0] in ['m+', 'm-']:
-            value = float(tokens[1])
-            if tokens[0] == 'm+':
-                self.calculator.memory_add(value)
-                print(f"Added {value} to memory. Memory: {self.calculator.memory}")
+        words = command.split()
+        if not words:
+            if not self.matrices:
+                print("No matrices defined.")
+            for name, matrix in self.matrices.items():
+                print(f"  {name}: {calculator_matrix.shape_text(matrix)}")
+            return None
+        action = words[0].lower()
+        try:
+            if action in ('det', 'show', 'save') and len(words) == (3 if action == 'save' else 2):
+                matrix = self._matrix(words[1])
+                if action == 'det':
+                    result = self.calculator.matrix('determinant', matrix)
+                    print(result)
+                    return result
+                if action == 'show':
+                    for line in calculator_matrix.format_matrix(matrix):
+                        print(line)
+                else:
+                    calculator_matrix.save(words[2], matrix)
+                    print(f"Saved {words[1]} to {words[2]}.")
+                return None
+            name, equals, source = command.partition('=')
+            name, source = name.strip(), source.strip()
+            if not equals or not name.isidentifier() or name in ('det', 'show', 'save') or not source:
+                print("Usage: matrix <name> = @<file> | [<rows>] | <op> <a> [<b>]")
+                return None
+            if source.startswith('@'):
+                matrix = calculator_matrix.load(source[1:].strip())
+            elif source.startswith('['):
+                rows = source.strip('[]').split(';')
+                matrix = calculator_matrix.as_matrix(
+                    [[float(value) for value in row.replace(',', ' ').split()] for row in rows])
             else:
-                self.calculator.memory_subtract(value)
-                print(f"Subtracted {value} from memory. Memory: {self.calculator.memory}")
-            return self.calculator.memory
-        
-        # Handle square root
-        if len(tokens) == 2 and tokens[0] == 'sqrt':
-            num = float(tokens[1])
-            return self.calculator.square_root(num)
-        
-        # Handle trigonometric functions
-        if len(tokens) >= 2 and tokens[0] in ['sin', 'cos', 'tan']:
-            angle = float(tokens[1])
-            degrees = len(tokens) == 3 and tokens[2] == 'deg'
-            
-            if tokens[0] == 'sin':
-                return self.calculator.sin(angle, degrees)
-            elif tokens[0] == 'cos':
-                return self.calculator.cos(angle, degrees)
-            elif tokens[0] == 'tan':
-                return self.calculator.tan(angle, degrees)
+                operation, *operands = source.split()
+                if not 1 <= len(operands) <= 2:
+                    print("Usage: matrix <name> = <op> <a> [<b>]")
+                    return None
+                a = self._matrix(operands[0])
+                b = self._matrix_operand(operands[1]) if len(operands) > 1 else None
+                matrix = self.calculator.matrix(operation.lower(), a, b)
+        except (CalculatorError, ValueError, OSError) as e:
+            print(f"Error: {e}")
+            return None
+        self.matrices[name] = matrix
+        shape = calculator_matrix.shape_text(matrix)
+        if matrix.size > 100:
+            print(f"{name}: {shape}")
+        else:
+            print(f"{name} ({shape}) =")
+            for line in calculator_matrix.format_matrix(matrix):
+                print(line)
+        return None
+    
+    def _matrix(self, name: str):
+        matrix = self.matrices.get(name)
+        if matrix is None:
+            raise ValueError(f"Unknown matrix: {name}")
+        return matrix
+    
+    def _matrix_operand(self, text: str):
+        """A matrix by name, or a number (or expression of variables)."""
+        if text in self.matrices:
+            return self.matrices[text]
+        value, code, message = self.try_evaluate(text)
+        if code:
+            raise ValueError(f"Unknown matrix: {text}" if text.isidentifier() else message)
+        return value
+    
+    def run_exact(self, command: str) -> Optional[int]:
+        """Handle 'exact <a> ^ <b>' and 'exact <function> <integers>'."""
+        from calculator_power import integer_digits, integer_text
         
-        # Handle logarithmic functions
-        if len(tokens) >= 2 and tokens[0] in ['ln', 'log', 'log10']:
-            num = float(tokens[1])
-            
-            if tokens[0] == 'ln' or (tokens[0] == 'log' and len(tokens) == 2):
-                return self.calculator.log(num)
-            elif tokens[0] == 'log10':
-                return self.calculator.log10(num)
-            elif tokens[0] == 'log' and len(tokens) == 3:
-                base = float(tokens[2])
-                return self.calculator.log(num, base)
+        words = command.split()
+        method, count = EXACT_FUNCTIONS.get(words[0].lower(), (None, 0)) if words else (None, 0)
+        base, caret, exponent = command.replace('**', '^').partition('^')
+        try:
+            if method and (len(words) - 1 == count or count is None and len(words) > 1):
+                operands = map(self._integer_operand, words[1:])
+                result = getattr(self.calculator, method)(*operands)
+            elif caret and base.strip() and exponent.strip():
+                result = self.calculator.power(self._integer_operand(base.strip()),
+                                               self._integer_operand(exponent.strip()), exact=True)
+            else:
+                print(f"Usage: exact <a> ^ <b> | exact {'|'.join(EXACT_FUNCTIONS)} <integers>")
+                return None
+        except (CalculatorError, ValueError) as e:
+            print(f"Error: {e}")
+            return None
+        # Python refuses to convert very long integers to text
+        limit = getattr(sys, 'get_int_max_str_digits', int)()
+        if limit and integer_digits(result) >= limit:
+            print(integer_text(result))
+            return None
+        return result
+    
+    def run_factor(self, text: str) -> None:
+        """Handle 'factor <n>'."""
+        from calculator_number_theory import format_factors
         
-        # Handle binary operations
-        if len(tokens) == 3:
+        try:
+            n = self._integer_operand(text)
+            factors = self.calculator.factorize(n)
+        except (CalculatorError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+        print(f"{n} = {format_factors(factors)}")
+    
+    def run_primes(self, args: List[str]) -> None:
+        """Handle 'primes <a> <b>': count the primes in [a, b), listing a few."""
+        if len(args) != 2:
+            print("Usage: primes <from> <to>")
+            return
+        try:
+            start, stop = map(self._integer_operand, args)
+            count = self.calculator.prime_count(start, stop)
+            if 0 < count <= PRIMES_SHOWN:
+                print(' '.join(map(str, self.calculator.primes(start, stop))))
+        except (CalculatorError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+        print(f"{count} primes in [{start}, {stop})")
+    
+    def _integer_operand(self, text: str) -> int:
+        """An integer literal, kept exact, or an expression with an integer value."""
+        for base in (0, 10):  # 0 reads 0x, 0o and 0b prefixes; 10 leading zeros
             try:
-                num1 = float(tokens[0])
-                operator = tokens[1]
-                num2 = float(tokens[2])
-                
-                if operator == '+':
-                    return self.calculator.add(num1, num2)
-                elif operator == '-':
-                    return self.calculator.subtract(num1, num2)
-                elif operator in ['*', '×']:
-                    return self.calculator.multiply(num1, num2)
-                elif operator in ['/', '÷']:
-                    return self.calculator.divide(num1, num2)
-                elif operator in ['^', '**']:
-                    return self.calculator.power(num1, num2)
-                elif operator == 'mod':
-                    return self.calculator.modulo(num1, num2)
-                else:
-                    raise ValueError(f"Unknown operator: {operator}")
-            except ValueError as e:
-                if "could not convert" in str(e):
-                    raise ValueError("Invalid number format")
-                raise e
-        
-        raise ValueError("Invalid expression format")
+                return int(text, base)
+            except ValueError:
+                pass
+        value = self.evaluate(text)
+        if not value.is_integer():
+            raise ValueError(f"Not an integer: {text} = {value}")
+        return int(value)
     
     def show_history(self) -> None:
         """Display the calculation history."""
-        history = self.calculator.get_history()
-        if not history:
+        count = len(self.calculator.history)
+        if not count:
             print("No calculations in history.")
         else:
             print("\nCalculation History:")
             print("-" * 30)
-            for i, entry in enumerate(history[-10:], 1):  # Show last 10 entries
+            for i, entry in enumerate(self.calculator.iter_history(last=10), 1):  # Show last 10 entries
                 print(f"{i:2d}. {entry}")
-            if len(history) > 10:
-                print(f"... and {len(history) - 10} more entries")
+            if count > 10:
+                print(f"... and {count - 10} more entries")
+    
+    def query_history(self, command: str) -> None:
+        """Handle 'history where ...' and 'history <aggregate> [where ...]'."""
+        from calculator_query import AGGREGATES, parse_conditions
+        
+        func, _, rest = command.partition(' ')
+        if func == 'where':
+            func, conditions = None, rest
+        elif func in AGGREGATES:
+            keyword, _, conditions = rest.strip().partition(' ')
+            if keyword not in ('', 'where'):
+                print(f"Invalid history query: expected 'where', got '{keyword}'")
+                return
+        else:
+            print(f"Invalid history query: {command}")
+            return
+        try:
+            filters = parse_conditions(conditions) if conditions.strip() else {}
+            if func is not None:
+                value = self.calculator.aggregate_history(func, **filters)
+                print(f"{func}: {value}")
+                return
+            count = self.calculator.aggregate_history('count', **filters)
+            entries = self.calculator.query_history(last=10, **filters)
+        except ValueError as e:
+            print(f"Invalid history query: {e}")
+            return
+        if not entries:
+            print("No matching calculations.")
+            return
+        for i, entry in enumerate(entries, 1):
+            print(f"{i:2d}. {entry.text}")
+        if count > 10:
+            print(f"... and {count - 10} more matches")
+    
+    def handle_stats(self, args: List[str]) -> None:
+        """Handle the stats command and its subcommands."""
+        command = args[0].lower() if args else ''
+        metrics = self.calculator.metrics
+        if command == 'on':
+            if metrics is None:
+                self.calculator.enable_metrics()
+            print("Metrics enabled.")
+        elif command == 'off':
+            self.calculator.disable_metrics()
+            print("Metrics disabled.")
+        elif metrics is None:
+            print("Metrics are disabled. Type 'stats on' to enable them.")
+        elif command == 'reset':
+            metrics.reset()
+            print("Metrics reset.")
+        elif command == 'export':
+            if len(args) < 2:
+                print("Usage: stats export <file>")
+                return
+            try:
+                metrics.export(args[1])
+                print(f"Metrics written to {args[1]}.")
+            except OSError as e:
+                print(f"Error: {e}")
+        elif command:
+            print(f"Unknown stats command: {command}")
+        elif not any(stats.calls for stats in metrics.operations.values()) and not metrics.caches:
+            print("No operations recorded yet.")
+        else:
+            for line in metrics.summary():
+                print(line)
     
     def run(self) -> None:
         """Run the calculator CLI."""
@@ -266,14 +739,235 @@ Examples:
             except Exception as e:
                 print(f"Unexpected error: {e}")
         
+        self.calculator.close()
         print("Calculator closed.")
+    
+    def evaluate_lines(self, lines: Iterable[str], start: int = 1) -> Iterator[BatchRow]:
+        """Evaluate expressions lazily, yielding (line number, expression, result, error)."""
+        try_parse_expression = self.try_parse_expression
+        for number, line in enumerate(lines, start):
+            expression = line.strip().lower()
+            if not expression or expression.startswith('#'):
+                continue
+            try:
+                result, code, message = try_parse_expression(expression)
+            except Exception as e:
+                yield number, expression, None, f"Invalid input: {e}"
+            else:
+                yield number, expression, result, message
+    
+    def run_batch(self, source: IO[str], output: IO[str], output_format: str = 'plain') -> int:
+        """
+        Evaluate every line of source and write one result per expression.
+        
+        Lines are streamed through a generator pipeline and written in chunks,
+        so memory use does not depend on the input size. Blank lines and lines
+        starting with '#' are skipped. Returns the number of failed lines.
+        """
+        return write_batch(self.evaluate_lines(source), output, output_format)
+
+
+class _CSVLine:
+    """Minimal file-like sink so csv.writer can format one row to a string."""
+    
+    def __init__(self):
+        self.value = ''
+    
+    def write(self, text: str) -> None:
+        self.value = text
+
+
+_csv_line = _CSVLine()
+_csv_writer = None  # created by write_batch on first use
+
+
+def _format_plain(row: BatchRow) -> str:
+    number, expression, result, error = row
+    if error is not None:
+        return f"error: {error}\n"
+    return f"{result}\n"
+
+
+def _format_csv(row: BatchRow) -> str:
+    number, expression, result, error = row
+    _csv_writer.writerow((number, expression, '' if result is None else result, error or ''))
+    return _csv_line.value
+
+
+def _format_json(row: BatchRow) -> str:
+    import json
+    
+    number, expression, result, error = row
+    if error is not None:
+        return json.dumps({"line": number, "expression": expression, "error": error}) + "\n"
+    return json.dumps({"line": number, "expression": expression, "result": result}) + "\n"
+
+
+BATCH_FORMATTERS = {
+    'plain': _format_plain,
+    'csv': _format_csv,
+    'json': _format_json,
+}
 
 
-def main():
+def write_batch(rows: Iterable[BatchRow], output: IO[str], output_format: str = 'plain') -> int:
+    """Format rows and write them in chunks; returns the number of failed rows."""
+    global _csv_writer
+    formatter = BATCH_FORMATTERS[output_format]
+    errors = 0
+    chunk: List[str] = []
+    write = output.write
+    if output_format == 'csv':
+        if _csv_writer is None:
+            import csv
+            _csv_writer = csv.writer(_csv_line, lineterminator='\n')
+        write("line,expression,result,error\n")
+    for row in rows:
+        if row[3] is not None:
+            errors += 1
+        chunk.append(formatter(row))
+        if len(chunk) >= BATCH_CHUNK_LINES:
+            write(''.join(chunk))
+            chunk.clear()
+    write(''.join(chunk))
+    output.flush()
+    return errors
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line argument parser."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Python calculator")
+    parser.add_argument('expression', nargs='*',
+                        help="evaluate this expression, print the result and exit")
+    parser.add_argument('-e', '--eval', action='append', metavar='EXPR',
+                        help="evaluate EXPR and print the result (repeatable)")
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="evaluate expressions from FILE (default: stdin) without prompts")
+    parser.add_argument('--format', choices=sorted(BATCH_FORMATTERS), default='plain',
+                        help="batch output format (default: plain)")
+    parser.add_argument('--output', '-o', metavar='FILE',
+                        help="write batch results to FILE instead of stdout")
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help="evaluate batch input on N worker processes (default: 1)")
+    parser.add_argument('--chunk-size', type=int, default=10000, metavar='LINES',
+                        help="lines per work unit when --workers > 1 (default: 10000)")
+    parser.add_argument('--history-file', metavar='FILE',
+                        help="keep the interactive history in FILE across sessions")
+    parser.add_argument('--cache', metavar='FILE',
+                        help="reuse results stored in the SQLite cache FILE, and store new ones")
+    parser.add_argument('--daemon', action='store_true',
+                        help="evaluate the expressions in a background daemon, starting it if needed")
+    return parser
+
+
+def run_batch_mode(args: argparse.Namespace) -> int:
+    """Run non-interactive batch evaluation for the parsed arguments."""
+    source = sys.stdin
+    output = sys.stdout
+    try:
+        calculator = Calculator(result_cache=args.cache) if args.cache else None
+        cli = CalculatorCLI(interactive=False, calculator=calculator)
+        if args.batch != '-':
+            source = open(args.batch, 'r', encoding='utf-8', buffering=BATCH_BUFFER_SIZE)
+        if args.output:
+            output = open(args.output, 'w', encoding='utf-8', buffering=BATCH_BUFFER_SIZE)
+        if args.workers > 1:
+            from calculator_parallel import evaluate_parallel
+            rows = evaluate_parallel(source, args.workers, args.chunk_size,
+                                     result_cache=args.cache)
+            write_batch(rows, output, args.format)
+        else:
+            cli.run_batch(source, output, args.format)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+def run_one_shot(expressions: List[str], calculator: Optional[Calculator] = None) -> int:
+    """Evaluate expressions in order, printing one result each; 1 if any failed."""
+    if calculator is None:
+        calculator = Calculator(history_capacity=0)
+    cli = CalculatorCLI(interactive=False, calculator=calculator)
+    status = 0
+    for expression in expressions:
+        try:
+            result, code, message = cli.try_parse_expression(expression.strip().lower())
+        except Exception as e:
+            code, message = INVALID_INPUT, f"Invalid input: {e}"
+        if code:
+            print(f"Error: {message}", file=sys.stderr)
+            status = 1
+        else:
+            print(result)
+    cli.calculator.close()
+    return status
+
+
+def _one_shot_arguments(argv: List[str]) -> Optional[List[str]]:
+    """
+    Expressions of a plain one-shot command line, or None.
+    
+    Recognizes 'EXPR...' and '-e EXPR [-e EXPR...]' without importing
+    argparse; anything else goes through the full parser.
+    """
+    if not argv:
+        return None
+    if argv[0] in ('-e', '--eval'):
+        if len(argv) % 2 or any(flag not in ('-e', '--eval') for flag in argv[::2]):
+            return None
+        return argv[1::2]
+    if any(arg.startswith('-') and not arg[1:2].isdigit() for arg in argv):
+        return None
+    return [' '.join(argv)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
     """Main function to run the calculator CLI."""
-    cli = CalculatorCLI()
+    if argv is None:
+        argv = sys.argv[1:]
+    daemon = argv[:1] == ['--daemon']
+    expressions = _one_shot_arguments(argv[1:] if daemon else argv)
+    if expressions is not None:
+        if daemon:
+            from calculator_client import run_client
+            return run_client(expressions)
+        return run_one_shot(expressions)
+    args = build_parser().parse_args(argv)
+    if args.batch is not None:
+        return run_batch_mode(args)
+    calculator = None
+    options = {}
+    if args.history_file:
+        options.update(history_capacity=None, history_path=args.history_file)
+    if args.cache:
+        options['result_cache'] = args.cache
+    if options:
+        try:
+            calculator = Calculator(**options)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+    expressions = (args.eval or []) + ([' '.join(args.expression)] if args.expression else [])
+    if args.daemon:
+        if not expressions:
+            print("Error: --daemon needs an expression", file=sys.stderr)
+            return 2
+        from calculator_client import run_client
+        return run_client(expressions)
+    if expressions:
+        return run_one_shot(expressions, calculator)
+    cli = CalculatorCLI(calculator=calculator)
     cli.run()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
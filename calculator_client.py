@@ -0,0 +1,153 @@
+"""
+Calculator Daemon Client
+Thin client that forwards expressions to the calculator daemon.
+
+The client is what runs on every CLI call, so it imports only os, sys and
+the _socket extension (the socket module would pull in enum and friends);
+main also reuses calculator_cli's command-line handling, so both entry
+points accept exactly the same arguments.
+If no daemon is listening it spawns one (see calculator_daemon.py) and
+waits for its socket. The daemon speaks the calculator server's line
+protocol and keeps one Calculator, so memory and history survive between
+calls until the daemon exits after its idle timeout.
+"""
+
+import os
+import stat
+import sys
+import _socket
+
+
+DEFAULT_IDLE_TIMEOUT = 300.0
+SPAWN_TIMEOUT = 5.0
+READ_SIZE = 1 << 16
+
+
+def default_socket_path() -> str:
+    """$CALCULATOR_SOCKET, or calculator.sock in a per-user runtime directory."""
+    path = os.environ.get('CALCULATOR_SOCKET')
+    if path:
+        return path
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if not directory:
+        directory = os.path.join(os.environ.get('TMPDIR', '/tmp'), f"calculator-{os.getuid()}")
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private_directory(directory)
+    return os.path.join(directory, 'calculator.sock')
+
+
+def _check_private_directory(directory: str) -> None:
+    """Raise PermissionError unless directory is a real directory only we can use."""
+    # In a shared /tmp anyone may have created the directory before us
+    info = os.lstat(directory)
+    if (not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid()
+            or info.st_mode & 0o077):
+        raise PermissionError(
+            f"{directory} is not a private directory owned by this user; "
+            "remove it or set CALCULATOR_SOCKET")
+
+
+def connect(path: str):
+    """Connect to the daemon's socket; raises OSError if nobody listens."""
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def spawn_daemon(path: str, idle_timeout: float = DEFAULT_IDLE_TIMEOUT) -> None:
+    """Start a detached daemon for path and wait until it accepts connections."""
+    import subprocess
+    import time
+    
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calculator_daemon.py')
+    subprocess.Popen(
+        [sys.executable, script, '--socket', path, '--idle-timeout', str(idle_timeout)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True)
+    deadline = time.monotonic() + SPAWN_TIMEOUT
+    while True:
+        try:
+            connect(path).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.005)
+
+
+def _exchange(sock, payload: bytes) -> bytes:
+    """Send payload and read the response until the daemon closes."""
+    try:
+        sock.sendall(payload)
+        chunks = []
+        while True:
+            data = sock.recv(READ_SIZE)
+            if not data:
+                return b''.join(chunks)
+            chunks.append(data)
+    finally:
+        sock.close()
+
+
+def request(lines, path=None, spawn=True, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+    """
+    Send request lines to the daemon and return its response lines.
+    
+    A daemon is spawned only if none accepts the connection, before anything
+    is sent. Once the request is sent it is never resent, since the daemon
+    may already have evaluated some of it; a missing or truncated response
+    raises ConnectionError.
+    """
+    if path is None:
+        path = default_socket_path()
+    # ':quit' is the server's control message (CONTROL_PREFIX, not imported to stay light)
+    payload = (''.join(line.replace('\n', ' ') + '\n' for line in lines) + ':quit\n').encode('utf-8')
+    try:
+        sock = connect(path)
+    except OSError:
+        if not spawn:
+            raise
+        spawn_daemon(path, idle_timeout)
+        sock = connect(path)
+    response = _exchange(sock, payload)
+    responses = response.decode('utf-8').splitlines()
+    if len(responses) != len(lines) or (response and not response.endswith(b'\n')):
+        raise ConnectionError(
+            f"Daemon closed the connection after {len(responses)} of {len(lines)} responses")
+    return responses
+
+
+def run_client(expressions, path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT) -> int:
+    """Evaluate expressions on the daemon, printing results like one-shot mode."""
+    try:
+        responses = request(expressions, path, idle_timeout=idle_timeout)
+    except OSError as e:
+        print(f"Error: cannot reach calculator daemon: {e}", file=sys.stderr)
+        return 2
+    status = 0
+    for response in responses:
+        kind, _, text = response.partition(' ')
+        if kind == 'ok':
+            print(text)
+        else:
+            print(f"Error: {text}", file=sys.stderr)
+            status = 1
+    return status
+
+
+def main(argv=None) -> int:
+    """Entry point for 'calc.py --daemon EXPR...' and '--daemon -e EXPR...'."""
+    from calculator_cli import _one_shot_arguments, main as cli_main
+    
+    if argv is None:
+        argv = sys.argv[1:]
+    args = [arg for arg in argv if arg != '--daemon']
+    expressions = _one_shot_arguments(args)
+    if expressions is None:
+        # Anything but plain expressions goes through the full CLI parser
+        return cli_main(['--daemon'] + args)
+    return run_client(expressions)
\ No newline at end of file
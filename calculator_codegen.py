@@ -0,0 +1,244 @@
+"""
+Calculator Code Generation
+Compiles an expression with named parameters into a Python function, for
+evaluating one formula over many inputs.
+
+The expression is parsed once and translated to straight-line Python source,
+one statement per operation, with the math functions, error codes and the
+history recorder bound as closure variables:
+
+    f = calculator.compile("sqrt(x^2 + y^2)", params=["x", "y"])
+    f(3, 4)  # 5.0
+
+The generated code applies the same domain checks as the Calculator methods
+and raises the same CalculatorError (with the same code). Arguments are
+converted to float on entry, as the CLI would pass them. By default every
+operation is recorded in the calculator's history, like interpreted
+evaluation; history=False skips it. Memoization and metrics are not
+applied to compiled functions. Operators outside the built-in set (plugin
+operators) are called through their handler on the calculator.
+"""
+
+from __future__ import annotations
+
+import math
+
+from calculator import (
+    DIVISION_BY_ZERO, DOMAIN_ERROR, ERROR_MESSAGES, FACTORIAL_DOMAIN, FACTORIAL_TOO_LARGE,
+    INVALID_LOG_BASE, MODULO_BY_ZERO, NEGATIVE_SQUARE_ROOT, NON_POSITIVE_LOG, POWER_DOMAIN,
+    POWER_OVERFLOW,
+    Calculator, CalculatorError,
+)
+from calculator_expr import ast_variables, normalize, parse
+from calculator_factorial import MAX_FLOAT_FACTORIAL
+from calculator_history import (
+    OP_ADD, OP_COS, OP_COS_DEG, OP_DIVIDE, OP_FACTORIAL, OP_LN, OP_LOG, OP_LOG10, OP_MODULO,
+    OP_MULTIPLY, OP_POWER, OP_SIN, OP_SIN_DEG, OP_SQUARE_ROOT, OP_SUBTRACT, OP_TAN, OP_TAN_DEG,
+)
+from calculator_operators import _factorial
+from calculator_variables import is_variable_name
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+# Names bound in the closure of every generated function
+_NAMESPACE = {
+    '_float': float, '_int': int, '_Error': CalculatorError,
+    '_sqrt': math.sqrt, '_sin': math.sin, '_cos': math.cos, '_tan': math.tan,
+    '_radians': math.radians, '_log': math.log, '_log10': math.log10,
+    '_fact': math.factorial, '_isfinite': math.isfinite,
+}
+_NAMESPACE.update((f'_E{code}', code) for code in (
+    DIVISION_BY_ZERO, MODULO_BY_ZERO, NEGATIVE_SQUARE_ROOT, NON_POSITIVE_LOG, INVALID_LOG_BASE,
+    POWER_OVERFLOW, POWER_DOMAIN, FACTORIAL_DOMAIN, FACTORIAL_TOO_LARGE, DOMAIN_ERROR))
+
+# Calculator method -> (Python expression, history op); {0}, {1} are the arguments
+_INLINE = {
+    'add': ('{0} + {1}', OP_ADD),
+    'subtract': ('{0} - {1}', OP_SUBTRACT),
+    'multiply': ('{0} * {1}', OP_MULTIPLY),
+    'divide': ('{0} / {1}', OP_DIVIDE),
+    'modulo': ('{0} % {1}', OP_MODULO),
+    'square_root': ('_sqrt({0})', OP_SQUARE_ROOT),
+    'log10': ('_log10({0})', OP_LOG10),
+}
+_TRIG = {
+    'sin': (OP_SIN, OP_SIN_DEG),
+    'cos': (OP_COS, OP_COS_DEG),
+    'tan': (OP_TAN, OP_TAN_DEG),
+}
+
+
+def _raise(code: int) -> str:
+    return f"raise _Error({ERROR_MESSAGES[code]!r}, _E{code})"
+
+
+class _Generator:
+    """Translates an AST into the statements of the generated function."""
+    
+    def __init__(self, params: Dict[str, str], history: bool):
+        self.params = params
+        self.history = history
+        self.lines: List[str] = []
+        self.constants: Dict[str, Any] = {}
+        self.temps = 0
+    
+    def temp(self) -> str:
+        name = f"_t{self.temps}"
+        self.temps += 1
+        return name
+    
+    def emit(self, line: str, indent: int = 1) -> None:
+        self.lines.append('    ' * indent + line)
+    
+    def bind(self, value: Any) -> str:
+        """Closure name for a value that has no literal form."""
+        name = f"_k{len(self.constants)}"
+        self.constants[name] = value
+        return name
+    
+    def guard(self, condition: str, code: int, *operands: str) -> None:
+        """Raise code when condition holds; decided now if the operands are constants."""
+        if any(operand.startswith('_') for operand in operands):
+            self.emit(f"if {condition}: {_raise(code)}")
+        elif eval(condition, {'_int': int, '_isfinite': math.isfinite}):
+            self.emit(_raise(code))
+    
+    def record(self, op: int, args: Sequence[str], result: str, b: str = '0.0') -> None:
+        if self.history:
+            self.emit(f"_record({op}, {args[0]}, {args[1] if len(args) > 1 else b}, {result})")
+    
+    def node(self, node: tuple) -> str:
+        """Emit statements computing node; returns the name or literal holding it."""
+        kind = node[0]
+        if kind == 'num':
+            value = node[1]
+            return repr(value) if math.isfinite(value) and value >= 0 else self.bind(value)
+        if kind == 'var':
+            return self.params[node[1]]
+        if kind == 'neg':
+            operand = self.node(node[1])
+            result = self.temp()
+            self.emit(f"{result} = -{operand}")
+            return result
+        _, operator, args, degrees = node
+        args = [self.node(arg) for arg in args]
+        result = self.temp()
+        handler = operator.handler
+        if handler in _INLINE:
+            template, op = _INLINE[handler]
+            if handler == 'divide':
+                self.guard(f"{args[1]} == 0", DIVISION_BY_ZERO, args[1])
+            elif handler == 'modulo':
+                self.guard(f"{args[1]} == 0", MODULO_BY_ZERO, args[1])
+            elif handler == 'square_root':
+                self.guard(f"{args[0]} < 0", NEGATIVE_SQUARE_ROOT, args[0])
+            elif handler == 'log10':
+                self.guard(f"{args[0]} <= 0", NON_POSITIVE_LOG, args[0])
+            self.emit(f"{result} = {template.format(*args)}")
+            self.record(op, args, result)
+        elif handler == 'power':
+            # Same error mapping as calculator._power
+            self.emit("try:")
+            self.emit(f"{result} = _float({args[0]} ** {args[1]})", 2)
+            self.emit("except ZeroDivisionError as e:")
+            self.emit(f"raise _Error(f'Power operation failed: {{e}}', _E{DIVISION_BY_ZERO}) from None", 2)
+            self.emit("except OverflowError as e:")
+            self.emit(f"raise _Error(f'Power operation failed: {{e}}', _E{POWER_OVERFLOW}) from None", 2)
+            self.emit("except ValueError as e:")
+            self.emit(f"raise _Error(f'Power operation failed: {{e}}', _E{POWER_DOMAIN}) from None", 2)
+            self.emit("except TypeError:")  # float() of the complex power of a negative base
+            self.emit(_raise(POWER_DOMAIN), 2)
+            self.record(OP_POWER, args, result)
+        elif handler in _TRIG:
+            self.guard(f"not _isfinite({args[0]})", DOMAIN_ERROR, args[0])
+            angle = f"_radians({args[0]})" if degrees else args[0]
+            self.emit(f"{result} = _{handler}({angle})")
+            self.record(_TRIG[handler][degrees], args, result)
+        elif handler == 'log':
+            self.guard(f"{args[0]} <= 0", NON_POSITIVE_LOG, args[0])
+            if len(args) == 1:
+                self.emit(f"{result} = _log({args[0]})")
+                self.record(OP_LN, args, result)
+            else:
+                self.guard(f"{args[1]} <= 0 or {args[1]} == 1", INVALID_LOG_BASE, args[1])
+                self.emit(f"{result} = _log({args[0]}, {args[1]})")
+                self.record(OP_LOG, args, result)
+        elif handler is _factorial:
+            self.guard(f"not _isfinite({args[0]})", DOMAIN_ERROR, args[0])
+            self.guard(f"{args[0]} < 0 or {args[0]} != _int({args[0]})", FACTORIAL_DOMAIN, args[0])
+            self.guard(f"{args[0]} > {MAX_FLOAT_FACTORIAL}", FACTORIAL_TOO_LARGE, args[0])
+            self.emit(f"{result} = _fact(_int({args[0]}))")
+            self.record(OP_FACTORIAL, [f"_int({args[0]})"], result, '0')
+            self.emit(f"{result} = _float({result})")
+        else:
+            # Plugin operator: run its check and handler like the interpreter does
+            call_args = ', '.join(args) + (', degrees=True' if degrees else '')
+            if operator.check is not None:
+                check = self.bind(operator.check)
+                code = self.temp()
+                self.emit(f"{code} = {check}({', '.join(args)})")
+                self.emit(f"if {code}: raise _Error(None, {code})")
+            if isinstance(handler, str):
+                self.emit(f"{result} = _float(_calculator.{handler}({call_args}))")
+            else:
+                self.emit(f"{result} = _float({self.bind(handler)}(_calculator, {call_args}))")
+        return result
+
+
+def compile_function(expression: str, params: Optional[Sequence[str]] = None,
+                     calculator: Optional[Calculator] = None,
+                     history: bool = True) -> Callable[..., float]:
+    """
+    Compile expression into a function of params returning a float.
+    
+    params defaults to the expression's variables in order of first use.
+    Raises ValueError for a malformed expression, an invalid or repeated
+    parameter name, or a variable that is not a parameter. The generated
+    Python source is available as the function's python_source attribute.
+    """
+    source = normalize(expression)
+    ast = parse(source)
+    used = ast_variables(ast)
+    if params is None:
+        params = used
+    params = list(params)
+    for name in params:
+        if not is_variable_name(name):
+            raise ValueError(f"Invalid parameter name: {name}")
+    if len(set(params)) != len(params):
+        raise ValueError("Duplicate parameter name")
+    missing = [name for name in used if name not in params]
+    if missing:
+        raise ValueError(f"Undefined variable: {', '.join(missing)}")
+    if calculator is None:
+        calculator = Calculator(history_capacity=0)
+    
+    # Parameters become _p0, _p1, ... so no name can clash with the generated code
+    arguments = {name: f"_p{i}" for i, name in enumerate(params)}
+    generator = _Generator(arguments, history)
+    for name in arguments.values():
+        generator.emit(f"{name} = _float({name})")
+    result = generator.node(ast)
+    generator.emit(f"return {result}")
+    
+    namespace = dict(_NAMESPACE, **generator.constants)
+    namespace['_calculator'] = calculator
+    namespace['_record'] = calculator._add_to_history
+    closure = ', '.join(namespace)
+    python_source = '\n'.join([
+        f"def _factory({closure}):",
+        f"    def compiled({', '.join(arguments.values())}):",
+        *('    ' + line for line in generator.lines),
+        "    return compiled",
+    ])
+    scope: Dict[str, Any] = {}
+    exec(compile(python_source, f"<compiled {source!r}>", 'exec'), scope)
+    function = scope['_factory'](**namespace)
+    function.__doc__ = f"{source} as a function of ({', '.join(params)})"
+    function.expression = source
+    function.params = tuple(params)
+    function.python_source = python_source
+    return function
\ No newline at end of file
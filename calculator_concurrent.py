@@ -0,0 +1,320 @@
+"""
+Calculator Concurrency
+Thread-safe Calculator with per-thread history shards and atomic memory.
+
+Consistency model:
+
+- Each thread records into its own History shard, guarded by a per-shard
+  lock that only readers ever contend for, so recording scales with the
+  number of threads (on the free-threaded build) instead of serializing on
+  one lock. Reads merge the shards by timestamp; a read sees every record
+  completed before it started, and records from different threads that
+  share a timestamp are ordered by shard.
+- Memory operations are atomic read-modify-write updates under one lock, so
+  concurrent memory_add / memory_subtract calls never lose an update.
+- last_result is per thread: get_last_result() returns the result of the
+  calling thread's most recent operation.
+- The history capacity applies to each shard separately.
+- When a thread exits, its shard is merged into one shared tail of the
+  records of exited threads (bounded by the same capacity, dropping the
+  oldest) and removed, so short-lived worker threads do not accumulate
+  shards. The merge copies the tail, so it costs O(capacity) per exit.
+- History queries keep a HistoryIndex per shard, refreshed incrementally,
+  and merge the matches of the shards by timestamp. HistoryEntry.seq is a
+  position within the entry's shard.
+"""
+
+from __future__ import annotations
+
+import heapq
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, List, Optional, Union
+
+from calculator import Calculator
+from calculator_history import (
+    DEFAULT_CAPACITY, OP_MEMORY_ADD, OP_MEMORY_CLEAR, OP_MEMORY_RECALL, OP_MEMORY_STORE,
+    OP_MEMORY_SUBTRACT, History, render_record,
+)
+
+if TYPE_CHECKING:
+    from calculator_history import Record, TimedRecord
+    from calculator_query import HistoryEntry, HistoryQuery
+
+
+class _Shard:
+    """One thread's history, the lock readers take to copy it and its query index."""
+    
+    __slots__ = ('history', 'lock', 'index')
+    
+    def __init__(self, history: History):
+        self.history = history
+        self.lock = threading.Lock()
+        self.index = None
+
+
+class _ThreadExit:
+    """Kept in a thread-local; collected, and so finalized, when its thread exits."""
+    
+    __slots__ = ('__weakref__',)
+
+
+class ShardedHistory:
+    """History interface over per-thread History shards."""
+    
+    def __init__(self, capacity: Optional[int] = DEFAULT_CAPACITY,
+                 policy: str = 'overwrite'):
+        History(capacity, policy)  # validate the arguments up front
+        self.capacity = capacity
+        self.policy = policy
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        # Records of exited threads; replaced, never modified, once readers may see it
+        self._tail = _Shard(History(capacity))
+        self._retired_evicted = 0
+        self._shards_lock = threading.Lock()
+        self._tail_lock = threading.Lock()  # serializes replacing the tail
+    
+    def shard(self) -> _Shard:
+        """Return the calling thread's shard, creating it on first use."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard(History(self.capacity, self.policy))
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            self._local.exit = token = _ThreadExit()
+            finalizer = weakref.finalize(token, _retire, weakref.ref(self), shard)
+            finalizer.atexit = False
+            return shard
+    
+    def _retire(self, shard: _Shard) -> None:
+        """Merge the shard of an exited thread into a new tail and drop it."""
+        with self._tail_lock:
+            tail = History(self.capacity)
+            tail.extend_timed(heapq.merge(self._tail.history.iter_timed(),
+                                          shard.history.iter_timed(), key=_timestamp))
+            # Readers see either the old tail and the shard, or the new tail alone
+            with self._shards_lock:
+                self._retired_evicted += shard.history.evicted + tail.evicted
+                self._tail = _Shard(tail)
+                self._shards.remove(shard)
+    
+    def __len__(self) -> int:
+        total = 0
+        for shard in self._snapshot_shards():
+            with shard.lock:
+                total += len(shard.history)
+        return total
+    
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_text()
+    
+    def __getitem__(self, index: int) -> str:
+        records = self.merged()
+        return render_record(*records[index][1:])
+    
+    @property
+    def evicted(self) -> int:
+        with self._shards_lock:
+            return self._retired_evicted + sum(shard.history.evicted for shard in self._shards)
+    
+    def record(self, op: int, a: Any = 0.0, b: Any = 0.0, result: Any = 0.0) -> None:
+        """Append a structured record to the calling thread's shard."""
+        shard = self.shard()
+        with shard.lock:
+            shard.history.record(op, a, b, result)
+    
+    def append(self, text: str) -> None:
+        """Append a free-form text record to the calling thread's shard."""
+        shard = self.shard()
+        with shard.lock:
+            shard.history.append(text)
+    
+    def extend_records(self, records: Iterable[Record]) -> None:
+        """Append (op, a, b, result) tuples to the calling thread's shard."""
+        shard = self.shard()
+        with shard.lock:
+            shard.history.extend_records(records)
+    
+    def extend_timed(self, records: Iterable[TimedRecord]) -> None:
+        """Append (timestamp, op, a, b, result) tuples to the calling thread's shard."""
+        shard = self.shard()
+        with shard.lock:
+            shard.history.extend_timed(records)
+    
+    def clear(self) -> None:
+        """Remove all records from every shard and the tail."""
+        with self._tail_lock, self._shards_lock:
+            self._tail = _Shard(History(self.capacity))
+        for shard in self._snapshot_shards():
+            with shard.lock:
+                shard.history.clear()
+    
+    def merged(self) -> List[TimedRecord]:
+        """All records of all shards as (timestamp, op, a, b, result), oldest first."""
+        runs = []
+        for shard in self._snapshot_shards():
+            with shard.lock:
+                runs.append(list(shard.history.iter_timed()))
+        return list(heapq.merge(*runs, key=_timestamp))
+    
+    def iter_timed(self, last: Optional[int] = None) -> Iterator[TimedRecord]:
+        """Yield merged (timestamp, op, a, b, result) tuples, oldest first."""
+        records = self.merged()
+        if last is not None:
+            records = records[max(len(records) - last, 0):]
+        return iter(records)
+    
+    def iter_records(self, last: Optional[int] = None) -> Iterator[Record]:
+        """Yield merged (op, a, b, result) tuples, oldest first."""
+        for record in self.iter_timed(last):
+            yield record[1:]
+    
+    def iter_text(self, last: Optional[int] = None) -> Iterator[str]:
+        """Yield rendered entries, oldest first, optionally only the last n."""
+        for record in self.iter_timed(last):
+            yield render_record(*record[1:])
+    
+    def render(self) -> List[str]:
+        """Render the merged history as a list of strings."""
+        return list(self.iter_text())
+    
+    def snapshot(self) -> History:
+        """A single unbounded History holding the merged records."""
+        history = History(None)
+        history.extend_timed(self.merged())
+        return history
+    
+    def close(self) -> None:
+        """Nothing to release for an in-memory history."""
+    
+    def find(self, query: HistoryQuery, last: Optional[int] = None) -> List[HistoryEntry]:
+        """Matching records of every shard, oldest first, optionally only the last n."""
+        from calculator_query import HistoryIndex
+        
+        runs = self._per_shard(HistoryIndex.find, query, last)
+        entries = list(heapq.merge(*runs, key=_timestamp_of_entry))
+        if last is not None:
+            entries = entries[max(len(entries) - last, 0):]
+        return entries
+    
+    def aggregate(self, func: str, query: HistoryQuery) -> Optional[float]:
+        """count, sum, min, max or mean of the numeric results of the matches."""
+        from calculator_query import AGGREGATES, HistoryIndex, aggregate_values
+        
+        if func not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {func}")
+        if func == 'count':
+            return sum(self._per_shard(HistoryIndex.count, query))
+        runs = self._per_shard(HistoryIndex.values, query)
+        return aggregate_values(func, [value for run in runs for value in run])
+    
+    def _per_shard(self, method: Callable[..., Any], *args: Any) -> List[Any]:
+        """method(index, *args) for the query index of every shard, under the shard's lock."""
+        from calculator_query import HistoryIndex
+        
+        results = []
+        for shard in self._snapshot_shards():
+            with shard.lock:
+                if shard.index is None:
+                    shard.index = HistoryIndex(shard.history)
+                results.append(method(shard.index, *args))
+        return results
+    
+    def _snapshot_shards(self) -> List[_Shard]:
+        """The tail and the live shards."""
+        with self._shards_lock:
+            return [self._tail] + self._shards
+
+
+def _retire(ref: weakref.ref, shard: _Shard) -> None:
+    history = ref()
+    if history is not None:
+        history._retire(shard)
+
+
+def _timestamp(record: TimedRecord) -> float:
+    return record[0]
+
+
+def _timestamp_of_entry(entry: HistoryEntry) -> float:
+    return entry.timestamp
+
+
+class ConcurrentCalculator(Calculator):
+    """
+    Calculator that can be shared between threads.
+    
+    See the module docstring for the consistency model. Persistent history
+    and memoization are not available because neither backend is thread-safe.
+    History queries merge the matches of each shard's index.
+    """
+    
+    def __init__(self, history_capacity: Optional[int] = DEFAULT_CAPACITY,
+                 history_policy: str = 'overwrite', metrics=None):
+        """Initialize the calculator with empty memory and sharded history."""
+        self._local = threading.local()
+        self._memory_lock = threading.Lock()
+        super().__init__(0, history_policy, metrics=metrics)
+        self.history = ShardedHistory(history_capacity, history_policy)
+    
+    @property
+    def last_result(self) -> Optional[float]:
+        return getattr(self._local, 'last_result', None)
+    
+    @last_result.setter
+    def last_result(self, value: Optional[float]) -> None:
+        self._local.last_result = value
+    
+    def _add_to_history(self, op: int, a, b, result) -> None:
+        """Record an operation in the calling thread's history shard."""
+        shard = self.history.shard()
+        with shard.lock:
+            shard.history.record(op, a, b, result)
+        self._local.last_result = result
+    
+    def _query(self, filters):
+        """The sharded history, which queries the index of each shard, and the query."""
+        from calculator_query import make_query
+        
+        return self.history, make_query(**filters)
+    
+    # Memory operations
+    def memory_store(self, value: Union[int, float]) -> None:
+        """Store a value in memory."""
+        with self._memory_lock:
+            self.memory = float(value)
+        self.history.record(OP_MEMORY_STORE, value)
+    
+    def memory_recall(self) -> float:
+        """Recall the value stored in memory."""
+        value = self.memory
+        self.history.record(OP_MEMORY_RECALL, 0.0, 0.0, value)
+        return value
+    
+    def memory_clear(self) -> None:
+        """Clear the memory."""
+        with self._memory_lock:
+            self.memory = 0.0
+        self.history.record(OP_MEMORY_CLEAR)
+    
+    def memory_add(self, value: Union[int, float]) -> None:
+        """Atomically add a value to memory."""
+        with self._memory_lock:
+            self.memory = memory = self.memory + float(value)
+        self.history.record(OP_MEMORY_ADD, value, 0.0, memory)
+    
+    def memory_subtract(self, value: Union[int, float]) -> None:
+        """Atomically subtract a value from memory."""
+        with self._memory_lock:
+            self.memory = memory = self.memory - float(value)
+        self.history.record(OP_MEMORY_SUBTRACT, value, 0.0, memory)
+    
+    def reset(self) -> None:
+        """Reset the calculator (clear memory and every history shard)."""
+        with self._memory_lock:
+            self.memory = 0.0
+        self.history.clear()
+        self.last_result = None
\ No newline at end of file
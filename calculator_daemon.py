@@ -0,0 +1,222 @@
+"""
+Calculator Daemon
+Background calculator server on a Unix domain socket for repeated CLI calls.
+
+The daemon is CalculatorServer listening on a Unix socket instead of TCP,
+with every connection bound to one shared session, so memory, history and
+last_result persist from one `calc.py --daemon ...` call to the next. It is
+normally started on demand by calculator_client and exits on its own once no
+request has arrived for the idle timeout.
+
+A lock file next to the socket (<socket>.pid) holds the daemon's PID under
+an exclusive flock, so only one daemon serves a socket path; a second daemon
+started for the same path exits immediately, and a socket file left behind
+by a crashed daemon is replaced by the next one.
+
+Besides the server's requests the daemon accepts:
+
+    mr                ->  ok <memory>   (memory recall)
+    mc                ->  ok Memory cleared.
+    :shutdown         ->  ok shutdown   (the daemon exits)
+
+Like the server's control messages, :shutdown carries the control prefix, so
+`calc.py --daemon shutdown` is evaluated as an expression and cannot stop the
+daemon.
+"""
+
+import argparse
+import asyncio
+import fcntl
+import os
+import sys
+import time
+from typing import Optional
+
+from calculator_client import DEFAULT_IDLE_TIMEOUT, default_socket_path, request
+from calculator_server import CONTROL_PREFIX, MAX_LINE_LENGTH, CalculatorServer
+
+
+SESSION = 'default'
+
+
+class DaemonRunning(Exception):
+    """Another daemon holds the lock for this socket path."""
+
+
+class PidFile:
+    """Exclusively locked file holding the daemon's PID."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+    
+    def acquire(self) -> None:
+        """Lock the file and write our PID; raises DaemonRunning if held."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise DaemonRunning(f"Daemon already running (lock held on {self.path})") from None
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode('ascii'))
+        self._fd = fd
+    
+    def release(self) -> None:
+        """Remove the file while still holding the lock, then unlock it."""
+        if self._fd is None:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        os.close(self._fd)
+        self._fd = None
+
+
+def read_pid(path: str) -> Optional[int]:
+    """PID recorded in a lock file, or None if there is none."""
+    try:
+        with open(path, 'r', encoding='ascii') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class CalculatorDaemon(CalculatorServer):
+    """Calculator server on a Unix socket that exits when idle."""
+    
+    def __init__(self, path: str, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        super().__init__(max_sessions=1)
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.connections = 0
+        self.last_activity = time.monotonic()
+        self.pid_file = PidFile(path + '.pid')
+        self._stop: Optional[asyncio.Event] = None
+    
+    async def start(self) -> None:
+        """Take the lock, replace any stale socket file and start listening."""
+        self.pid_file.acquire()
+        try:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            umask = os.umask(0o077)
+            try:
+                self._server = await asyncio.start_unix_server(
+                    self.handle_connection, self.path, limit=MAX_LINE_LENGTH)
+            finally:
+                os.umask(umask)
+        except BaseException:
+            self.pid_file.release()
+            raise
+        self._stop = asyncio.Event()
+    
+    def close(self) -> None:
+        """Stop accepting connections and remove the socket and lock files."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        self.pid_file.release()
+    
+    def new_state(self) -> dict:
+        """Every connection uses the daemon's single session."""
+        return {'cli': self.sessions.get(SESSION)}
+    
+    def respond(self, line: str, state: dict) -> Optional[str]:
+        """Evaluate one request line, handling the daemon's own commands as well."""
+        self.last_activity = time.monotonic()
+        command = line.strip().lower()
+        if command == 'mr':
+            return f"ok {state['cli'].calculator.memory_recall()}"
+        if command == 'mc':
+            state['cli'].calculator.memory_clear()
+            return "ok Memory cleared."
+        return super().respond(line, state)
+    
+    def control(self, name: str, argument: str, state: dict) -> Optional[str]:
+        """Handle the server's control messages and :shutdown."""
+        if name == 'shutdown' and not argument:
+            self._stop.set()
+            return "ok shutdown"
+        return super().control(name, argument, state)
+    
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Serve one client, counting it as activity for the idle timer."""
+        self.connections += 1
+        self.last_activity = time.monotonic()
+        try:
+            await super().handle_connection(reader, writer)
+        finally:
+            self.connections -= 1
+            self.last_activity = time.monotonic()
+    
+    async def run(self) -> None:
+        """Start (if needed) and serve until shut down or idle for idle_timeout."""
+        if self._server is None:
+            await self.start()
+        stop = self._stop
+        try:
+            while not stop.is_set():
+                remaining = self.last_activity + self.idle_timeout - time.monotonic()
+                if remaining <= 0 and not self.connections:
+                    break
+                try:
+                    await asyncio.wait_for(stop.wait(), max(remaining, 0.05))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line argument parser."""
+    parser = argparse.ArgumentParser(description="Calculator daemon on a Unix domain socket")
+    parser.add_argument('--socket', default=None, metavar='PATH',
+                        help="socket path (default: $CALCULATOR_SOCKET or a per-user path)")
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        metavar='SECONDS',
+                        help=f"exit after SECONDS without requests (default: {DEFAULT_IDLE_TIMEOUT:g})")
+    parser.add_argument('--stop', action='store_true', help="ask a running daemon to exit")
+    parser.add_argument('--status', action='store_true', help="report whether a daemon is running")
+    return parser
+
+
+def main(argv=None) -> int:
+    """Run the daemon in the foreground, or stop or query a running one."""
+    args = build_parser().parse_args(argv)
+    try:
+        path = args.socket or default_socket_path()
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if args.stop or args.status:
+        pid = read_pid(path + '.pid')
+        try:
+            message = 'shutdown' if args.stop else 'ping'
+            request([CONTROL_PREFIX + message], path, spawn=False)
+        except OSError:
+            print(f"No calculator daemon on {path}")
+            return 1
+        print(f"Calculator daemon {pid} on {path} {'stopped' if args.stop else 'running'}")
+        return 0
+    daemon = CalculatorDaemon(path, args.idle_timeout)
+    try:
+        asyncio.run(daemon.run())
+    except DaemonRunning as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
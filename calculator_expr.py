@@ -0,0 +1,495 @@
+"""
+Calculator Expression Compiler
+Tokenizer and precedence-climbing (Pratt) parser that compiles infix
+expressions to flat bytecode executed through Calculator methods.
+
+Operators and functions come from the registry in calculator_operators;
+any other name is a variable, read at evaluation time from the mapping
+passed to evaluate (see calculator_variables).
+"""
+
+from __future__ import annotations
+
+from calculator import (
+    CALCULATION_ERROR, DOMAIN_ERROR, ERROR_MESSAGES, INVALID_INPUT, OK, UNDEFINED_VARIABLE,
+    CalculatorError,
+)
+from calculator_operators import POSTFIX, PREFIX, PREFIX_BP, registry
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple, Union
+    
+    Instruction = Tuple[int, Any]
+    Token = Tuple[str, Any]
+
+
+# Token kinds
+NUMBER = 'number'
+NAME = 'name'
+OPERATOR = 'operator'
+END = 'end'
+
+# Character classes of the scanner (input is lower-cased by normalize)
+_DIGITS = frozenset('0123456789')
+_NAME_START = frozenset('abcdefghijklmnopqrstuvwxyz_')
+_NAME_CHARS = _NAME_START | _DIGITS
+_PUNCTUATION = frozenset('(),')
+
+# Bytecode instructions
+CONST = 0
+NEG = 1
+CALL = 2
+CALL_FUNCTION = 3
+LOAD = 4
+
+
+def tokenize(source: str) -> List[Token]:
+    """
+    Split a normalized expression into (kind, value) tokens.
+    
+    Numbers are digits with an optional fraction and exponent (5, 2.5, .5,
+    1e-3), names are [a-z_][a-z0-9_]* and operators the registry's symbol
+    tokens (one or two characters, longest first) or ( ) ,. A hand-written
+    scanner keeps the re module out of startup.
+    """
+    tokens: List[Token] = []
+    append = tokens.append
+    symbols = registry.symbols
+    pos = 0
+    length = len(source)
+    while pos < length:
+        char = source[pos]
+        if char == ' ' or char.isspace():
+            pos += 1
+        elif char in _DIGITS or char == '.':
+            start = pos
+            pos += 1
+            while pos < length and source[pos] in _DIGITS:
+                pos += 1
+            if char != '.' and pos < length and source[pos] == '.':
+                pos += 1
+                while pos < length and source[pos] in _DIGITS:
+                    pos += 1
+            elif char == '.' and pos == start + 1:
+                raise ValueError("Unexpected character: .")
+            if pos < length and source[pos] == 'e':
+                # Only an exponent if digits follow; otherwise 'e' is a name
+                end = pos + 1
+                if end < length and source[end] in '+-':
+                    end += 1
+                if end < length and source[end] in _DIGITS:
+                    while end < length and source[end] in _DIGITS:
+                        end += 1
+                    pos = end
+            append((NUMBER, float(source[start:pos])))
+        elif char in _NAME_START:
+            start = pos
+            pos += 1
+            while pos < length and source[pos] in _NAME_CHARS:
+                pos += 1
+            append((NAME, source[start:pos]))
+        elif source[pos:pos + 2] in symbols:
+            append((OPERATOR, source[pos:pos + 2]))
+            pos += 2
+        elif char in symbols or char in _PUNCTUATION:
+            append((OPERATOR, char))
+            pos += 1
+        else:
+            raise ValueError(f"Unexpected character: {char}")
+    append((END, None))
+    return tokens
+
+
+class _Parser:
+    """Pratt parser producing a tuple-based AST."""
+    
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.pos = 0
+    
+    def peek(self) -> Token:
+        return self.tokens[self.pos]
+    
+    def advance(self) -> Token:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+    
+    def expect(self, value: str) -> None:
+        kind, found = self.advance()
+        if found != value:
+            raise ValueError(f"Expected '{value}'")
+    
+    def parse(self) -> tuple:
+        node = self.expression(0)
+        kind, value = self.peek()
+        if kind != END:
+            if node[0] == 'var' and (kind == NUMBER or value == '('):
+                # 'foo 3' or 'foo(3)': a misspelled function rather than a variable
+                raise ValueError(f"Unknown function: {node[1]}")
+            raise ValueError(f"Unexpected token: {value}")
+        return node
+    
+    def expression(self, rbp: int) -> tuple:
+        left = self.prefix(*self.advance())
+        lookup = registry.lookup
+        while True:
+            kind, value = self.peek()
+            if kind not in (OPERATOR, NAME):
+                break
+            operator = lookup(value)
+            if operator is None or operator.kind == PREFIX or operator.precedence <= rbp:
+                break
+            self.advance()
+            if operator.kind == POSTFIX:
+                left = ('call', operator, (left,), False)
+                continue
+            bp = operator.precedence
+            right = self.expression(bp - 1 if operator.right_assoc else bp)
+            left = ('call', operator, (left, right), False)
+        return left
+    
+    def prefix(self, kind: str, value: Any) -> tuple:
+        if kind == NUMBER:
+            return ('num', value)
+        if value == '(':
+            node = self.expression(0)
+            self.expect(')')
+            return node
+        if value == '-':
+            operand = self.expression(PREFIX_BP)
+            if operand[0] == 'num':
+                return ('num', -operand[1])
+            return ('neg', operand)
+        if value == '+':
+            return self.expression(PREFIX_BP)
+        if kind == END:
+            raise ValueError("Incomplete expression")
+        if kind == NAME:
+            operator = registry.lookup(value)
+            if operator is None:
+                return ('var', value)
+            if operator.kind != PREFIX:
+                raise ValueError(f"Unknown function: {value}")
+            return self.function(operator)
+        raise ValueError(f"Unexpected token: {value}")
+    
+    def starts_operand(self) -> bool:
+        kind, value = self.peek()
+        if kind == NAME:
+            operator = registry.lookup(value)
+            return operator is None or operator.kind == PREFIX
+        return kind == NUMBER or value == '('
+    
+    def function(self, operator) -> tuple:
+        args: List[tuple] = []
+        degrees = False
+        kind, value = self.peek()
+        if value == '(':
+            # Parenthesized call: f(x), f(x, y) or f(x deg)
+            self.advance()
+            args.append(self.expression(0))
+            while self.peek()[1] == ',':
+                self.advance()
+                args.append(self.expression(0))
+            degrees = self.degrees(operator)
+            self.expect(')')
+        else:
+            # Juxtaposed call: f x, f x y
+            args.append(self.expression(operator.precedence))
+            while len(args) < operator.max_args and self.starts_operand():
+                args.append(self.expression(operator.precedence))
+        degrees = self.degrees(operator) or degrees
+        if len(args) > operator.max_args:
+            raise ValueError(f"Too many arguments for {operator.token}")
+        if len(args) < operator.min_args:
+            raise ValueError(f"Too few arguments for {operator.token}")
+        return ('call', operator, tuple(args), degrees)
+    
+    def degrees(self, operator) -> bool:
+        if operator.degrees and self.peek() == (NAME, 'deg'):
+            self.advance()
+            return True
+        return False
+
+
+def parse(source: str) -> tuple:
+    """Parse a normalized expression into an AST."""
+    return _Parser(tokenize(source)).parse()
+
+
+def ast_variables(node: tuple, names: Optional[List[str]] = None) -> List[str]:
+    """Variables read by an AST, in order of first use."""
+    if names is None:
+        names = []
+    kind = node[0]
+    if kind == 'var':
+        if node[1] not in names:
+            names.append(node[1])
+    elif kind == 'neg':
+        ast_variables(node[1], names)
+    elif kind == 'call':
+        for arg in node[2]:
+            ast_variables(arg, names)
+    return names
+
+
+def canonical(node: tuple) -> str:
+    """
+    One spelling of an AST, the same for every way of writing it: numbers as
+    float reprs, every call in prefix form with its arguments parenthesized.
+    """
+    kind = node[0]
+    if kind == 'num':
+        return repr(float(node[1]))
+    if kind == 'var':
+        return node[1]
+    if kind == 'neg':
+        return f"neg({canonical(node[1])})"
+    _, operator, args, degrees = node
+    return f"{operator.token}{'[deg]' if degrees else ''}({', '.join(map(canonical, args))})"
+
+
+def emit(node: tuple, code: Optional[List[Instruction]] = None) -> List[Instruction]:
+    """Flatten an AST into postfix bytecode."""
+    if code is None:
+        code = []
+    kind = node[0]
+    if kind == 'num':
+        code.append((CONST, node[1]))
+    elif kind == 'neg':
+        emit(node[1], code)
+        code.append((NEG, None))
+    elif kind == 'var':
+        code.append((LOAD, node[1]))
+    else:
+        _, operator, args, degrees = node
+        for arg in args:
+            emit(arg, code)
+        kwargs = {'degrees': True} if degrees else {}
+        handler = operator.handler
+        op = CALL if isinstance(handler, str) else CALL_FUNCTION
+        code.append((op, (handler, len(args), kwargs, operator.check)))
+    return code
+
+
+def _operation_name(op: int, handler) -> str:
+    """The Calculator method a CALL or CALL_FUNCTION instruction stands for, for metrics."""
+    # Built-in function handlers are named after the method they wrap: _factorial, _gcd, ...
+    return handler if op == CALL else getattr(handler, '__name__', '').lstrip('_')
+
+
+class CompiledExpression:
+    """An expression compiled to bytecode, ready to run on any Calculator."""
+    
+    __slots__ = ('source', 'ast', 'code', 'variables', 'canonical')
+    
+    error = None
+    
+    def __init__(self, source: str, ast: tuple, code: List[Instruction]):
+        self.source = source
+        self.ast = ast
+        self.code = tuple(code)
+        # Names the expression reads, i.e. what a variable defined by it depends on
+        self.variables: FrozenSet[str] = frozenset(arg for op, arg in code if op == LOAD)
+        # Key of the expression in a persistent result cache
+        self.canonical = canonical(ast)
+    
+    def try_evaluate(self, calculator, variables: Optional[Mapping[str, float]] = None
+                     ) -> Tuple[Optional[float], int, Optional[str]]:
+        """
+        Run the bytecode, returning (result, OK, None) or (None, code, message).
+        
+        If the calculator has a result cache, a cached outcome is returned
+        without running anything (see calculator_result_cache).
+        """
+        cache = calculator.result_cache
+        if cache is not None:
+            return cache.try_evaluate(self, calculator, variables)
+        return self.try_evaluate_uncached(calculator, variables)
+    
+    def try_evaluate_uncached(self, calculator, variables: Optional[Mapping[str, float]] = None
+                              ) -> Tuple[Optional[float], int, Optional[str]]:
+        """
+        Run the bytecode, bypassing any result cache.
+        
+        Operator checks catch invalid arguments before the Calculator method
+        would raise, so bad input costs no exception; a rejected call is
+        reported with its code's ERROR_MESSAGES text and still counted by
+        the calculator's metrics. Errors only detectable during the
+        computation (such as power overflow) are caught here.
+        Malformed expressions never get this far: see InvalidExpression.
+        Variables are looked up in the variables mapping; a missing one gives
+        UNDEFINED_VARIABLE.
+        """
+        stack: List[Any] = []
+        push = stack.append
+        try:
+            for op, arg in self.code:
+                if op == CONST:
+                    push(arg)
+                elif op == NEG:
+                    stack[-1] = -stack[-1]
+                elif op == LOAD:
+                    value = None if variables is None else variables.get(arg)
+                    if value is None:
+                        return None, UNDEFINED_VARIABLE, f"Undefined variable: {arg}"
+                    push(value)
+                else:
+                    handler, argc, kwargs, check = arg
+                    args = stack[-argc:]
+                    del stack[-argc:]
+                    if check is not None:
+                        code = check(*args)
+                        if code:
+                            calculator.count_rejected(_operation_name(op, handler), code)
+                            return None, code, ERROR_MESSAGES.get(code, ERROR_MESSAGES[DOMAIN_ERROR])
+                    if op == CALL:
+                        push(getattr(calculator, handler)(*args, **kwargs))
+                    else:
+                        push(handler(calculator, *args, **kwargs))
+        except CalculatorError as e:
+            return None, e.code, str(e)
+        except OverflowError as e:  # an exact int result used where a float is needed
+            return None, CALCULATION_ERROR, f"{ERROR_MESSAGES[CALCULATION_ERROR]}: {e}"
+        result = stack[0]
+        # Integer functions (gcd, nextprime, powmod, ...) give exact ints
+        return result if isinstance(result, int) else float(result), OK, None
+    
+    def evaluate(self, calculator, variables: Optional[Mapping[str, float]] = None) -> float:
+        """Run the bytecode through the calculator's methods; raises CalculatorError."""
+        result, code, message = self.try_evaluate(calculator, variables)
+        if code:
+            raise CalculatorError(message, code)
+        return result
+    
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.source!r})"
+
+
+class InvalidExpression:
+    """Cached outcome of compiling a malformed expression."""
+    
+    __slots__ = ('source', 'error')
+    
+    def __init__(self, source: str, error: str):
+        self.source = source
+        self.error = error
+    
+    def try_evaluate(self, calculator, variables: Optional[Mapping[str, float]] = None
+                     ) -> Tuple[None, int, str]:
+        """(None, INVALID_INPUT, message) without touching the calculator."""
+        return None, INVALID_INPUT, f"Invalid input: {self.error}"
+    
+    def evaluate(self, calculator, variables: Optional[Mapping[str, float]] = None) -> float:
+        """Raise the ValueError the parser reported."""
+        raise ValueError(self.error)
+    
+    def __repr__(self) -> str:
+        return f"InvalidExpression({self.source!r}, {self.error!r})"
+
+
+class CacheInfo(tuple):
+    """(hits, misses, maxsize, currsize) counters of an ExpressionCache."""
+    
+    __slots__ = ()
+    
+    def __new__(cls, hits: int, misses: int, maxsize: int, currsize: int):
+        return tuple.__new__(cls, (hits, misses, maxsize, currsize))
+    
+    hits = property(lambda self: self[0])
+    misses = property(lambda self: self[1])
+    maxsize = property(lambda self: self[2])
+    currsize = property(lambda self: self[3])
+    
+    def __repr__(self) -> str:
+        return "CacheInfo(hits={}, misses={}, maxsize={}, currsize={})".format(*self)
+
+
+class ExpressionCache:
+    """LRU cache of compiled expressions keyed by normalized source text."""
+    
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # Plain dicts keep insertion order: re-inserting marks an entry as recent
+        self._entries: Dict[str, Union[CompiledExpression, InvalidExpression]] = {}
+        self._registry_version = registry.version
+    
+    def lookup(self, source: str) -> Union[CompiledExpression, InvalidExpression]:
+        """
+        Return the compiled form of source, compiling it on a miss.
+        
+        Malformed expressions give an InvalidExpression instead of raising,
+        and are cached like valid ones, so a repeated bad line costs one
+        dictionary lookup.
+        """
+        key = normalize(source)
+        entries = self._entries
+        if self._registry_version != registry.version:
+            # Operators changed since these were compiled
+            entries.clear()
+            self._registry_version = registry.version
+        compiled = entries.pop(key, None)
+        if compiled is not None:
+            self.hits += 1
+            entries[key] = compiled
+            return compiled
+        self.misses += 1
+        try:
+            ast = parse(key)
+        except ValueError as e:
+            compiled = InvalidExpression(key, str(e))
+        else:
+            compiled = CompiledExpression(key, ast, emit(ast))
+        entries[key] = compiled
+        if len(entries) > self.maxsize:
+            del entries[next(iter(entries))]
+        return compiled
+    
+    def get(self, source: str) -> CompiledExpression:
+        """Return the compiled form of source; raises ValueError if it is malformed."""
+        compiled = self.lookup(source)
+        if compiled.error is not None:
+            raise ValueError(compiled.error)
+        return compiled
+    
+    def info(self) -> CacheInfo:
+        """Return hit, miss and size counters."""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+    
+    def clear(self) -> None:
+        """Drop all cached expressions and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def normalize(source: str) -> str:
+    """Canonical cache key: lower case with single spaces."""
+    return ' '.join(source.lower().split())
+
+
+_cache = ExpressionCache()
+
+
+def compile_expression(source: str) -> CompiledExpression:
+    """Compile source through the shared LRU cache."""
+    return _cache.get(source)
+
+
+def try_compile_expression(source: str) -> Union[CompiledExpression, InvalidExpression]:
+    """Compile source through the shared LRU cache without raising."""
+    return _cache.lookup(source)
+
+
+def cache_info() -> CacheInfo:
+    """Hit and miss counters of the shared expression cache."""
+    return _cache.info()
+
+
+def clear_cache() -> None:
+    """Clear the shared expression cache."""
+    _cache.clear()
\ No newline at end of file
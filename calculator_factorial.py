@@ -0,0 +1,102 @@
+"""
+Calculator Factorial Engine
+Exact big-integer factorials and log-gamma magnitude estimates.
+"""
+
+from __future__ import annotations
+
+import math
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List, Tuple
+
+
+# n! for every n whose factorial still fits in a float
+SMALL_FACTORIALS: Tuple[int, ...] = tuple(math.factorial(n) for n in range(171))
+MAX_FLOAT_FACTORIAL = 170
+
+# Above this n the prime-swing algorithm beats math.factorial
+PRIME_SWING_THRESHOLD = 20000
+
+# Default cap on the size of an exact result (~0.5 s of work)
+DEFAULT_MAX_DIGITS = 1000000
+
+_LN10 = math.log(10)
+
+
+def log10_factorial(n: int) -> float:
+    """log10(n!) from the log-gamma function."""
+    if n <= MAX_FLOAT_FACTORIAL:
+        return math.log10(SMALL_FACTORIALS[n])
+    return math.lgamma(n + 1) / _LN10
+
+
+def factorial_digits(n: int) -> int:
+    """Estimate the number of decimal digits of n! without computing it."""
+    return int(log10_factorial(n)) + 1
+
+
+def factorial_approx(n: int) -> Tuple[float, int]:
+    """Return (mantissa, exponent) with n! ≈ mantissa × 10**exponent."""
+    magnitude = log10_factorial(n)
+    exponent = int(magnitude)
+    return 10 ** (magnitude - exponent), exponent
+
+
+def factorial_exact(n: int) -> int:
+    """Exact n! using a table, math.factorial or the prime-swing algorithm."""
+    if n <= MAX_FLOAT_FACTORIAL:
+        return SMALL_FACTORIALS[n]
+    if n < PRIME_SWING_THRESHOLD:
+        return math.factorial(n)
+    return _prime_swing_factorial(n)
+
+
+def _primes_upto(n: int) -> List[int]:
+    """Primes up to n with a sieve of Eratosthenes."""
+    sieve = bytearray([1]) * (n + 1)
+    sieve[0:2] = b'\0\0'
+    for i in range(2, math.isqrt(n) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, n + 1, i)))
+    return [i for i, is_prime in enumerate(sieve) if is_prime]
+
+
+def _product(values: List[int], lo: int, hi: int) -> int:
+    """Product of values[lo:hi] by binary splitting."""
+    if hi - lo <= 8:
+        result = 1
+        for i in range(lo, hi):
+            result *= values[i]
+        return result
+    mid = (lo + hi) // 2
+    return _product(values, lo, mid) * _product(values, mid, hi)
+
+
+def _swing(n: int, primes: List[int]) -> int:
+    """The swinging factorial n≀ = n! / (n//2)!**2 from its prime factorization."""
+    factors = []
+    for p in primes:
+        if p > n:
+            break
+        q = n
+        exponent = 0
+        while q:
+            q //= p
+            exponent += q & 1
+        if exponent:
+            factors.append(p if exponent == 1 else p ** exponent)
+    return _product(factors, 0, len(factors))
+
+
+def _prime_swing_factorial(n: int) -> int:
+    """n! = ((n//2)!)**2 * swing(n), recursively."""
+    primes = _primes_upto(n)
+    
+    def recurse(m: int) -> int:
+        if m <= MAX_FLOAT_FACTORIAL:
+            return SMALL_FACTORIALS[m]
+        return recurse(m // 2) ** 2 * _swing(m, primes)
+    
+    return recurse(n)
\ No newline at end of file
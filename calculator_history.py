@@ -0,0 +1,324 @@
+"""
+Calculator History
+Bounded ring buffer of structured history records with lazy text rendering.
+"""
+
+from __future__ import annotations
+
+from time import time
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+    
+    Record = Tuple[int, Any, Any, Any]
+    TimedRecord = Tuple[float, int, Any, Any, Any]
+
+
+# Operation codes stored in each history record
+OP_TEXT = 0
+OP_ADD = 1
+OP_SUBTRACT = 2
+OP_MULTIPLY = 3
+OP_DIVIDE = 4
+OP_POWER = 5
+OP_SQUARE_ROOT = 6
+OP_MODULO = 7
+OP_FACTORIAL = 8
+OP_SIN = 9
+OP_COS = 10
+OP_TAN = 11
+OP_SIN_DEG = 12
+OP_COS_DEG = 13
+OP_TAN_DEG = 14
+OP_LN = 15
+OP_LOG = 16
+OP_LOG10 = 17
+OP_MEMORY_STORE = 18
+OP_MEMORY_RECALL = 19
+OP_MEMORY_CLEAR = 20
+OP_MEMORY_ADD = 21
+OP_MEMORY_SUBTRACT = 22
+
+# Names used by queries and the CLI
+OP_NAMES: Dict[int, str] = {
+    OP_TEXT: 'text',
+    OP_ADD: 'add',
+    OP_SUBTRACT: 'subtract',
+    OP_MULTIPLY: 'multiply',
+    OP_DIVIDE: 'divide',
+    OP_POWER: 'power',
+    OP_SQUARE_ROOT: 'sqrt',
+    OP_MODULO: 'mod',
+    OP_FACTORIAL: 'factorial',
+    OP_SIN: 'sin',
+    OP_COS: 'cos',
+    OP_TAN: 'tan',
+    OP_SIN_DEG: 'sin_deg',
+    OP_COS_DEG: 'cos_deg',
+    OP_TAN_DEG: 'tan_deg',
+    OP_LN: 'ln',
+    OP_LOG: 'log',
+    OP_LOG10: 'log10',
+    OP_MEMORY_STORE: 'ms',
+    OP_MEMORY_RECALL: 'mr',
+    OP_MEMORY_CLEAR: 'mc',
+    OP_MEMORY_ADD: 'm+',
+    OP_MEMORY_SUBTRACT: 'm-',
+}
+OP_CODES: Dict[str, int] = {name: op for op, name in OP_NAMES.items()}
+
+# Text templates used when a record is rendered
+TEMPLATES: Dict[int, str] = {
+    OP_ADD: "{a} + {b} = {r}",
+    OP_SUBTRACT: "{a} - {b} = {r}",
+    OP_MULTIPLY: "{a} × {b} = {r}",
+    OP_DIVIDE: "{a} ÷ {b} = {r}",
+    OP_POWER: "{a} ^ {b} = {r}",
+    OP_SQUARE_ROOT: "√{a} = {r}",
+    OP_MODULO: "{a} mod {b} = {r}",
+    OP_FACTORIAL: "{a}! = {r}",
+    OP_SIN: "sin({a}rad) = {r}",
+    OP_COS: "cos({a}rad) = {r}",
+    OP_TAN: "tan({a}rad) = {r}",
+    OP_SIN_DEG: "sin({a}°) = {r}",
+    OP_COS_DEG: "cos({a}°) = {r}",
+    OP_TAN_DEG: "tan({a}°) = {r}",
+    OP_LN: "ln({a}) = {r}",
+    OP_LOG: "log_{b}({a}) = {r}",
+    OP_LOG10: "log₁₀({a}) = {r}",
+    OP_MEMORY_STORE: "M = {a}",
+    OP_MEMORY_RECALL: "MR = {r}",
+    OP_MEMORY_CLEAR: "MC",
+    OP_MEMORY_ADD: "M+ {a} = {r}",
+    OP_MEMORY_SUBTRACT: "M- {a} = {r}",
+}
+
+# Flags packed next to the op code: which values were ints, and whether the
+# record's values live in the side table because a float cannot hold them.
+_A_INT = 1
+_B_INT = 2
+_R_INT = 4
+_BOXED = 8
+
+_MAX_EXACT_INT = 2 ** 53
+_STRIDE = 5  # code, a, b, result, timestamp
+
+DEFAULT_CAPACITY = 10000
+POLICIES = ('overwrite', 'discard', 'error')
+
+
+def _new_storage(capacity: Optional[int]):
+    """Record storage: an array of doubles, or nothing for a zero-capacity history."""
+    if capacity == 0:
+        # Importing array pulls in collections; one-shot CLI runs keep no history
+        return []
+    from array import array
+    return array('d')
+
+
+def render_record(op: int, a: Any, b: Any, result: Any) -> str:
+    """Render decoded record fields as history text."""
+    if op == OP_TEXT:
+        return a
+    return TEMPLATES[op].format(a=a, b=b, r=result)
+
+
+class History:
+    """
+    Fixed-capacity ring buffer of calculation records.
+
+    Each record is an op code with its operands, result and timestamp, packed
+    into a single array of doubles. Text is only produced when a record is
+    rendered. Every stored record also gets a sequence number that never
+    changes, so indexes can refer to records across evictions.
+    When the buffer is full the eviction policy decides what happens:
+    'overwrite' drops the oldest record, 'discard' drops the new record and
+    'error' raises CalculatorError. A capacity of None means unbounded.
+    """
+    
+    def __init__(self, capacity: Optional[int] = DEFAULT_CAPACITY,
+                 policy: str = 'overwrite'):
+        """Create an empty history with the given capacity and eviction policy."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown history policy: {policy}")
+        if capacity is not None and capacity < 0:
+            raise ValueError("History capacity must be non-negative")
+        self.capacity = capacity
+        self.policy = policy
+        self._limit = float('inf') if capacity is None else capacity
+        self.evicted = 0
+        self._total = 0
+        self._data = _new_storage(capacity)
+        self._extra: Dict[int, Any] = {}
+        self._size = 0
+        self._start = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_text()
+    
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("history index out of range")
+        return self._render(self._slot(index))
+    
+    def record(self, op: int, a: Any = 0.0, b: Any = 0.0, result: Any = 0.0) -> None:
+        """Append a structured record."""
+        flags = 0
+        if type(a) is int:
+            flags = _A_INT
+        if type(b) is int:
+            flags |= _B_INT
+        if type(result) is int:
+            flags |= _R_INT
+        if flags:
+            if not (-_MAX_EXACT_INT <= a <= _MAX_EXACT_INT
+                    and -_MAX_EXACT_INT <= b <= _MAX_EXACT_INT
+                    and -_MAX_EXACT_INT <= result <= _MAX_EXACT_INT):
+                self._store(op | (flags | _BOXED) << 8, 0.0, 0.0, 0.0, (a, b, result))
+                return
+            op |= flags << 8
+        if self._size < self._limit:
+            # Fast path: the buffer has not filled up yet
+            self._data.extend((op, a, b, result, time()))
+            self._size += 1
+            self._total += 1
+        else:
+            self._store(op, a, b, result, None)
+    
+    def append(self, text: str) -> None:
+        """Append a free-form text record."""
+        self._store(OP_TEXT | _BOXED << 8, 0.0, 0.0, 0.0, text)
+    
+    def extend_records(self, records: Iterable[Record]) -> None:
+        """Append (op, a, b, result) tuples as produced by iter_records()."""
+        for op, a, b, result in records:
+            if op == OP_TEXT:
+                self.append(a)
+            else:
+                self.record(op, a, b, result)
+    
+    def extend_timed(self, records: Iterable[TimedRecord]) -> None:
+        """Append (timestamp, op, a, b, result) tuples, keeping their timestamps."""
+        for timestamp, op, a, b, result in records:
+            total = self._total
+            if op == OP_TEXT:
+                self.append(a)
+            else:
+                self.record(op, a, b, result)
+            if self._total != total:
+                self._data[self._slot(self._size - 1) * _STRIDE + 4] = timestamp
+    
+    def clear(self) -> None:
+        """Remove all records."""
+        self._data = _new_storage(self.capacity)
+        self._extra.clear()
+        self._size = 0
+        self._start = 0
+    
+    def iter_records(self, last: Optional[int] = None) -> Iterator[Record]:
+        """Yield (op, a, b, result) tuples, oldest first, optionally only the last n."""
+        for slot in self._slots(last):
+            yield self._decode(slot)
+    
+    def iter_timed(self, last: Optional[int] = None) -> Iterator[TimedRecord]:
+        """Yield (timestamp, op, a, b, result) tuples, oldest first."""
+        data = self._data
+        for slot in self._slots(last):
+            yield (data[slot * _STRIDE + 4],) + self._decode(slot)
+    
+    def seq_range(self) -> Tuple[int, int]:
+        """Sequence numbers of the first record and one past the last."""
+        return self._total - self._size, self._total
+    
+    def get_timed(self, seq: int) -> TimedRecord:
+        """Return the record with the given sequence number."""
+        index = seq - (self._total - self._size)
+        if not 0 <= index < self._size:
+            raise IndexError("history record no longer available")
+        slot = self._slot(index)
+        return (self._data[slot * _STRIDE + 4],) + self._decode(slot)
+    
+    def iter_text(self, last: Optional[int] = None) -> Iterator[str]:
+        """Yield rendered entries, oldest first, optionally only the last n."""
+        for slot in self._slots(last):
+            yield self._render(slot)
+    
+    def render(self) -> List[str]:
+        """Render the whole history as a list of strings."""
+        return list(self.iter_text())
+    
+    def close(self) -> None:
+        """Nothing to release for an in-memory history."""
+    
+    def _store(self, code: int, a: Any, b: Any, result: Any, extra: Any) -> None:
+        """Write a packed record into the next slot according to the policy."""
+        capacity = self.capacity
+        size = self._size
+        if capacity is None or size < capacity:
+            slot = size
+            self._data.extend((code, a, b, result, time()))
+            self._size = size + 1
+        elif capacity == 0 or self.policy == 'discard':
+            self.evicted += 1
+            return
+        elif self.policy == 'error':
+            from calculator import HISTORY_FULL, CalculatorError
+            raise CalculatorError("History is full", HISTORY_FULL)
+        else:
+            slot = self._start
+            self._start = (slot + 1) % capacity
+            i = slot * _STRIDE
+            data = self._data
+            data[i] = code
+            data[i + 1] = a
+            data[i + 2] = b
+            data[i + 3] = result
+            data[i + 4] = time()
+            if self._extra:
+                self._extra.pop(slot, None)
+            self.evicted += 1
+        self._total += 1
+        if extra is not None:
+            self._extra[slot] = extra
+    
+    def _slot(self, index: int) -> int:
+        """Map a chronological index to a buffer slot."""
+        return (self._start + index) % self._size
+    
+    def _slots(self, last: Optional[int]) -> Iterator[int]:
+        """Yield buffer slots in chronological order."""
+        size = self._size
+        first = 0 if last is None else max(size - last, 0)
+        for index in range(first, size):
+            yield (self._start + index) % size
+    
+    def _decode(self, slot: int) -> Record:
+        """Unpack a slot into (op, a, b, result) with ints restored."""
+        i = slot * _STRIDE
+        data = self._data
+        code = int(data[i])
+        op = code & 0xFF
+        flags = code >> 8
+        if flags & _BOXED:
+            extra = self._extra[slot]
+            if op == OP_TEXT:
+                return op, extra, None, None
+            return (op,) + extra
+        a, b, result = data[i + 1], data[i + 2], data[i + 3]
+        if flags & _A_INT:
+            a = int(a)
+        if flags & _B_INT:
+            b = int(b)
+        if flags & _R_INT:
+            result = int(result)
+        return op, a, b, result
+    
+    def _render(self, slot: int) -> str:
+        """Render a single slot as text."""
+        return render_record(*self._decode(slot))
\ No newline at end of file
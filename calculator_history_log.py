@@ -0,0 +1,442 @@
+"""
+Calculator History Log
+Persistent, append-only history backend built on fixed-size binary records.
+
+The log file starts with a small header followed by 40-byte records
+(packed op code, a, b, result, timestamp). Text entries and integers too
+large for a double are written to a sidecar file and the record stores
+their offset and length. The header holds a generation number that names
+the sidecar (<path>.text for generation 0, <path>.text.<n> after that), so
+compaction writes a new sidecar next to the old one and switches both files
+with a single rename of the log. Records are buffered in memory and
+written in groups, reads go through an mmap of the file so opening a log of
+millions of entries costs nothing, and only the records actually requested
+are decoded. Records evicted by the capacity limit or by clear() stay in the
+file until the log is compacted.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Optional, Tuple
+
+from calculator_history import (
+    OP_TEXT, POLICIES, render_record, _A_INT, _B_INT, _BOXED, _MAX_EXACT_INT, _R_INT,
+)
+
+if TYPE_CHECKING:
+    from calculator_history import Record, TimedRecord
+
+
+MAGIC = b'CALCHLOG'
+VERSION = 2
+# Version 1 logs have the same layout with the generation always 0
+VERSIONS = (1, 2)
+# magic, version, record size, first live record, sidecar generation
+HEADER = struct.Struct('<8sIIQQ')
+HEADER_SIZE = 32
+RECORD = struct.Struct('<Q4d')  # code, a, b, result, timestamp
+RECORD_SIZE = RECORD.size
+_FIRST = struct.Struct('<Q')
+_FIRST_OFFSET = 16
+
+# Records buffered before a group commit, and the longest a record may wait
+DEFAULT_GROUP_SIZE = 256
+DEFAULT_COMMIT_INTERVAL = 1.0
+
+# Compact once at least this many dead records make up half the file
+COMPACT_MIN_DEAD = 4096
+
+# Records decoded per slice of the map
+_CHUNK_RECORDS = 4096
+
+
+class _Writer:
+    """Pending records and open files, flushed on close or garbage collection."""
+    
+    def __init__(self, path: str, text_path: str, sync: bool):
+        self.log = open(path, 'r+b', buffering=0)
+        self.text = open(text_path, 'a+b', buffering=0)
+        self.text_size = self.text.seek(0, os.SEEK_END)
+        self.pending = bytearray()
+        self.pending_text = bytearray()
+        self.sync = sync
+    
+    def flush(self) -> None:
+        """Write the pending group with one write per file."""
+        if self.pending_text:
+            self.text.write(self.pending_text)
+            self.pending_text.clear()
+            if self.sync:
+                os.fsync(self.text.fileno())
+        if self.pending:
+            self.log.seek(0, os.SEEK_END)
+            self.log.write(self.pending)
+            self.pending.clear()
+            if self.sync:
+                os.fsync(self.log.fileno())
+    
+    def close(self) -> None:
+        if not self.log.closed:
+            self.flush()
+            self.log.close()
+            self.text.close()
+
+
+def text_path(path: str, generation: int) -> str:
+    """Path of the sidecar file of the given generation of the log at path."""
+    return path + '.text' if generation == 0 else f"{path}.text.{generation}"
+
+
+class HistoryLog:
+    """
+    History backed by an append-only file, with the same interface as History.
+    
+    capacity limits how many records are visible (None for no limit) and
+    policy behaves as for History. Pending records are written when
+    group_size of them have accumulated, when commit_interval seconds have
+    passed since the last commit, before any read, and on flush() or close().
+    The interval is only checked when a record is stored: there is no
+    background timer, so records written just before the log goes idle stay
+    pending until the next write, read, flush() or close(), or until the log
+    is garbage collected or the interpreter exits. Call flush() after a burst
+    of writes if other processes read the file. With sync=True every group
+    commit is also fsynced.
+    """
+    
+    def __init__(self, path: str, capacity: Optional[int] = None,
+                 policy: str = 'overwrite', group_size: int = DEFAULT_GROUP_SIZE,
+                 commit_interval: float = DEFAULT_COMMIT_INTERVAL, sync: bool = False):
+        """Open (or create) the log at path."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown history policy: {policy}")
+        if capacity is not None and capacity < 0:
+            raise ValueError("History capacity must be non-negative")
+        self.path = path
+        self.capacity = capacity
+        self.policy = policy
+        self.group_size = group_size
+        self.commit_interval = commit_interval
+        self.evicted = 0
+        # Records removed from the file by compaction or clear(), so that
+        # sequence numbers stay stable for the lifetime of this object
+        self._dropped = 0
+        self._limit = float('inf') if capacity is None else capacity
+        self._first, self._generation = self._open_file(path)
+        self._writer = _Writer(path, text_path(path, self._generation), sync)
+        self._finalizer = weakref.finalize(self, self._writer.close)
+        self._count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_SIZE
+        self._first = min(self._first, self._count)
+        self._committed_first = self._first
+        self._last_commit = time.time()
+        # Timestamp given by extend_timed() for the record being stored
+        self._timestamp: Optional[float] = None
+        self._map: Optional[mmap.mmap] = None
+        self._mapped = 0
+        if self._count - self._first > self._limit:
+            self._first = self._count - capacity
+    
+    @staticmethod
+    def _open_file(path: str) -> Tuple[int, int]:
+        """Create or validate the log file and return its first live record and generation."""
+        try:
+            with open(path, 'xb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0, 0))
+            return 0, 0
+        except FileExistsError:
+            pass
+        with open(path, 'r+b') as f:
+            magic, version, record_size, first, generation = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version not in VERSIONS or record_size != RECORD_SIZE:
+                raise ValueError(f"Not a calculator history log: {path}")
+            # Drop a partially written last record left by a crash
+            size = f.seek(0, os.SEEK_END)
+            whole = HEADER_SIZE + (size - HEADER_SIZE) // RECORD_SIZE * RECORD_SIZE
+            if whole != size:
+                f.truncate(whole)
+        # An interrupted compaction leaves the next generation's sidecar behind,
+        # or the previous one if it was interrupted after switching the log
+        for stale in (generation - 1, generation + 1):
+            if stale >= 0:
+                try:
+                    os.unlink(text_path(path, stale))
+                except FileNotFoundError:
+                    pass
+        return first, generation
+    
+    def __len__(self) -> int:
+        return self._count - self._first
+    
+    def __iter__(self) -> Iterator[str]:
+        return self.iter_text()
+    
+    def __getitem__(self, index: int) -> str:
+        size = self._count - self._first
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("history index out of range")
+        view = self._view()
+        offset = HEADER_SIZE + (self._first + index) * RECORD_SIZE
+        return self._render(RECORD.unpack_from(view, offset))
+    
+    def __enter__(self) -> 'HistoryLog':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def record(self, op: int, a: Any = 0.0, b: Any = 0.0, result: Any = 0.0) -> None:
+        """Append a structured record."""
+        flags = 0
+        if type(a) is int:
+            flags = _A_INT
+        if type(b) is int:
+            flags |= _B_INT
+        if type(result) is int:
+            flags |= _R_INT
+        if flags:
+            if not (-_MAX_EXACT_INT <= a <= _MAX_EXACT_INT
+                    and -_MAX_EXACT_INT <= b <= _MAX_EXACT_INT
+                    and -_MAX_EXACT_INT <= result <= _MAX_EXACT_INT):
+                self._store_payload(op | (flags | _BOXED) << 8, json.dumps([a, b, result]))
+                return
+            op |= flags << 8
+        self._store(op, a, b, result)
+    
+    def append(self, text: str) -> None:
+        """Append a free-form text record."""
+        self._store_payload(OP_TEXT | _BOXED << 8, text)
+    
+    def extend_records(self, records: Iterable[Record]) -> None:
+        """Append (op, a, b, result) tuples as produced by iter_records()."""
+        for op, a, b, result in records:
+            if op == OP_TEXT:
+                self.append(a)
+            else:
+                self.record(op, a, b, result)
+    
+    def extend_timed(self, records: Iterable[TimedRecord]) -> None:
+        """Append (timestamp, op, a, b, result) tuples, keeping their timestamps."""
+        try:
+            for self._timestamp, op, a, b, result in records:
+                if op == OP_TEXT:
+                    self.append(a)
+                else:
+                    self.record(op, a, b, result)
+        finally:
+            self._timestamp = None
+    
+    def clear(self) -> None:
+        """Remove all records and truncate the files."""
+        writer = self._writer
+        writer.pending.clear()
+        writer.pending_text.clear()
+        self._unmap()
+        self._dropped += self._count
+        writer.log.truncate(HEADER_SIZE)
+        writer.text.truncate(0)
+        writer.text_size = 0
+        self._count = 0
+        self._first = 0
+        self._write_first()
+    
+    def iter_records(self, last: Optional[int] = None) -> Iterator[Record]:
+        """Yield (op, a, b, result) tuples, oldest first, optionally only the last n."""
+        for timestamp, op, a, b, result in self.iter_timed(last):
+            yield op, a, b, result
+    
+    def iter_timed(self, last: Optional[int] = None) -> Iterator[TimedRecord]:
+        """Yield (timestamp, op, a, b, result) tuples, oldest first."""
+        for packed in self._packed(last):
+            yield self._decode(packed)
+    
+    def seq_range(self) -> Tuple[int, int]:
+        """Sequence numbers of the first record and one past the last."""
+        return self._dropped + self._first, self._dropped + self._count
+    
+    def get_timed(self, seq: int) -> TimedRecord:
+        """Return the record with the given sequence number."""
+        index = seq - self._dropped
+        if not self._first <= index < self._count:
+            raise IndexError("history record no longer available")
+        view = self._view()
+        return self._decode(RECORD.unpack_from(view, HEADER_SIZE + index * RECORD_SIZE))
+    
+    def iter_text(self, last: Optional[int] = None) -> Iterator[str]:
+        """Yield rendered entries, oldest first, optionally only the last n."""
+        for packed in self._packed(last):
+            yield self._render(packed)
+    
+    def render(self) -> List[str]:
+        """Render the whole history as a list of strings."""
+        return list(self.iter_text())
+    
+    def flush(self) -> None:
+        """Commit pending records to the file."""
+        self._writer.flush()
+        if self._first != self._committed_first:
+            self._write_first()
+        self._last_commit = time.time()
+    
+    def compact(self) -> None:
+        """
+        Rewrite the log keeping only the visible records.
+        
+        The records go to a temporary log of the next generation and their
+        payloads to that generation's sidecar, which the current log never
+        refers to. Renaming the temporary log over the log is the only step
+        that changes what a reader sees, so a crash at any point leaves
+        either the old or the new log, each with its own sidecar.
+        """
+        self.flush()
+        tmp_path = self.path + '.compact'
+        generation = self._generation + 1
+        live = 0
+        text_size = 0
+        with open(tmp_path, 'wb') as f, open(text_path(self.path, generation), 'wb') as text:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0, generation))
+            records = bytearray()
+            for code, a, b, result, timestamp in self._packed(None):
+                if code >> 8 & _BOXED:
+                    payload = self._payload(a, b)
+                    text.write(payload)
+                    a, b = float(text_size), float(len(payload))
+                    text_size += len(payload)
+                records += RECORD.pack(code, a, b, result, timestamp)
+                live += 1
+                if len(records) >= _CHUNK_RECORDS * RECORD_SIZE:
+                    f.write(records)
+                    records.clear()
+            f.write(records)
+            text.flush()
+            os.fsync(text.fileno())
+            f.flush()
+            os.fsync(f.fileno())
+        self._unmap()
+        self._finalizer()
+        os.replace(tmp_path, self.path)
+        os.unlink(text_path(self.path, self._generation))
+        self._generation = generation
+        self._writer = _Writer(self.path, text_path(self.path, generation), self._writer.sync)
+        self._finalizer = weakref.finalize(self, self._writer.close)
+        self._dropped += self._first
+        self._count = live
+        self._first = self._committed_first = 0
+    
+    def close(self) -> None:
+        """Commit pending records and close the files."""
+        if self._writer.log.closed:
+            return
+        self.flush()
+        self._unmap()
+        self._finalizer()
+    
+    def _store(self, code: int, a: Any, b: Any, result: Any) -> None:
+        """Buffer a packed record, applying the capacity policy."""
+        if self._count - self._first >= self._limit:
+            if self.capacity == 0 or self.policy == 'discard':
+                self.evicted += 1
+                return
+            if self.policy == 'error':
+                from calculator import HISTORY_FULL, CalculatorError
+                raise CalculatorError("History is full", HISTORY_FULL)
+            self._first += 1
+            self.evicted += 1
+        now = time.time()
+        writer = self._writer
+        timestamp = now if self._timestamp is None else self._timestamp
+        writer.pending += RECORD.pack(code, a, b, result, timestamp)
+        self._count += 1
+        if (len(writer.pending) >= self.group_size * RECORD_SIZE
+                or now - self._last_commit >= self.commit_interval):
+            self.flush()
+            dead = self._first
+            if dead >= COMPACT_MIN_DEAD and dead * 2 >= self._count:
+                self.compact()
+    
+    def _store_payload(self, code: int, text: str) -> None:
+        """Buffer a record whose values live in the sidecar file."""
+        if self._count - self._first >= self._limit and self.policy != 'overwrite':
+            self._store(code, 0.0, 0.0, 0.0)  # discard or raise
+            return
+        payload = text.encode('utf-8')
+        writer = self._writer
+        offset = writer.text_size
+        writer.pending_text += payload
+        writer.text_size += len(payload)
+        self._store(code, float(offset), float(len(payload)), 0.0)
+    
+    def _write_first(self) -> None:
+        """Persist the index of the first visible record in the header."""
+        log = self._writer.log
+        log.seek(_FIRST_OFFSET)
+        log.write(_FIRST.pack(self._first))
+        self._committed_first = self._first
+    
+    def _view(self) -> mmap.mmap:
+        """Commit pending records and return a map covering the whole file."""
+        if self._writer.pending:
+            self.flush()
+        size = HEADER_SIZE + self._count * RECORD_SIZE
+        if self._map is None or self._mapped < size:
+            self._unmap()
+            self._map = mmap.mmap(self._writer.log.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = size
+        return self._map
+    
+    def _unmap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._mapped = 0
+    
+    def _packed(self, last: Optional[int]) -> Iterator[Tuple]:
+        """Yield raw record tuples in chronological order."""
+        size = self._count - self._first
+        first = self._first if last is None else self._first + max(size - last, 0)
+        if first == self._count:
+            return
+        stop = self._count
+        while first < stop:
+            end = min(first + _CHUNK_RECORDS, stop)
+            # Copy one chunk at a time so the map can be replaced between chunks
+            chunk = self._view()[HEADER_SIZE + first * RECORD_SIZE:HEADER_SIZE + end * RECORD_SIZE]
+            yield from RECORD.iter_unpack(chunk)
+            first = end
+    
+    def _payload(self, offset: float, length: float) -> bytes:
+        """Read a sidecar payload, committing pending text first."""
+        writer = self._writer
+        if writer.pending_text:
+            self.flush()
+        writer.text.seek(int(offset))
+        return writer.text.read(int(length))
+    
+    def _decode(self, packed: Tuple) -> TimedRecord:
+        """Unpack a raw record into (timestamp, op, a, b, result) with ints restored."""
+        code, a, b, result, timestamp = packed
+        op = code & 0xFF
+        flags = code >> 8
+        if flags & _BOXED:
+            text = self._payload(a, b).decode('utf-8')
+            if op == OP_TEXT:
+                return timestamp, op, text, None, None
+            a, b, result = json.loads(text)
+            return timestamp, op, a, b, result
+        if flags & _A_INT:
+            a = int(a)
+        if flags & _B_INT:
+            b = int(b)
+        if flags & _R_INT:
+            result = int(result)
+        return timestamp, op, a, b, result
+    
+    def _render(self, packed: Tuple) -> str:
+        """Render a raw record as text."""
+        return render_record(*self._decode(packed)[1:])
\ No newline at end of file
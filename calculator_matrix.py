@@ -0,0 +1,457 @@
+"""
+Calculator Matrices
+Matrix values and linear algebra: multiply, solve, inverse, determinant,
+transpose and element-wise versions of the batch operations.
+
+With NumPy, matrices are 2-D float64 arrays and the operations dispatch to
+NumPy, which runs multiply, solve, inverse and determinant through
+BLAS/LAPACK. Without it, matrices are Matrix objects holding their elements
+row by row in a flat buffer, and the operations run in pure Python:
+multiplication works on tiles of BLOCK_SIZE rows by BLOCK_SIZE columns so the
+rows and columns in use stay small, and solve, inverse and determinant use
+an LU factorization with partial pivoting.
+
+.npy files are memory-mapped read-only instead of being read into memory,
+with or without NumPy, so loading a large operand costs no copy; CSV files
+are parsed. Shape problems raise CalculatorError with SHAPE_MISMATCH and
+singular systems with SINGULAR_MATRIX; element-wise operations raise the
+error of the first element that fails.
+"""
+
+import ast
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import chain
+from operator import mul, sub
+from typing import IO, Any, Iterator, List, Optional, Sequence, Tuple, Union
+
+import calculator_batch
+from calculator import (
+    ERROR_MESSAGES, SHAPE_MISMATCH, SINGULAR_MATRIX, CalculatorError,
+)
+
+BLOCK_SIZE = 64
+
+LINEAR_OPERATIONS = ('matmul', 'solve', 'inverse', 'determinant', 'transpose')
+OPERATIONS = LINEAR_OPERATIONS + calculator_batch.OPERATIONS
+
+_NPY_MAGIC = b'\x93NUMPY'
+
+Path = Union[str, 'os.PathLike[str]']
+
+
+class Matrix:
+    """Row-major matrix of floats, used when NumPy is not installed."""
+    
+    __slots__ = ('data', 'shape')
+    
+    ndim = 2
+    
+    def __init__(self, data: Sequence[float], shape: Tuple[int, int]):
+        """Wrap a flat buffer of rows * columns floats (an array or memoryview)."""
+        if len(data) != shape[0] * shape[1]:
+            raise ValueError(f"{len(data)} values do not fill a {shape[0]}x{shape[1]} matrix")
+        self.data = data
+        self.shape = (int(shape[0]), int(shape[1]))
+    
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[float]]) -> 'Matrix':
+        rows = [[float(value) for value in row] for row in rows]
+        columns = len(rows[0]) if rows else 0
+        if any(len(row) != columns for row in rows):
+            raise CalculatorError("Matrix rows have different lengths", SHAPE_MISMATCH)
+        return cls(array('d', chain.from_iterable(rows)), (len(rows), columns))
+    
+    @property
+    def size(self) -> int:
+        return len(self.data)
+    
+    def row(self, i: int) -> Sequence[float]:
+        """Row i, without copying."""
+        columns = self.shape[1]
+        return self.data[i * columns:(i + 1) * columns]
+    
+    def rows(self) -> List[List[float]]:
+        """The rows as lists (a copy)."""
+        return [list(self.row(i)) for i in range(self.shape[0])]
+    
+    def tolist(self) -> List[List[float]]:
+        return self.rows()
+    
+    def __getitem__(self, index: Tuple[int, int]) -> float:
+        i, j = index
+        return self.data[i * self.shape[1] + j]
+    
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Matrix):
+            return NotImplemented
+        return self.shape == other.shape and list(self.data) == list(other.data)
+    
+    def __repr__(self) -> str:
+        return f"Matrix({self.shape[0]}x{self.shape[1]})"
+
+
+def _numpy():
+    # Read on every call so the fallback can be selected by patching calculator_batch.np
+    return calculator_batch.np
+
+
+def as_matrix(value: Any) -> Any:
+    """
+    value as a matrix of the active backend.
+    
+    Accepts 2-D arrays, Matrix objects and nested sequences; a flat
+    sequence is a single row. Arrays of float64 (memory-mapped ones
+    included) are used without copying.
+    """
+    if isinstance(value, (list, tuple)) and value and isinstance(value[0], (list, tuple)):
+        if any(len(row) != len(value[0]) for row in value):
+            raise CalculatorError("Matrix rows have different lengths", SHAPE_MISMATCH)
+    np = _numpy()
+    if np is not None:
+        if isinstance(value, Matrix):
+            value = np.frombuffer(value.data, dtype=np.float64).reshape(value.shape)
+        result = np.asarray(value, dtype=np.float64)
+        if result.ndim == 1:
+            result = result.reshape(1, -1)
+        if result.ndim != 2:
+            raise CalculatorError(f"Matrix must have 2 dimensions, not {result.ndim}", SHAPE_MISMATCH)
+        return result
+    if isinstance(value, Matrix):
+        return value
+    if hasattr(value, 'tolist'):
+        value = value.tolist()
+    rows = list(value)
+    if rows and not isinstance(rows[0], (list, tuple)):
+        rows = [rows]
+    return Matrix.from_rows(rows)
+
+
+def is_matrix(value: Any) -> bool:
+    """Whether value is a matrix rather than a scalar."""
+    return not isinstance(value, (int, float)) and getattr(value, 'ndim', 1) != 0
+
+
+def shape_text(value: Any) -> str:
+    """'rows x columns' of a matrix (e.g. '3x4'), or the value of a scalar."""
+    if is_matrix(value):
+        shape = getattr(value, 'shape', None) or as_matrix(value).shape
+        return 'x'.join(map(str, shape))
+    return str(value)
+
+
+# Loading and saving
+
+def load(path: Path) -> Any:
+    """
+    Load a matrix from a .npy file (memory-mapped, read-only) or a CSV file.
+    
+    CSV rows are lines of numbers separated by commas or whitespace; blank
+    lines and lines starting with '#' are skipped. Raises ValueError for
+    malformed files.
+    """
+    if os.fspath(path).lower().endswith('.npy'):
+        return _load_npy(path)
+    data, shape = _read_csv(path)
+    np = _numpy()
+    if np is not None:
+        return np.frombuffer(data, dtype=np.float64).reshape(shape)
+    return Matrix(data, shape)
+
+
+def _read_csv(path: Path) -> Tuple[array, Tuple[int, int]]:
+    data = array('d')
+    rows = 0
+    columns = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            tokens = line.replace(',', ' ').split()
+            if not tokens or tokens[0].startswith('#'):
+                continue
+            try:
+                data.extend(map(float, tokens))
+            except ValueError:
+                raise ValueError(f"Invalid number on line {number}") from None
+            if columns is None:
+                columns = len(tokens)
+            elif len(tokens) != columns:
+                raise ValueError(f"Line {number} has {len(tokens)} values, expected {columns}")
+            rows += 1
+    return data, (rows, columns or 0)
+
+
+def _load_npy(path: Path) -> Any:
+    np = _numpy()
+    if np is not None:
+        try:
+            matrix = np.load(path, mmap_mode='r', allow_pickle=False)
+        except ValueError as e:
+            raise ValueError(f"Unsupported .npy file: {e}") from None
+        if matrix.dtype != np.float64 or matrix.ndim != 2:
+            # Only float64 matrices map directly; others are converted
+            return as_matrix(matrix)
+        return matrix
+    with open(path, 'rb') as f:
+        descr, fortran_order, shape, offset = _read_npy_header(f)
+        if descr != '<f8' or fortran_order or len(shape) not in (1, 2) or sys.byteorder != 'little':
+            raise ValueError(f"Unsupported .npy file: {descr}, shape {shape}; "
+                             f"only little-endian float64 in C order can be loaded without NumPy")
+        shape = (1, shape[0]) if len(shape) == 1 else shape
+        size = shape[0] * shape[1]
+        if not size:
+            return Matrix(array('d'), shape)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # The memoryview keeps the mapping open for as long as the matrix lives
+    return Matrix(memoryview(mapped)[offset:offset + 8 * size].cast('d'), shape)
+
+
+def _read_npy_header(f: IO[bytes]) -> Tuple[str, bool, Tuple[int, ...], int]:
+    """(dtype descr, Fortran order, shape, data offset) of an .npy file."""
+    prefix = f.read(8)
+    if prefix[:6] != _NPY_MAGIC:
+        raise ValueError("Not a .npy file")
+    size_format = '<H' if prefix[6] == 1 else '<I'
+    size_bytes = f.read(struct.calcsize(size_format))
+    header_size, = struct.unpack(size_format, size_bytes)
+    header = ast.literal_eval(f.read(header_size).decode('latin1'))
+    return (header['descr'], header['fortran_order'], tuple(header['shape']),
+            8 + len(size_bytes) + header_size)
+
+
+def save(path: Path, matrix: Any) -> None:
+    """Write a matrix to a .npy file or, for any other suffix, a CSV file."""
+    matrix = as_matrix(matrix)
+    np = _numpy()
+    if os.fspath(path).lower().endswith('.npy'):
+        if np is not None:
+            np.save(path, matrix, allow_pickle=False)
+            return
+        header = f"{{'descr': '<f8', 'fortran_order': False, 'shape': {matrix.shape}, }}"
+        # Pad so the data starts at a multiple of 64 bytes, as NumPy does
+        header += ' ' * (-(len(header) + 11) % 64) + '\n'
+        with open(path, 'wb') as f:
+            f.write(_NPY_MAGIC + b'\x01\x00' + struct.pack('<H', len(header)))
+            f.write(header.encode('latin1'))
+            f.write(matrix.data)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in _iter_rows(matrix):
+            f.write(','.join(map(repr, row)) + '\n')
+
+
+def _iter_rows(matrix: Any) -> Iterator[List[float]]:
+    if isinstance(matrix, Matrix):
+        return (list(matrix.row(i)) for i in range(matrix.shape[0]))
+    return (row.tolist() for row in matrix)
+
+
+def format_matrix(matrix: Any) -> List[str]:
+    """Lines showing the elements of a matrix, columns aligned."""
+    rows = [[repr(value) for value in row] for row in _iter_rows(as_matrix(matrix))]
+    if not rows or not rows[0]:
+        return ["[]"]
+    width = max(len(text) for row in rows for text in row)
+    return ['[' + ' '.join(text.rjust(width) for text in row) + ']' for row in rows]
+
+
+# Operations
+
+def _check_square(matrix: Any) -> int:
+    rows, columns = matrix.shape
+    if rows != columns:
+        raise CalculatorError(f"Matrix must be square, not {rows}x{columns}", SHAPE_MISMATCH)
+    return rows
+
+
+def matmul(a: Any, b: Any) -> Any:
+    """Matrix product a @ b."""
+    a, b = as_matrix(a), as_matrix(b)
+    if a.shape[1] != b.shape[0]:
+        raise CalculatorError(f"Cannot multiply {shape_text(a)} by {shape_text(b)}", SHAPE_MISMATCH)
+    np = _numpy()
+    if np is not None:
+        return np.asarray(np.matmul(a, b))
+    return _matmul_python(a, b)
+
+
+def transpose(a: Any) -> Any:
+    """Transpose of a (a view with NumPy)."""
+    a = as_matrix(a)
+    np = _numpy()
+    if np is not None:
+        return a.T
+    rows, columns = a.shape
+    data = array('d', bytes(8 * a.size))
+    for i in range(rows):
+        data[i::rows] = array('d', a.row(i))
+    return Matrix(data, (columns, rows))
+
+
+def determinant(a: Any) -> float:
+    """Determinant of a square matrix."""
+    a = as_matrix(a)
+    _check_square(a)
+    np = _numpy()
+    if np is not None:
+        return float(np.linalg.det(a)) if a.size else 1.0
+    factors = _lu(a.rows())
+    if factors is None:
+        return 0.0
+    lu, _, sign = factors
+    return sign * math.prod(row[i] for i, row in enumerate(lu))
+
+
+def solve(a: Any, b: Any) -> Any:
+    """x such that a @ x = b, for a square, non-singular a."""
+    a, b = as_matrix(a), as_matrix(b)
+    n = _check_square(a)
+    if b.shape[0] != n:
+        raise CalculatorError(f"Cannot solve {shape_text(a)} for {shape_text(b)}", SHAPE_MISMATCH)
+    np = _numpy()
+    if np is not None:
+        try:
+            return np.linalg.solve(a, b)
+        except np.linalg.LinAlgError:
+            raise CalculatorError(ERROR_MESSAGES[SINGULAR_MATRIX], SINGULAR_MATRIX) from None
+    return _solve_python(a.rows(), b.rows(), b.shape[1])
+
+
+def inverse(a: Any) -> Any:
+    """Inverse of a square, non-singular matrix."""
+    a = as_matrix(a)
+    n = _check_square(a)
+    np = _numpy()
+    if np is not None:
+        try:
+            return np.linalg.inv(a)
+        except np.linalg.LinAlgError:
+            raise CalculatorError(ERROR_MESSAGES[SINGULAR_MATRIX], SINGULAR_MATRIX) from None
+    identity = [[float(i == j) for j in range(n)] for i in range(n)]
+    return _solve_python(a.rows(), identity, n)
+
+
+def elementwise(operation: str, a: Any, b: Any = None, degrees: bool = False) -> Any:
+    """
+    A calculator_batch operation applied to each element of a.
+    
+    b is a matrix of the same shape or a scalar. Raises the CalculatorError
+    of the first element that fails, naming its position.
+    """
+    a = as_matrix(a)
+    if is_matrix(b):
+        b = as_matrix(b)
+        if b.shape != a.shape:
+            raise CalculatorError(f"Element-wise {operation} of {shape_text(a)} and "
+                                  f"{shape_text(b)}", SHAPE_MISMATCH)
+    np = _numpy()
+    if np is not None:
+        result = calculator_batch.evaluate(operation, a, b, degrees)
+    else:
+        other = b.data if isinstance(b, Matrix) else b
+        result = calculator_batch.evaluate(operation, a.data, other, degrees)
+    if result.error_count:
+        index, message = next(result.iter_errors())
+        row, column = divmod(index, a.shape[1])
+        code = int(result.errors.ravel()[index] if np is not None else result.errors[index])
+        raise CalculatorError(f"{message} (row {row + 1}, column {column + 1})", code)
+    if np is not None:
+        return result.values
+    return Matrix(result.values, a.shape)
+
+
+def evaluate(operation: str, a: Any, b: Any = None, degrees: bool = False) -> Any:
+    """Apply operation (one of OPERATIONS); determinant returns a float."""
+    if operation == 'matmul':
+        return matmul(a, b)
+    if operation == 'solve':
+        return solve(a, b)
+    if operation in ('inverse', 'determinant', 'transpose'):
+        if b is not None:
+            raise CalculatorError(f"Matrix operation '{operation}' takes one operand")
+        return globals()[operation](a)
+    if operation not in OPERATIONS:
+        raise CalculatorError(f"Unknown matrix operation: {operation}")
+    return elementwise(operation, a, b, degrees)
+
+
+# Pure-Python fallback
+
+if hasattr(math, 'sumprod'):
+    _dot = math.sumprod
+else:
+    def _dot(x: Sequence[float], y: Sequence[float]) -> float:
+        return sum(map(mul, x, y))
+
+
+def _matmul_python(a: Matrix, b: Matrix) -> Matrix:
+    """Blocked product: each tile of the result reuses BLOCK_SIZE rows of a and columns of b."""
+    rows, inner = a.shape
+    columns = b.shape[1]
+    a_rows = a.rows()
+    b_columns = [b.data[j::columns] for j in range(columns)] if inner else [[]] * columns
+    out = [[0.0] * columns for _ in range(rows)]
+    for i0 in range(0, rows, BLOCK_SIZE):
+        a_block = a_rows[i0:i0 + BLOCK_SIZE]
+        out_block = out[i0:i0 + BLOCK_SIZE]
+        for j0 in range(0, columns, BLOCK_SIZE):
+            j1 = j0 + BLOCK_SIZE
+            b_block = b_columns[j0:j1]
+            for a_row, out_row in zip(a_block, out_block):
+                out_row[j0:j1] = [_dot(a_row, column) for column in b_block]
+    return Matrix(array('d', chain.from_iterable(out)), (rows, columns))
+
+
+def _lu(rows: List[List[float]]) -> Optional[Tuple[List[List[float]], List[int], float]]:
+    """
+    LU factorization with partial pivoting, in place: (rows, permutation,
+    sign of the permutation), or None if the matrix is singular.
+    
+    The strictly lower part holds L (unit diagonal) and the rest U.
+    """
+    n = len(rows)
+    permutation = list(range(n))
+    sign = 1.0
+    for k in range(n):
+        pivot = max(range(k, n), key=lambda i: abs(rows[i][k]))
+        if rows[pivot][k] == 0:
+            return None
+        if pivot != k:
+            rows[k], rows[pivot] = rows[pivot], rows[k]
+            permutation[k], permutation[pivot] = permutation[pivot], permutation[k]
+            sign = -sign
+        pivot_row = rows[k]
+        tail = pivot_row[k + 1:]
+        for i in range(k + 1, n):
+            row = rows[i]
+            factor = row[k] / pivot_row[k]
+            row[k] = factor
+            if factor:
+                row[k + 1:] = map(sub, row[k + 1:], [factor * value for value in tail])
+    return rows, permutation, sign
+
+
+def _solve_python(a_rows: List[List[float]], b_rows: List[List[float]], columns: int) -> Matrix:
+    factors = _lu(a_rows)
+    if factors is None:
+        raise CalculatorError(ERROR_MESSAGES[SINGULAR_MATRIX], SINGULAR_MATRIX)
+    lu, permutation, _ = factors
+    n = len(lu)
+    x = [list(b_rows[i]) for i in permutation]
+    # Forward substitution with L, then back substitution with U, a row of x at a time
+    for i in range(n):
+        row, lu_row = x[i], lu[i]
+        for k in range(i):
+            if lu_row[k]:
+                row = list(map(sub, row, [lu_row[k] * value for value in x[k]]))
+        x[i] = row
+    for i in reversed(range(n)):
+        row, lu_row = x[i], lu[i]
+        for k in range(i + 1, n):
+            if lu_row[k]:
+                row = list(map(sub, row, [lu_row[k] * value for value in x[k]]))
+        x[i] = [value / lu_row[i] for value in row]
+    return Matrix(array('d', chain.from_iterable(x)), (n, columns))
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Calculator Memoization
+Bounded LRU/LFU cache for the pure Calculator functions, with statistics.
+"""
+
+import math
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from calculator import CalculatorError
+
+
+POLICIES = ('lru', 'lfu')
+DEFAULT_MAXSIZE = 4096
+
+
+class _Failure:
+    """A cached CalculatorError, re-raised on every hit."""
+    
+    __slots__ = ('message', 'code')
+    
+    def __init__(self, message: str, code: int):
+        self.message = message
+        self.code = code
+
+
+class MemoCache:
+    """
+    Memo cache keyed by (operation, operands..., degrees flag).
+    
+    'lru' evicts the least recently used entry; 'lfu' evicts the least
+    frequently used one (ties broken by recency). Errors raised by the
+    cached function are stored too, so a hit raises the same CalculatorError
+    as the original call. Zero operands are keyed with their sign, since
+    0.0 == -0.0 but atan2 and division tell them apart, and calls with a
+    NaN operand are never cached, since NaN never equals a stored key. One
+    instance can be shared by several Calculators.
+    """
+    
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, policy: str = 'lru'):
+        """Create an empty cache holding at most maxsize entries."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown memo policy: {policy}")
+        if maxsize < 1:
+            raise ValueError("Memo cache size must be positive")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # LRU: key -> value, in recency order
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        # LFU: use count per key, and count -> keys in recency order
+        self._counts: Dict[Hashable, int] = {}
+        self._buckets: Dict[int, 'OrderedDict[Hashable, None]'] = {}
+        self._min_count = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def lookup(self, op: str, func: Callable[..., Any], args: Tuple) -> Any:
+        """Return func(*args), computing it only on a cache miss."""
+        key = (op,) + args
+        signed_zero = False
+        for arg in args:
+            if isinstance(arg, float):
+                if arg != arg:
+                    self.misses += 1
+                    return func(*args)
+                if arg == 0.0:
+                    signed_zero = True
+        if signed_zero:
+            key = (op,) + tuple((arg, math.copysign(1.0, arg))
+                                if isinstance(arg, float) and arg == 0.0 else arg
+                                for arg in args)
+        entries = self._entries
+        try:
+            value = entries[key]
+        except KeyError:
+            self.misses += 1
+            try:
+                value = func(*args)
+            except CalculatorError as e:
+                value = _Failure(str(e), e.code)
+            self._insert(key, value)
+        except TypeError:
+            # Unhashable operands are never cached
+            self.misses += 1
+            return func(*args)
+        else:
+            self.hits += 1
+            if self.policy == 'lru':
+                entries.move_to_end(key)
+            else:
+                self._touch(key)
+        if type(value) is _Failure:
+            raise CalculatorError(value.message, value.code)
+        return value
+    
+    def _insert(self, key: Hashable, value: Any) -> None:
+        """Add a new entry, evicting one first if the cache is full."""
+        entries = self._entries
+        if len(entries) >= self.maxsize:
+            self.evictions += 1
+            if self.policy == 'lru':
+                entries.popitem(last=False)
+            else:
+                bucket = self._buckets[self._min_count]
+                victim, _ = bucket.popitem(last=False)
+                if not bucket:
+                    del self._buckets[self._min_count]
+                del self._counts[victim]
+                del entries[victim]
+        entries[key] = value
+        if self.policy == 'lfu':
+            self._counts[key] = 1
+            self._buckets.setdefault(1, OrderedDict())[key] = None
+            self._min_count = 1
+    
+    def _touch(self, key: Hashable) -> None:
+        """Move an LFU entry to the next frequency bucket."""
+        count = self._counts[key]
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min_count == count:
+                self._min_count = count + 1
+        self._counts[key] = count + 1
+        self._buckets.setdefault(count + 1, OrderedDict())[key] = None
+    
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss, eviction and size counters."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hit_rate,
+        }
+    
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        self._entries.clear()
+        self._counts.clear()
+        self._buckets.clear()
+        self._min_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
\ No newline at end of file
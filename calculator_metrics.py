@@ -0,0 +1,231 @@
+"""
+Calculator Metrics
+Per-operation call counters, error counters and latency histograms.
+
+Metrics are attached to a Calculator by wrapping its operation methods on the
+instance, so a calculator without metrics runs the plain methods with no
+overhead at all. Histograms use fixed power-of-two nanosecond buckets indexed
+by int.bit_length(), so recording a sample is a handful of integer operations
+with no locking; concurrent updates from several threads may occasionally
+lose a count but never corrupt the histogram.
+"""
+
+import json
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+from calculator import ERROR_MESSAGES, CalculatorError
+
+
+INSTRUMENTED_OPERATIONS = (
+    'add', 'subtract', 'multiply', 'divide', 'power', 'square_root', 'modulo',
+    'factorial', 'factorial_approx', 'sin', 'cos', 'tan', 'log', 'log10', 'batch',
+    'powmod', 'powmod_batch', 'is_prime', 'next_prime', 'factorize', 'gcd', 'lcm',
+    'prime_count',
+    'memory_store', 'memory_recall', 'memory_clear', 'memory_add', 'memory_subtract',
+)
+
+# Bucket i counts samples below 2**(i + _FIRST_BIT) ns; the last one is open-ended
+_FIRST_BIT = 7
+BUCKET_COUNT = 25
+BUCKET_BOUNDS_NS: List[int] = [2 ** (i + _FIRST_BIT) for i in range(BUCKET_COUNT - 1)]
+
+
+def reason_label(code: int) -> str:
+    """Low-cardinality reason label for an error code: its ERROR_MESSAGES text."""
+    return ERROR_MESSAGES.get(code) or f"Error code {code}"
+
+
+def error_reason(error: CalculatorError) -> str:
+    """Reason label for a CalculatorError, from its code rather than its message."""
+    return reason_label(error.code)
+
+
+class OperationStats:
+    """Counters and latency histogram for one operation."""
+    
+    __slots__ = ('calls', 'errors', 'buckets', 'total_ns')
+    
+    def __init__(self):
+        self.calls = 0
+        self.errors: Dict[str, int] = {}
+        self.buckets = [0] * BUCKET_COUNT
+        self.total_ns = 0
+    
+    def clear(self) -> None:
+        """Zero every counter in place."""
+        self.calls = 0
+        self.errors.clear()
+        self.buckets[:] = [0] * BUCKET_COUNT
+        self.total_ns = 0
+    
+    def observe(self, elapsed_ns: int) -> None:
+        """Record one call that took elapsed_ns nanoseconds."""
+        index = elapsed_ns.bit_length() - _FIRST_BIT
+        if index < 0:
+            index = 0
+        elif index >= BUCKET_COUNT:
+            index = BUCKET_COUNT - 1
+        self.buckets[index] += 1
+        self.total_ns += elapsed_ns
+        self.calls += 1
+    
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile latency in seconds (bucket upper bound)."""
+        target = q * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                if index < len(BUCKET_BOUNDS_NS):
+                    return BUCKET_BOUNDS_NS[index] / 1e9
+                return float('inf')
+        return 0.0
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': dict(self.errors),
+            'total_seconds': self.total_ns / 1e9,
+            'buckets': list(self.buckets),
+        }
+
+
+class Metrics:
+    """Registry of OperationStats, shareable between calculators."""
+    
+    def __init__(self):
+        self.operations: Dict[str, OperationStats] = {}
+        # Caches reported with the operations; anything with stats() giving
+        # hits, misses and hit_rate (MemoCache, ResultCache)
+        self.caches: Dict[str, Any] = {}
+    
+    def operation(self, name: str) -> OperationStats:
+        """Return (creating if needed) the stats for an operation."""
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = OperationStats()
+        return stats
+    
+    def instrument(self, name: str, method: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap a bound method so every call is counted and timed."""
+        stats = self.operation(name)
+        clock = time.perf_counter_ns
+        
+        @wraps(method)
+        def instrumented(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            except CalculatorError as e:
+                reason = error_reason(e)
+                stats.errors[reason] = stats.errors.get(reason, 0) + 1
+                raise
+            finally:
+                stats.observe(clock() - start)
+        
+        return instrumented
+    
+    def reject(self, name: str, code: int) -> None:
+        """
+        Count a call of operation name that failed with code before reaching the method.
+        
+        Used for arguments an operator check rejected; the call is recorded
+        with no latency. Operations that are not instrumented are ignored.
+        """
+        stats = self.operations.get(name)
+        if stats is None:
+            return
+        reason = reason_label(code)
+        stats.errors[reason] = stats.errors.get(reason, 0) + 1
+        stats.observe(0)
+    
+    def watch_cache(self, name: str, cache: Any) -> None:
+        """Report the hit rate and counters of cache under name."""
+        self.caches[name] = cache
+    
+    def reset(self) -> None:
+        """Drop all recorded samples."""
+        # Zeroed in place: instrumented methods keep references to their stats
+        for stats in self.operations.values():
+            stats.clear()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Plain-data copy of every counter and histogram."""
+        return {
+            'bucket_bounds_seconds': [bound / 1e9 for bound in BUCKET_BOUNDS_NS],
+            'operations': {name: stats.snapshot()
+                           for name, stats in sorted(self.operations.items())},
+            'caches': {name: cache.stats() for name, cache in sorted(self.caches.items())},
+        }
+    
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+    
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP calculator_operations_total Calculator operation calls.",
+            "# TYPE calculator_operations_total counter",
+        ]
+        items = sorted(self.operations.items())
+        for name, stats in items:
+            lines.append(f'calculator_operations_total{{op="{name}"}} {stats.calls}')
+        lines += [
+            "# HELP calculator_errors_total Calculator operation errors by reason.",
+            "# TYPE calculator_errors_total counter",
+        ]
+        for name, stats in items:
+            for reason, count in sorted(stats.errors.items()):
+                label = reason.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'calculator_errors_total{{op="{name}",reason="{label}"}} {count}')
+        lines += [
+            "# HELP calculator_operation_latency_seconds Calculator operation latency.",
+            "# TYPE calculator_operation_latency_seconds histogram",
+        ]
+        for name, stats in items:
+            cumulative = 0
+            for index, count in enumerate(stats.buckets):
+                cumulative += count
+                le = (f"{BUCKET_BOUNDS_NS[index] / 1e9:g}"
+                      if index < len(BUCKET_BOUNDS_NS) else "+Inf")
+                lines.append(
+                    f'calculator_operation_latency_seconds_bucket{{op="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'calculator_operation_latency_seconds_sum{{op="{name}"}} {stats.total_ns / 1e9:g}')
+            lines.append(f'calculator_operation_latency_seconds_count{{op="{name}"}} {stats.calls}')
+        caches = [(name, cache.stats()) for name, cache in sorted(self.caches.items())]
+        for metric, kind, key, text in (('cache_hits_total', 'counter', 'hits', 'Cache hits.'),
+                                        ('cache_misses_total', 'counter', 'misses', 'Cache misses.'),
+                                        ('cache_hit_ratio', 'gauge', 'hit_rate', 'Cache hit rate.')):
+            if caches:
+                lines += [f"# HELP calculator_{metric} {text}", f"# TYPE calculator_{metric} {kind}"]
+            for name, stats in caches:
+                lines.append(f'calculator_{metric}{{cache="{name}"}} {stats[key]:g}')
+        return "\n".join(lines) + "\n"
+    
+    def export(self, path: str, fmt: Optional[str] = None) -> None:
+        """Write a snapshot to path as 'json' or 'prometheus' (guessed from the extension)."""
+        if fmt is None:
+            fmt = 'json' if path.endswith('.json') else 'prometheus'
+        if fmt not in ('json', 'prometheus'):
+            raise ValueError(f"Unknown metrics format: {fmt}")
+        text = self.to_json() if fmt == 'json' else self.to_prometheus()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    
+    def summary(self) -> List[str]:
+        """Human-readable table of calls, errors and latency quantiles."""
+        lines = [f"{'operation':18} {'calls':>8} {'errors':>7} {'mean':>10} {'p50':>10} {'p99':>10}"]
+        for name, stats in sorted(self.operations.items()):
+            if not stats.calls:
+                continue
+            errors = sum(stats.errors.values())
+            mean = stats.total_ns / stats.calls / 1e3
+            lines.append(f"{name:18} {stats.calls:8d} {errors:7d} {mean:8.1f}µs "
+                         f"{stats.quantile(0.5) * 1e6:8.1f}µs {stats.quantile(0.99) * 1e6:8.1f}µs")
+        for name, cache in sorted(self.caches.items()):
+            stats = cache.stats()
+            lines.append(f"{name} cache: {stats['hits']} hits, {stats['misses']} misses, "
+                         f"{stats['hit_rate']:.1%} hit rate")
+        return lines
\ No newline at end of file
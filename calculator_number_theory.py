@@ -0,0 +1,399 @@
+"""
+Calculator Number Theory
+Primality testing, factorization, gcd/lcm, next primes and prime ranges.
+
+is_prime uses trial division by the small primes, then Miller-Rabin with
+the first twelve prime bases, which is deterministic below 3.3e23 (so for
+every 64-bit integer); larger numbers get `rounds` further random bases, so
+a composite passes with probability below 4**-rounds. factorize divides out
+the small primes and splits what is left with Brent's variant of Pollard's
+rho, which gives up (CALCULATION_ERROR) after max_iterations steps.
+
+PrimeSieve is a segmented sieve of Eratosthenes over the odd numbers below
+its limit (10**10 by default). Each segment covers SEGMENT_SPAN numbers and
+is kept as a bitset of SEGMENT_SPAN // 16 bytes, one bit per odd number, in
+an LRU cache of max_segments segments; only the primes up to the square
+root of the limit are kept besides. Memory is therefore bounded whatever
+the range: counting or listing the primes of a range streams through its
+segments. Primality and next-prime queries read the bitset when their
+segment is cached, so repeated queries in a range are O(1) lookups. A
+segment is sieved once WARM_QUERIES queries have fallen into it; before
+that, Miller-Rabin is cheaper than sieving a whole segment.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import threading
+from collections import OrderedDict
+
+from calculator import CALCULATION_ERROR, DOMAIN_ERROR, CalculatorError
+from calculator_power import as_integer, integer_digits
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Iterator, List, Optional
+
+SIEVE_LIMIT = 10 ** 10
+SEGMENT_SPAN = 1 << 20
+DEFAULT_MAX_SEGMENTS = 64  # 4 MiB of bitsets
+WARM_QUERIES = 32
+
+# Miller-Rabin with these bases is exact below this bound
+MR_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+MR_DETERMINISTIC_LIMIT = 318665857834031151167461
+DEFAULT_ROUNDS = 20
+
+# Primality tests above this size cost over a second
+PRIME_MAX_DIGITS = 500
+FACTOR_MAX_ITERATIONS = 1 << 20
+
+_HALF_SPAN = SEGMENT_SPAN // 2
+_TO_DIGITS = bytes.maketrans(b'\0\1', b'01')
+_random = random.Random()
+
+
+def _simple_sieve(n: int) -> List[int]:
+    """Primes up to n with a sieve of Eratosthenes."""
+    sieve = bytearray([1]) * (n + 1)
+    sieve[0:2] = b'\0\0'
+    for i in range(2, math.isqrt(n) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, n + 1, i)))
+    return [i for i, is_prime in enumerate(sieve) if is_prime]
+
+
+SMALL_PRIMES = tuple(_simple_sieve(1000))
+
+
+def _integer(value, what: str) -> int:
+    """value as an int, or DOMAIN_ERROR naming what needed it."""
+    n = as_integer(value)
+    if n is None:
+        raise CalculatorError.from_code(DOMAIN_ERROR, f"{what} is only defined for integers")
+    return n
+
+
+def _check_size(n: int, max_digits: Optional[int]) -> None:
+    if max_digits is not None:
+        digits = integer_digits(n)
+        if digits > max_digits:
+            raise CalculatorError.from_code(
+                DOMAIN_ERROR, f"number has about {digits} digits (limit {max_digits})")
+
+
+def miller_rabin(n: int, bases) -> bool:
+    """Whether odd n > 2 is a strong probable prime to every base."""
+    d = n - 1
+    s = (d & -d).bit_length() - 1
+    d >>= s
+    for a in bases:
+        a %= n
+        if a == 0:
+            continue
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _is_prime(n: int, rounds: int) -> bool:
+    """Trial division by the small primes, then Miller-Rabin."""
+    if n < 2:
+        return False
+    for p in SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    if n < SMALL_PRIMES[-1] ** 2:
+        return True
+    if not miller_rabin(n, MR_BASES):
+        return False
+    if n < MR_DETERMINISTIC_LIMIT:
+        return True
+    return miller_rabin(n, [_random.randrange(2, n - 1) for _ in range(rounds)])
+
+
+class PrimeSieve:
+    """Segmented sieve of Eratosthenes with an LRU cache of bitset segments."""
+    
+    def __init__(self, limit: int = SIEVE_LIMIT, max_segments: int = DEFAULT_MAX_SEGMENTS):
+        """Sieve numbers below limit, caching at most max_segments segments."""
+        if max_segments < 1:
+            raise ValueError("max_segments must be positive")
+        self.limit = limit
+        self.max_segments = max_segments
+        self.sieved = 0
+        self._segments: OrderedDict[int, bytes] = OrderedDict()
+        self._queries: Dict[int, int] = {}
+        self._base_primes: List[int] = [3]
+        self._lock = threading.Lock()
+    
+    def _odd_base_primes(self, bound: int) -> List[int]:
+        """Odd primes up to bound, extending the stored list if needed."""
+        if self._base_primes[-1] < bound:
+            self._base_primes = _simple_sieve(max(bound, 2 * self._base_primes[-1]))[1:]
+        return self._base_primes
+    
+    def _sieve(self, index: int) -> bytes:
+        """Bitset of segment index: bit i is set if index * SEGMENT_SPAN + 2i + 1 is prime."""
+        lo = index * SEGMENT_SPAN
+        flags = bytearray([1]) * _HALF_SPAN
+        if index == 0:
+            flags[0] = 0  # 1 is not prime
+        root = math.isqrt(lo + SEGMENT_SPAN - 1)
+        for p in self._odd_base_primes(root):
+            if p > root:
+                break
+            # First odd multiple of p in the segment, from p * p on
+            start = max(p * p, (lo + p - 1) // p * p)
+            if not start & 1:
+                start += p
+            i = (start - lo) // 2
+            flags[i::p] = bytes(len(range(i, _HALF_SPAN, p)))
+        self.sieved += 1
+        # Flags as a binary numeral, lowest index last, then as little-endian bytes
+        return int(flags[::-1].translate(_TO_DIGITS), 2).to_bytes(_HALF_SPAN // 8, 'little')
+    
+    def segment(self, index: int) -> bytes:
+        """The bitset of segment index, sieving and caching it if needed."""
+        with self._lock:
+            bits = self._segments.get(index)
+            if bits is not None:
+                self._segments.move_to_end(index)
+                return bits
+        bits = self._sieve(index)
+        with self._lock:
+            self._segments[index] = bits
+            self._queries.pop(index, None)
+            while len(self._segments) > self.max_segments:
+                self._segments.popitem(last=False)
+        return bits
+    
+    def cached(self, n: int) -> Optional[bytes]:
+        """
+        The bitset of the segment holding n if it is cached, else None.
+        
+        Counts the query, and sieves the segment once it has had
+        WARM_QUERIES queries.
+        """
+        if n >= self.limit:
+            return None
+        index = n // SEGMENT_SPAN
+        with self._lock:
+            bits = self._segments.get(index)
+            if bits is not None:
+                return bits
+            count = self._queries[index] = self._queries.get(index, 0) + 1
+        return self.segment(index) if count >= WARM_QUERIES else None
+    
+    def is_prime(self, n: int) -> Optional[bool]:
+        """Whether n is prime from a cached segment, or None if it is not cached."""
+        if n < 3 or not n & 1:
+            return n == 2
+        bits = self.cached(n)
+        if bits is None:
+            return None
+        i = n % SEGMENT_SPAN // 2
+        return bool(bits[i >> 3] >> (i & 7) & 1)
+    
+    def next_prime(self, n: int) -> Optional[int]:
+        """The smallest prime above n from cached segments, or None if not cached."""
+        if n < 2:
+            return 2
+        n += 1 + (n & 1)  # next odd number above n
+        bits = self.cached(n)
+        while bits is not None:
+            index, offset = divmod(n, SEGMENT_SPAN)
+            lo = index * SEGMENT_SPAN
+            i = offset // 2
+            byte = bits[i >> 3] >> (i & 7)
+            j = i >> 3
+            while not byte:
+                j += 1
+                if j == len(bits):
+                    break
+                byte = bits[j]
+                i = j * 8
+            else:
+                return lo + 2 * (i + ((byte & -byte).bit_length() - 1)) + 1
+            n = lo + SEGMENT_SPAN + 1
+            bits = self.segment(n // SEGMENT_SPAN) if n < self.limit else None
+        return None
+    
+    def _check_range(self, start: int, stop: int) -> None:
+        if stop > self.limit:
+            raise CalculatorError.from_code(
+                DOMAIN_ERROR, f"prime ranges are limited to {self.limit}")
+    
+    def _spans(self, start: int, stop: int) -> Iterator[tuple]:
+        """(lo, bitset, first bit, end bit) of each segment overlapping [start, stop)."""
+        start = max(start, 1)
+        while start < stop:
+            index = start // SEGMENT_SPAN
+            lo = index * SEGMENT_SPAN
+            end = min(stop, lo + SEGMENT_SPAN)
+            yield lo, self.segment(index), (start - lo) // 2, (end - lo) // 2
+            start = lo + SEGMENT_SPAN
+    
+    def count(self, start: int, stop: int) -> int:
+        """Number of primes p with start <= p < stop."""
+        self._check_range(start, stop)
+        total = 1 if start <= 2 < stop else 0
+        for _, bits, first, end in self._spans(start, stop):
+            value = int.from_bytes(bits, 'little') >> first
+            total += bin(value & ((1 << (end - first)) - 1)).count('1')
+        return total
+    
+    def primes(self, start: int, stop: int) -> Iterator[int]:
+        """Iterate over the primes p with start <= p < stop in order."""
+        self._check_range(start, stop)
+        return self._iter_primes(start, stop)
+    
+    def _iter_primes(self, start: int, stop: int) -> Iterator[int]:
+        if start <= 2 < stop:
+            yield 2
+        for lo, bits, first, end in self._spans(start, stop):
+            # Bit i of the segment is character i of the reversed binary numeral
+            digits = bin(int.from_bytes(bits, 'little'))[:1:-1]
+            i = digits.find('1', first, end)
+            while i >= 0:
+                yield lo + 2 * i + 1
+                i = digits.find('1', i + 1, end)
+    
+    def clear(self) -> None:
+        """Drop every cached segment."""
+        with self._lock:
+            self._segments.clear()
+            self._queries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._segments)
+    
+    def __repr__(self) -> str:
+        return f"PrimeSieve(limit={self.limit}, segments={len(self)}/{self.max_segments})"
+
+
+# Shared by every calculator
+sieve = PrimeSieve()
+
+
+def is_prime(n, rounds: int = DEFAULT_ROUNDS,
+             max_digits: Optional[int] = PRIME_MAX_DIGITS) -> bool:
+    """Whether n is prime; exact below 3.3e23, probabilistic above."""
+    n = _integer(n, "primality")
+    _check_size(n, max_digits)
+    cached = sieve.is_prime(n)
+    if cached is not None:
+        return cached
+    return _is_prime(n, rounds)
+
+
+def next_prime(n, rounds: int = DEFAULT_ROUNDS,
+               max_digits: Optional[int] = PRIME_MAX_DIGITS) -> int:
+    """The smallest prime greater than n."""
+    n = _integer(n, "next prime")
+    _check_size(n, max_digits)
+    cached = sieve.next_prime(n)
+    if cached is not None:
+        return cached
+    if n < 5:
+        return (2, 2, 3, 5, 5)[max(n, 0)]
+    # Candidates 6k - 1 and 6k + 1
+    n += 1
+    n += (1, 0, 3, 2, 1, 0)[n % 6]
+    step = 4 if n % 6 == 1 else 2
+    while not _is_prime(n, rounds):
+        n += step
+        step = 6 - step
+    return n
+
+
+def _pollard_brent(n: int, budget: List[int]) -> int:
+    """A non-trivial factor of odd composite n, spending budget[0] iterations at most."""
+    while True:
+        c = _random.randrange(1, n)
+        y = _random.randrange(1, n)
+        m = 128
+        g = r = q = 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+            budget[0] -= r
+            if budget[0] < 0:
+                raise CalculatorError.from_code(
+                    CALCULATION_ERROR,
+                    f"no factor of a {integer_digits(n)}-digit number found within the "
+                    f"iteration limit")
+            r *= 2
+        if g == n:
+            # The batch overshot: retrace it one step at a time
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+
+def factorize(n, max_iterations: int = FACTOR_MAX_ITERATIONS,
+              max_digits: Optional[int] = PRIME_MAX_DIGITS) -> Dict[int, int]:
+    """Prime factorization of n >= 1 as {prime: exponent}, in increasing order."""
+    n = _integer(n, "factorization")
+    if n < 1:
+        raise CalculatorError.from_code(
+            DOMAIN_ERROR, "factorization is only defined for positive integers")
+    _check_size(n, max_digits)
+    factors: Dict[int, int] = {}
+    for p in SMALL_PRIMES:
+        if p * p > n:
+            break
+        while n % p == 0:
+            factors[p] = factors.get(p, 0) + 1
+            n //= p
+    budget = [max_iterations]
+    pending = [n] if n > 1 else []
+    while pending:
+        m = pending.pop()
+        if _is_prime(m, DEFAULT_ROUNDS):
+            factors[m] = factors.get(m, 0) + 1
+        else:
+            d = _pollard_brent(m, budget)
+            pending += (d, m // d)
+    return dict(sorted(factors.items()))
+
+
+def format_factors(factors: Dict[int, int]) -> str:
+    """'2^3 × 3 × 5' for {2: 3, 3: 1, 5: 1}; '1' for no factors."""
+    return ' × '.join(str(p) if e == 1 else f"{p}^{e}" for p, e in factors.items()) or '1'
+
+
+def gcd(*values) -> int:
+    """Greatest common divisor of integers (0 for no values)."""
+    result = 0
+    for value in values:
+        result = math.gcd(result, _integer(value, "gcd"))
+    return result
+
+
+def lcm(*values) -> int:
+    """Least common multiple of integers (1 for no values, 0 if one is 0)."""
+    result = 1
+    for n in [abs(_integer(value, "lcm")) for value in values]:
+        result = result * n // math.gcd(result, n) if n and result else 0
+    return result
\ No newline at end of file
@@ -0,0 +1,377 @@
+"""
+Calculator Operators
+Registry of the infix, prefix and postfix operators known to the expression
+compiler, with the metadata the parser, the evaluator and the help text need.
+
+Each token maps to one Operator, so the parser dispatches with a single dict
+lookup whatever the size of the operator set. A handler is either the name
+of a Calculator method or a callable taking (calculator, *args). An optional
+check takes the same arguments and returns an error code from calculator (OK
+if they are valid). It runs before the handler, so the non-raising
+evaluation path reports invalid arguments without an exception; it mirrors
+the handler's own validation, which must still raise CalculatorError.
+
+Operator modules outside this package are registered lazily by token:
+
+    registry.register_lazy('my_operators', ['hypot', 'clamp'])
+
+and imported only when one of their tokens is first parsed. The module must
+define register_operators(registry). The CALCULATOR_OPERATORS environment
+variable declares lazy modules for command-line use, as
+'module:token,token;module:token'.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+
+from calculator import (
+    DIVISION_BY_ZERO, DOMAIN_ERROR, FACTORIAL_DOMAIN, FACTORIAL_TOO_LARGE, INVALID_LOG_BASE,
+    MODULO_BY_ZERO, NEGATIVE_SQUARE_ROOT, NON_POSITIVE_LOG, OK, POWER_DOMAIN, CalculatorError,
+)
+from calculator_factorial import MAX_FLOAT_FACTORIAL
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+# Operator kinds
+INFIX = 'infix'
+PREFIX = 'prefix'
+POSTFIX = 'postfix'
+
+# Binding powers: + - < * / mod < unary minus and function arguments < ^ < !
+ADDITIVE_BP = 10
+MULTIPLICATIVE_BP = 20
+PREFIX_BP = 30
+POWER_BP = 40
+POSTFIX_BP = 50
+
+_NAME_START = frozenset('abcdefghijklmnopqrstuvwxyz_')
+_NAME_CHARS = _NAME_START | frozenset('0123456789')
+_NOT_SYMBOLS = _NAME_CHARS | frozenset('().,')
+
+_SECTION_TITLES = {
+    'Basic': 'Basic Operations',
+    'Trigonometric': 'Trigonometric Functions',
+    'Logarithmic': 'Logarithmic Functions',
+    'Integer': 'Integer Functions',
+}
+
+
+class Operator:
+    """One operator: its token, how it parses and what evaluates it."""
+    
+    __slots__ = ('token', 'kind', 'handler', 'min_args', 'max_args', 'precedence',
+                 'right_assoc', 'degrees', 'check', 'section', 'help')
+    
+    def __init__(self, token: str, kind: str, handler: Union[str, Callable[..., Any]],
+                 arity: Union[int, Tuple[int, int]] = 1, precedence: Optional[int] = None,
+                 right_assoc: bool = False, degrees: bool = False,
+                 check: Optional[Callable[..., int]] = None, section: str = 'Other',
+                 description: str = '', help: Optional[Tuple[Tuple[str, str], ...]] = None):
+        if kind not in (INFIX, PREFIX, POSTFIX):
+            raise ValueError(f"Unknown operator kind: {kind}")
+        min_args, max_args = (arity, arity) if isinstance(arity, int) else arity
+        if kind != PREFIX and (min_args, max_args) != ((2, 2) if kind == INFIX else (1, 1)):
+            raise ValueError(f"{kind} operator {token} must take {2 if kind == INFIX else 1} arguments")
+        if not 1 <= min_args <= max_args:
+            raise ValueError(f"Invalid arity for {token}: {arity}")
+        if precedence is None:
+            precedence = {INFIX: ADDITIVE_BP, PREFIX: PREFIX_BP, POSTFIX: POSTFIX_BP}[kind]
+        self.token = token
+        self.kind = kind
+        self.handler = handler
+        self.min_args = min_args
+        self.max_args = max_args
+        self.precedence = precedence
+        self.right_assoc = right_assoc
+        self.degrees = degrees
+        self.check = check
+        self.section = section
+        if help is None:
+            help = ((self.default_usage(), description),)
+        self.help = help
+    
+    def default_usage(self) -> str:
+        """Usage line derived from the kind and arity."""
+        if self.kind == INFIX:
+            return f"<num1> {self.token} <num2>"
+        if self.kind == POSTFIX:
+            return f"<num>{self.token}"
+        if self.max_args == 1:
+            return f"{self.token} <num>"
+        return f"{self.token} " + ' '.join(f"<num{i}>" for i in range(1, self.max_args + 1))
+    
+    def __repr__(self) -> str:
+        return f"Operator({self.token!r}, {self.kind!r}, {self.handler!r})"
+
+
+class OperatorRegistry:
+    """Operators by token, with lazily imported operator modules."""
+    
+    def __init__(self):
+        self._operators: Dict[str, Operator] = {}
+        self._lazy: Dict[str, str] = {}
+        # Symbol tokens for the scanner; unary signs parse even without operators
+        self.symbols = {'+', '-'}
+        # Incremented on every change so caches of compiled expressions can tell
+        self.version = 0
+    
+    def register(self, operator: Operator, aliases: Iterable[str] = (),
+                 replace: bool = False) -> None:
+        """Add operator under its token and any aliases."""
+        tokens = (operator.token,) + tuple(aliases)
+        for token in tokens:
+            _check_token(token)
+            if not replace and token in self._operators:
+                raise ValueError(f"Operator already registered: {token}")
+        for token in tokens:
+            self._operators[token] = operator
+            self._lazy.pop(token, None)
+            if token[0] not in _NAME_START:
+                self.symbols.add(token)
+        self.version += 1
+    
+    def register_lazy(self, module: str, tokens: Iterable[str]) -> None:
+        """Import module (which registers tokens) when one of tokens is first used."""
+        for token in tokens:
+            _check_token(token)
+            if token not in self._operators:
+                self._lazy[token] = module
+                if token[0] not in _NAME_START:
+                    self.symbols.add(token)
+        self.version += 1
+    
+    def unregister(self, token: str) -> None:
+        """Remove one token (registered or lazy)."""
+        self._operators.pop(token, None)
+        self._lazy.pop(token, None)
+        if token not in ('+', '-'):
+            self.symbols.discard(token)
+        self.version += 1
+    
+    def lookup(self, token: str) -> Optional[Operator]:
+        """The operator for token, importing its module on first use."""
+        operator = self._operators.get(token)
+        if operator is None and token in self._lazy:
+            operator = self._load(token)
+        return operator
+    
+    def _load(self, token: str) -> Operator:
+        import importlib
+        
+        module_name = self._lazy[token]
+        module = importlib.import_module(module_name)
+        module.register_operators(self)
+        operator = self._operators.get(token)
+        if operator is None:
+            self._lazy.pop(token, None)
+            raise ValueError(f"Module {module_name} did not register operator {token}")
+        return operator
+    
+    def __contains__(self, token: str) -> bool:
+        return token in self._operators or token in self._lazy
+    
+    def __iter__(self) -> Iterator[Operator]:
+        """Registered operators in registration order, each once."""
+        seen = set()
+        for operator in self._operators.values():
+            if id(operator) not in seen:
+                seen.add(id(operator))
+                yield operator
+    
+    def sections(self) -> Dict[str, List[Operator]]:
+        """Registered operators grouped by help section."""
+        sections: Dict[str, List[Operator]] = {}
+        for operator in self:
+            sections.setdefault(operator.section, []).append(operator)
+        return sections
+    
+    def summary_lines(self) -> List[str]:
+        """One 'Section: tok, tok' line per section for the welcome banner."""
+        lines = [f"{section}: {', '.join(op.token for op in operators)}"
+                 for section, operators in self.sections().items()]
+        lazy = sorted(self._lazy)
+        if lazy:
+            lines.append(f"Plugins: {', '.join(lazy)}")
+        return lines
+    
+    def help_text(self) -> str:
+        """Help sections for every registered operator."""
+        blocks = []
+        for section, operators in self.sections().items():
+            lines = [f"{_SECTION_TITLES.get(section, section + ' Operations')}:"]
+            for operator in operators:
+                for usage, description in operator.help:
+                    lines.append(f"  {usage:<19} {description}".rstrip())
+            blocks.append('\n'.join(lines))
+        return '\n\n'.join(blocks)
+
+
+def _check_token(token: str) -> None:
+    """Reject tokens the scanner cannot produce as a single name or symbol."""
+    if token[:1] in _NAME_START:
+        valid = all(char in _NAME_CHARS for char in token)
+    else:
+        # One or two symbol characters, such as % or **
+        valid = 1 <= len(token) <= 2 and not any(
+            char in _NOT_SYMBOLS or char.isspace() or char != char.lower() for char in token)
+    if not valid:
+        raise ValueError(f"Invalid operator token: {token!r}")
+
+
+def _factorial(calculator, value):
+    """Factorial of an integral float, as a float."""
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise CalculatorError.from_code(DOMAIN_ERROR, "factorial needs a finite number")
+        if value.is_integer():
+            value = int(value)
+    return float(calculator.factorial(value))
+
+
+def _powmod(calculator, base, exponent, modulus):
+    """Modular power of integers or integral floats, as an exact int."""
+    return calculator.powmod(base, exponent, modulus)
+
+
+def _integer_method(name: str):
+    """Handler calling Calculator.<name> on integers or integral floats, returning an int."""
+    def handler(calculator, *args):
+        return int(getattr(calculator, name)(*args))
+    handler.__name__ = f"_{name}"
+    return handler
+
+
+# Argument checks of the built-in operators, mirroring the Calculator methods
+
+def _check_divisor(a, b) -> int:
+    return DIVISION_BY_ZERO if b == 0 else OK
+
+
+def _check_modulus(a, b) -> int:
+    return MODULO_BY_ZERO if b == 0 else OK
+
+
+def _check_square_root(x) -> int:
+    return NEGATIVE_SQUARE_ROOT if x < 0 else OK
+
+
+def _check_log(x, base=None) -> int:
+    if x <= 0:
+        return NON_POSITIVE_LOG
+    if base is not None and (base <= 0 or base == 1):
+        return INVALID_LOG_BASE
+    return OK
+
+
+def _check_power(base, exponent) -> int:
+    if base == 0 and exponent < 0:
+        return DIVISION_BY_ZERO
+    if base < 0 and math.isfinite(exponent) and exponent != int(exponent):
+        return POWER_DOMAIN
+    return OK
+
+
+def _check_angle(x, *args) -> int:
+    return OK if math.isfinite(x) else DOMAIN_ERROR
+
+
+def _check_factorial(n) -> int:
+    if not math.isfinite(n):
+        return DOMAIN_ERROR
+    if n < 0 or n != int(n):
+        return FACTORIAL_DOMAIN
+    return FACTORIAL_TOO_LARGE if n > MAX_FLOAT_FACTORIAL else OK
+
+
+def _is_integral(x) -> bool:
+    # Exact int results of other integer functions may be beyond float range
+    return isinstance(x, int) or float(x).is_integer()
+
+
+def _check_powmod(base, exponent, modulus) -> int:
+    if not all(map(_is_integral, (base, exponent, modulus))):
+        return DOMAIN_ERROR
+    if modulus == 0:
+        return MODULO_BY_ZERO
+    if exponent < 0 and math.gcd(int(base), int(modulus)) != 1:
+        return POWER_DOMAIN
+    return OK
+
+
+def _check_integers(*args) -> int:
+    return OK if all(map(_is_integral, args)) else DOMAIN_ERROR
+
+
+def _trig_help(name: str, token: str) -> Tuple[Tuple[str, str], ...]:
+    return ((f"{token} <angle>", f"{name} (in radians)"),
+            (f"{token} <angle> deg", f"{name} (in degrees)"))
+
+
+def _builtin_registry() -> OperatorRegistry:
+    registry = OperatorRegistry()
+    register = registry.register
+    register(Operator('+', INFIX, 'add', 2, ADDITIVE_BP, section='Basic',
+                      description='Addition'))
+    register(Operator('-', INFIX, 'subtract', 2, ADDITIVE_BP, section='Basic',
+                      description='Subtraction'))
+    register(Operator('*', INFIX, 'multiply', 2, MULTIPLICATIVE_BP, section='Basic',
+                      description='Multiplication'), aliases=('×',))
+    register(Operator('/', INFIX, 'divide', 2, MULTIPLICATIVE_BP, check=_check_divisor,
+                      section='Basic', description='Division'), aliases=('÷',))
+    register(Operator('^', INFIX, 'power', 2, POWER_BP, right_assoc=True, check=_check_power,
+                      section='Basic', description='Power (exponentiation)'), aliases=('**',))
+    register(Operator('sqrt', PREFIX, 'square_root', check=_check_square_root,
+                      section='Basic', description='Square root'))
+    register(Operator('mod', INFIX, 'modulo', 2, MULTIPLICATIVE_BP, check=_check_modulus,
+                      section='Basic', description='Modulo'))
+    register(Operator('!', POSTFIX, _factorial, check=_check_factorial, section='Basic',
+                      description='Factorial'))
+    for token, name in (('sin', 'Sine'), ('cos', 'Cosine'), ('tan', 'Tangent')):
+        register(Operator(token, PREFIX, token, degrees=True, check=_check_angle,
+                          section='Trigonometric', help=_trig_help(name, token)))
+    register(Operator('ln', PREFIX, 'log', check=_check_log, section='Logarithmic',
+                      description='Natural logarithm'))
+    register(Operator('log', PREFIX, 'log', (1, 2), check=_check_log, section='Logarithmic', help=(
+        ("log <num>", "Natural logarithm (same as ln)"),
+        ("log <num> <base>", "Logarithm with custom base"))))
+    register(Operator('log10', PREFIX, 'log10', check=_check_log, section='Logarithmic',
+                      description='Base-10 logarithm'))
+    register(Operator('powmod', PREFIX, _powmod, 3, check=_check_powmod, section='Integer',
+                      help=(("powmod <a> <b> <m>", "a ^ b mod m, exactly"),)))
+    register(Operator('gcd', PREFIX, _integer_method('gcd'), 2, check=_check_integers,
+                      section='Integer', description='Greatest common divisor'))
+    register(Operator('lcm', PREFIX, _integer_method('lcm'), 2, check=_check_integers,
+                      section='Integer', description='Least common multiple'))
+    register(Operator('isprime', PREFIX, _integer_method('is_prime'), check=_check_integers,
+                      section='Integer', description='1 if num is prime, else 0'))
+    register(Operator('nextprime', PREFIX, _integer_method('next_prime'),
+                      check=_check_integers, section='Integer',
+                      description='Smallest prime greater than num'))
+    return registry
+
+
+def _register_environment(registry: OperatorRegistry, spec: str) -> None:
+    """Declare lazy modules from a 'module:token,token;module:token' string."""
+    for entry in spec.split(';'):
+        module, _, tokens = entry.partition(':')
+        if module.strip() and tokens.strip():
+            registry.register_lazy(module.strip(), [token.strip() for token in tokens.split(',')])
+
+
+registry = _builtin_registry()
+_register_environment(registry, os.environ.get('CALCULATOR_OPERATORS', ''))
+
+
+def register(operator: Operator, aliases: Iterable[str] = (), replace: bool = False) -> None:
+    """Register operator in the shared registry."""
+    registry.register(operator, aliases, replace)
+
+
+def register_lazy(module: str, tokens: Iterable[str]) -> None:
+    """Declare a lazily imported operator module in the shared registry."""
+    registry.register_lazy(module, tokens)
\ No newline at end of file
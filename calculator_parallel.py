@@ -0,0 +1,109 @@
+"""
+Calculator Parallel Evaluation
+Evaluates large expression files on a process pool, one Calculator per worker.
+
+State policy: every chunk is evaluated on a freshly reset Calculator, so
+results never depend on which worker received which chunk. Memory commands
+(ms, m+, m-) and variable assignments therefore only affect later lines of
+the same chunk, and worker memory and variables are always discarded when
+the chunk finishes. Worker history is either
+discarded (the default) or returned with the chunk and merged into the
+caller's Calculator in input order, keeping the time each record was made.
+"""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
+
+from calculator import Calculator
+from calculator_cli import CalculatorCLI
+
+if TYPE_CHECKING:
+    from calculator_cli import BatchRow
+
+
+DEFAULT_CHUNK_SIZE = 10000
+HISTORY_POLICIES = ('discard', 'merge')
+
+Chunk = Tuple[int, List[str]]
+
+# Per-process CLI created by the pool initializer
+_worker_cli: Optional[CalculatorCLI] = None
+_worker_history = 'discard'
+
+
+def _init_worker(history: str, result_cache: Optional[str] = None) -> None:
+    """Create the worker's Calculator."""
+    global _worker_cli, _worker_history
+    _worker_cli = CalculatorCLI(interactive=False)
+    # Chunks are bounded, so an unbounded history never outgrows a chunk
+    _worker_cli.calculator = Calculator(history_capacity=None, result_cache=result_cache)
+    _worker_history = history
+
+
+def _evaluate_chunk(chunk: Chunk) -> Tuple[List[BatchRow], list]:
+    """Evaluate one chunk on a clean Calculator and return its rows and history."""
+    start, lines = chunk
+    _worker_cli.calculator.reset()
+    _worker_cli.variables = None
+    _worker_cli._values = None
+    rows = list(_worker_cli.evaluate_lines(lines, start))
+    records = []
+    if _worker_history == 'merge':
+        records = list(_worker_cli.calculator.history.iter_timed())
+    return rows, records
+
+
+def _chunks(lines: Iterable[str], chunk_size: int) -> Iterator[Chunk]:
+    """Split lines into (first line number, lines) chunks."""
+    iterator = iter(lines)
+    start = 1
+    while True:
+        block = list(islice(iterator, chunk_size))
+        if not block:
+            return
+        yield start, block
+        start += len(block)
+
+
+def evaluate_parallel(lines: Iterable[str], workers: Optional[int] = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE, history: str = 'discard',
+                      calculator: Optional[Calculator] = None,
+                      result_cache: Optional[str] = None) -> Iterator[BatchRow]:
+    """
+    Evaluate expressions on a process pool, yielding rows in input order.
+    
+    Rows have the same (line number, expression, result, error) shape as
+    CalculatorCLI.evaluate_lines. At most two chunks per worker are in flight,
+    so memory stays bounded for arbitrarily large inputs. With history='merge'
+    the worker history of each chunk is appended to calculator.history.
+    With result_cache, the path of a ResultCache database, every worker
+    opens it and they share results.
+    """
+    if history not in HISTORY_POLICIES:
+        raise ValueError(f"Unknown history policy: {history}")
+    if history == 'merge' and calculator is None:
+        raise ValueError("history='merge' needs a calculator to merge into")
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be positive")
+    workers = workers or os.cpu_count() or 1
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(history, result_cache)) as executor:
+        pending = deque()
+        chunks = _chunks(lines, chunk_size)
+        for chunk in chunks:
+            pending.append(executor.submit(_evaluate_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            rows, records = pending.popleft().result()
+            for chunk in islice(chunks, 1):
+                pending.append(executor.submit(_evaluate_chunk, chunk))
+            if records:
+                calculator.history.extend_timed(records)
+            yield from rows
\ No newline at end of file
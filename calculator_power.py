@@ -0,0 +1,221 @@
+"""
+Calculator Power Engine
+Exact integer powers and modular exponentiation, one at a time or batched.
+
+exact_power estimates the number of digits of base ** exponent from
+logarithms and refuses (POWER_OVERFLOW) before doing any work when it is
+over the limit. powmod uses three-argument pow, which squares and multiplies
+modulo the modulus, so its cost depends on the sizes of the exponent and the
+modulus, never on the size of base ** exponent; limiting the digits of both
+bounds the latency. A negative exponent asks for a power of the modular
+inverse of base.
+
+powmod_batch applies powmod element-wise. With NumPy, operands that fit in
+int64 and moduli below 2**32 are exponentiated on whole uint64 arrays, one
+square-and-multiply step per exponent bit; any other input is computed
+element by element with pow. Errors are reported per element as in
+calculator_batch, and failed elements are 0.
+"""
+
+from __future__ import annotations
+
+import math
+from array import array
+
+from calculator import (
+    DOMAIN_ERROR, MODULO_BY_ZERO, OK, POWER_DOMAIN, POWER_OVERFLOW, POWMOD_MAX_DIGITS,
+    CalculatorError,
+)
+from calculator_factorial import DEFAULT_MAX_DIGITS
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, List, Optional, Tuple, Union
+
+# Moduli below this are exponentiated in uint64 without overflow
+VECTOR_MODULUS_LIMIT = 1 << 32
+
+_LOG10_2 = math.log10(2)
+
+
+def as_integer(value: Any) -> Optional[int]:
+    """value as an int if it is an int or an integral float, else None."""
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if hasattr(value, 'dtype') and value.dtype.kind in 'iuf':  # NumPy scalar
+        return as_integer(value.item())
+    return None
+
+
+def integer_digits(value: int) -> int:
+    """Number of decimal digits of value, estimated from its bit length."""
+    return int(abs(value).bit_length() * _LOG10_2) + 1
+
+
+def integer_text(value: int) -> str:
+    """value in decimal, or '<N-digit integer>' if it is beyond float precision."""
+    if abs(value) <= 1 << 53:
+        return str(value)
+    return f"<{integer_digits(value)}-digit integer>"
+
+
+def power_digits(base: int, exponent: int) -> int:
+    """Estimate the number of decimal digits of base ** exponent without computing it."""
+    if base in (-1, 0, 1) or exponent == 0:
+        return 1
+    return int(exponent * math.log10(abs(base))) + 1
+
+
+def exact_power(base: Union[int, float], exponent: Union[int, float],
+                max_digits: Optional[int] = DEFAULT_MAX_DIGITS) -> int:
+    """
+    Exact base ** exponent for an integer base and a non-negative integer exponent.
+    
+    Results estimated to have more than max_digits digits raise
+    POWER_OVERFLOW (None disables the guard).
+    """
+    b, e = as_integer(base), as_integer(exponent)
+    if b is None or e is None or e < 0:
+        raise CalculatorError.from_code(
+            POWER_DOMAIN, "exact powers need an integer base and a non-negative integer exponent")
+    digits = power_digits(b, e)
+    if max_digits is not None and digits > max_digits:
+        raise CalculatorError.from_code(
+            POWER_OVERFLOW, f"{b} ^ {e} would have about {digits} digits (limit {max_digits})")
+    return b ** e
+
+
+def _powmod_error(b: Optional[int], e: Optional[int], m: Optional[int],
+                  max_digits: Optional[int]) -> Tuple[int, Optional[str]]:
+    """(code, detail) for invalid powmod operands, or (OK, None)."""
+    if b is None or e is None or m is None:
+        return DOMAIN_ERROR, "powmod is only defined for integers"
+    if m == 0:
+        return MODULO_BY_ZERO, None
+    if max_digits is not None:
+        for name, value in (('modulus', m), ('exponent', e)):
+            digits = integer_digits(value)
+            if digits > max_digits:
+                return POWER_OVERFLOW, f"{name} has about {digits} digits (limit {max_digits})"
+    if e < 0 and math.gcd(b, m) != 1:
+        return POWER_DOMAIN, f"{b} has no inverse modulo {m}"
+    return OK, None
+
+
+def powmod(base: Union[int, float], exponent: Union[int, float], modulus: Union[int, float],
+           max_digits: Optional[int] = POWMOD_MAX_DIGITS) -> int:
+    """
+    base ** exponent % modulus, exactly, with three-argument pow.
+    
+    Operands must be integers (integral floats are accepted). The modulus
+    and the exponent may have at most max_digits digits each (None disables
+    the guard).
+    """
+    b, e, m = as_integer(base), as_integer(exponent), as_integer(modulus)
+    code, detail = _powmod_error(b, e, m, max_digits)
+    if code:
+        raise CalculatorError.from_code(code, detail)
+    return pow(b, e, m)
+
+
+def powmod_batch(bases: Any, exponents: Any, modulus: Any,
+                 max_digits: Optional[int] = POWMOD_MAX_DIGITS):
+    """
+    Element-wise powmod over scalars, sequences or arrays of operands.
+    
+    Returns a calculator_batch.BatchResult with operation 'powmod'. Scalars
+    are broadcast against the other operands.
+    """
+    import calculator_batch
+    
+    np = calculator_batch.np
+    # int64 operands have at most 19 digits
+    if np is not None and (max_digits is None or max_digits >= 19):
+        result = _powmod_numpy(np, bases, exponents, modulus)
+        if result is not None:
+            return calculator_batch.BatchResult('powmod', *result)
+    values, errors = _powmod_python(bases, exponents, modulus, max_digits)
+    return calculator_batch.BatchResult('powmod', values, errors)
+
+
+# NumPy implementation
+
+def _as_int64(np, values: Any):
+    """values as an int64 array, or None if they are not all int64 integers."""
+    x = np.atleast_1d(np.asarray(values))
+    if x.dtype.kind in 'iu':
+        if x.dtype.kind == 'u' and x.size and x.max() >= 1 << 63:
+            return None
+        return x.astype(np.int64)
+    if x.dtype.kind == 'f' and np.all(np.isfinite(x)):
+        if np.all(x == np.floor(x)) and np.all(np.abs(x) < 2.0 ** 63):
+            return x.astype(np.int64)
+    return None
+
+
+def _powmod_numpy(np, bases: Any, exponents: Any, modulus: Any):
+    """(values, errors) by vectorized square-and-multiply, or None if unsuitable."""
+    operands = [_as_int64(np, values) for values in (bases, exponents, modulus)]
+    if any(x is None for x in operands):
+        return None
+    try:
+        b, e, m = np.broadcast_arrays(*operands)
+    except ValueError as error:
+        raise CalculatorError(f"Batch operands have incompatible shapes: {error}")
+    if np.any(e < 0) or np.any((m <= -VECTOR_MODULUS_LIMIT) | (m >= VECTOR_MODULUS_LIMIT)):
+        return None
+    
+    errors = np.where(m == 0, MODULO_BY_ZERO, OK).astype(np.uint8)
+    size = np.where(m == 0, 1, np.abs(m)).astype(np.uint64)
+    base = (b % size.astype(np.int64)).astype(np.uint64)
+    exponent = e.astype(np.uint64)
+    result = np.ones(b.shape, dtype=np.uint64) % size
+    one = np.uint64(1)
+    while exponent.any():
+        odd = (exponent & one).astype(bool)
+        result = np.where(odd, result * base % size, result)
+        exponent = exponent >> one
+        base = base * base % size
+    
+    values = result.astype(np.int64)
+    # pow gives results with the sign of a negative modulus
+    values = np.where((m < 0) & (values != 0), values + m, values)
+    values[errors != OK] = 0
+    return values, errors
+
+
+# Pure-Python implementation
+
+def _as_list(values: Any) -> List[Any]:
+    """Convert a scalar, sequence or array of numbers to a list."""
+    if hasattr(values, 'tolist'):
+        values = values.tolist()
+    if isinstance(values, (int, float)):
+        return [values]
+    return list(values)
+
+
+def _powmod_python(bases: Any, exponents: Any, modulus: Any, max_digits: Optional[int]):
+    """(values, errors) with pow element by element."""
+    columns = [_as_list(values) for values in (bases, exponents, modulus)]
+    size = max(map(len, columns))
+    for i, column in enumerate(columns):
+        if len(column) == 1:
+            columns[i] = column * size
+        elif len(column) != size:
+            lengths = ', '.join(str(len(c)) for c in columns)
+            raise CalculatorError(f"Batch operands have different lengths: {lengths}")
+    
+    values = []
+    errors = array('B', bytes(size))
+    for i, (b, e, m) in enumerate(zip(*columns)):
+        b, e, m = as_integer(b), as_integer(e), as_integer(m)
+        code, _ = _powmod_error(b, e, m, max_digits)
+        if code:
+            errors[i] = code
+            values.append(0)
+        else:
+            values.append(pow(b, e, m))
+    return values, errors
\ No newline at end of file
@@ -0,0 +1,328 @@
+"""
+Calculator History Queries
+Indexes over structured history records for filters and aggregates.
+
+A HistoryIndex follows a History (or HistoryLog) incrementally: each query
+first indexes the records appended since the previous one. It keeps, per
+record, the timestamp, op code and numeric result in flat arrays, a list of
+record positions per op code, and a sorted run of results. Time filters use
+bisect on the (non-decreasing) timestamps, op filters bisect the per-op
+lists and result ranges bisect the sorted run, so a query only visits the
+candidates of its most selective index. Records appended after the sorted run
+was built are scanned linearly until the run is rebuilt.
+"""
+
+import math
+import operator
+import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from calculator_history import OP_CODES, render_record
+
+
+AGGREGATES = ('count', 'sum', 'min', 'max', 'mean')
+
+# Rebuild the sorted result run once the unsorted tail outgrows this share of it
+_RESORT_MIN = 4096
+_RESORT_FRACTION = 8
+
+# Drop evicted records from the index once they outnumber the live ones
+_TRIM_MIN = 4096
+
+_DURATION = re.compile(r'^(\d+(?:\.\d+)?)\s*(s|m|h|d)?$')
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, None: 1}
+_COMPARISON = re.compile(r'^result\s*(<=|>=|==|=|<|>)\s*(\S+)$')
+_OP_FILTER = re.compile(r'^op\s*(?:==|=|\s+in\s+)\s*(.+)$')
+
+
+class HistoryEntry(NamedTuple):
+    """One matching history record."""
+    seq: int
+    timestamp: float
+    op: int
+    a: Any
+    b: Any
+    result: Any
+    
+    @property
+    def text(self) -> str:
+        """The record rendered as in get_history()."""
+        return render_record(self.op, self.a, self.b, self.result)
+
+
+class HistoryQuery(NamedTuple):
+    """Filters of a query; None means unrestricted, bounds are inclusive."""
+    ops: Optional[FrozenSet[int]] = None
+    since: Optional[float] = None
+    until: Optional[float] = None
+    min_result: Optional[float] = None
+    max_result: Optional[float] = None
+
+
+def make_query(op: Union[None, str, int, Iterable[Union[str, int]]] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               min_result: Optional[float] = None,
+               max_result: Optional[float] = None) -> HistoryQuery:
+    """Build a HistoryQuery, accepting op names (see OP_NAMES) or codes."""
+    ops = None
+    if op is not None:
+        if isinstance(op, (str, int)):
+            op = (op,)
+        codes = set()
+        for item in op:
+            if isinstance(item, str):
+                if item not in OP_CODES:
+                    raise ValueError(f"Unknown operation: {item}")
+                item = OP_CODES[item]
+            codes.add(item)
+        ops = frozenset(codes)
+    return HistoryQuery(ops, since, until, min_result, max_result)
+
+
+def _parse_duration(text: str) -> float:
+    match = _DURATION.match(text)
+    if not match:
+        raise ValueError(f"Invalid duration: {text}")
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def parse_conditions(text: str, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Parse 'cond and cond ...' into make_query() keyword arguments.
+    
+    Conditions are 'op = name[,name...]', 'result <op> number' with <op> one
+    of < <= > >= =, and 'within <duration>' such as 'within 1h' (s, m, h, d).
+    """
+    filters: Dict[str, Any] = {}
+    for condition in re.split(r'\s+and\s+', text.strip()):
+        match = _OP_FILTER.match(condition)
+        if match:
+            filters['op'] = [name.strip() for name in match.group(1).split(',')]
+            continue
+        match = _COMPARISON.match(condition)
+        if match:
+            comparison, value = match.groups()
+            try:
+                number = float(value)
+            except ValueError:
+                raise ValueError(f"Invalid number: {value}") from None
+            # Strict bounds become inclusive bounds on the adjacent float
+            if comparison in ('>', '>=', '=', '=='):
+                low = math.nextafter(number, math.inf) if comparison == '>' else number
+                filters['min_result'] = max(low, filters.get('min_result', -math.inf))
+            if comparison in ('<', '<=', '=', '=='):
+                high = math.nextafter(number, -math.inf) if comparison == '<' else number
+                filters['max_result'] = min(high, filters.get('max_result', math.inf))
+            continue
+        if condition.startswith('within '):
+            if now is None:
+                now = time.time()
+            filters['since'] = now - _parse_duration(condition[7:].strip())
+            continue
+        raise ValueError(f"Invalid condition: {condition}")
+    return filters
+
+
+class HistoryIndex:
+    """Incrementally maintained indexes over one history."""
+    
+    def __init__(self, history):
+        self.history = history
+        self._reset(history.seq_range()[0])
+    
+    def _reset(self, base: int) -> None:
+        """Forget everything and start indexing at sequence number base."""
+        self._base = base
+        self._times = array('d')
+        self._ops = array('B')
+        self._results = array('d')
+        self._by_op: Dict[int, array] = {}
+        self._sorted_values = array('d')
+        self._sorted_offsets = array('q')
+        self._sorted_upto = 0
+    
+    def refresh(self) -> None:
+        """Index records appended since the last refresh."""
+        start, stop = self.history.seq_range()
+        upto = self._base + len(self._times)
+        if start > upto:
+            self._reset(start)
+            upto = start
+        elif start - self._base >= max(_TRIM_MIN, stop - start):
+            self._trim(start)
+        if upto == stop:
+            return
+        times = self._times
+        ops = self._ops
+        results = self._results
+        by_op = self._by_op
+        seq = upto
+        for timestamp, op, a, b, result in self.history.iter_timed(last=stop - upto):
+            times.append(timestamp)
+            ops.append(op)
+            try:
+                results.append(result)
+            except (TypeError, OverflowError):
+                results.append(math.nan)
+            seqs = by_op.get(op)
+            if seqs is None:
+                seqs = by_op[op] = array('q')
+            seqs.append(seq)
+            seq += 1
+    
+    def _trim(self, start: int) -> None:
+        """Drop index entries of evicted records."""
+        dead = start - self._base
+        self._times = self._times[dead:]
+        self._ops = self._ops[dead:]
+        self._results = self._results[dead:]
+        for op, seqs in list(self._by_op.items()):
+            seqs = seqs[bisect_left(seqs, start):]
+            if seqs:
+                self._by_op[op] = seqs
+            else:
+                del self._by_op[op]
+        self._base = start
+        self._sorted_values = array('d')
+        self._sorted_offsets = array('q')
+        self._sorted_upto = 0
+    
+    def _sort_results(self) -> None:
+        """Rebuild the sorted run of numeric results if its tail grew too long."""
+        results = self._results
+        tail = len(results) - self._sorted_upto
+        if tail < max(_RESORT_MIN, len(self._sorted_offsets) // _RESORT_FRACTION):
+            return
+        # NaN (non-numeric results) compares unequal to itself and is left out
+        order = list(compress(range(len(results)), map(operator.eq, results, results)))
+        order.sort(key=results.__getitem__)
+        self._sorted_offsets = array('q', order)
+        self._sorted_values = array('d', map(results.__getitem__, order))
+        self._sorted_upto = len(results)
+    
+    def _live_bounds(self, query: HistoryQuery) -> Tuple[int, int]:
+        """Offsets [lo, hi) of live records inside the query's time range."""
+        lo = self.history.seq_range()[0] - self._base
+        hi = len(self._times)
+        if query.since is not None:
+            lo = max(lo, bisect_left(self._times, query.since))
+        if query.until is not None:
+            hi = min(hi, bisect_right(self._times, query.until))
+        return lo, hi
+    
+    def _offsets(self, query: HistoryQuery) -> List[int]:
+        """Offsets of the matching records, in chronological order."""
+        self.refresh()
+        lo, hi = self._live_bounds(query)
+        if lo >= hi:
+            return []
+        ops = self._ops
+        results = self._results
+        wanted = query.ops
+        low = -math.inf if query.min_result is None else query.min_result
+        high = math.inf if query.max_result is None else query.max_result
+        by_result = query.min_result is not None or query.max_result is not None
+        
+        # Pick the index with the fewest candidates
+        cost = hi - lo
+        plan = 'scan'
+        if wanted is not None:
+            base = self._base
+            op_ranges = []
+            op_cost = 0
+            for op in wanted:
+                seqs = self._by_op.get(op)
+                if seqs:
+                    first = bisect_left(seqs, base + lo)
+                    last = bisect_left(seqs, base + hi)
+                    op_ranges.append((seqs, first, last))
+                    op_cost += last - first
+            if op_cost <= cost:
+                cost, plan = op_cost, 'op'
+        if by_result:
+            self._sort_results()
+            values = self._sorted_values
+            value_first = bisect_left(values, low)
+            value_last = bisect_right(values, high)
+            result_cost = value_last - value_first + len(results) - self._sorted_upto
+            if result_cost < cost:
+                plan = 'result'
+        
+        if plan == 'op':
+            if len(op_ranges) == 1:
+                seqs, first, last = op_ranges[0]
+                candidates = [seq - base for seq in seqs[first:last]]
+            else:
+                candidates = sorted(seq - base for seqs, first, last in op_ranges
+                                    for seq in seqs[first:last])
+            if not by_result:
+                return candidates
+            return [i for i in candidates if low <= results[i] <= high]
+        if plan == 'result':
+            candidates = sorted(self._sorted_offsets[value_first:value_last])
+            candidates.extend(range(self._sorted_upto, len(results)))
+            return [i for i in candidates
+                    if lo <= i < hi and low <= results[i] <= high
+                    and (wanted is None or ops[i] in wanted)]
+        return [i for i in range(lo, hi)
+                if (wanted is None or ops[i] in wanted)
+                and (not by_result or low <= results[i] <= high)]
+    
+    def count(self, query: HistoryQuery) -> int:
+        """Number of matching records."""
+        if query.min_result is None and query.max_result is None:
+            # Time and op filters alone are answered by bisection
+            self.refresh()
+            lo, hi = self._live_bounds(query)
+            if lo >= hi:
+                return 0
+            if query.ops is None:
+                return hi - lo
+            base = self._base
+            total = 0
+            for op in query.ops:
+                seqs = self._by_op.get(op)
+                if seqs:
+                    total += bisect_left(seqs, base + hi) - bisect_left(seqs, base + lo)
+            return total
+        return len(self._offsets(query))
+    
+    def find(self, query: HistoryQuery, last: Optional[int] = None) -> List[HistoryEntry]:
+        """Matching records, oldest first, optionally only the last n."""
+        offsets = self._offsets(query)
+        if last is not None:
+            offsets = offsets[max(len(offsets) - last, 0):]
+        base = self._base
+        history = self.history
+        return [HistoryEntry(base + i, *history.get_timed(base + i)) for i in offsets]
+    
+    def values(self, query: HistoryQuery) -> List[float]:
+        """Numeric results of the matching records, oldest first."""
+        results = self._results
+        return [value for value in map(results.__getitem__, self._offsets(query))
+                if value == value]
+    
+    def aggregate(self, func: str, query: HistoryQuery) -> Optional[float]:
+        """count, sum, min, max or mean of the numeric results of the matches."""
+        if func not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {func}")
+        if func == 'count':
+            return self.count(query)
+        return aggregate_values(func, self.values(query))
+
+
+def aggregate_values(func: str, values: List[float]) -> Optional[float]:
+    """sum, min, max or mean of values; None for an empty list, except the sum (0.0)."""
+    if func == 'sum':
+        return math.fsum(values)
+    if not values:
+        return None
+    if func == 'min':
+        return min(values)
+    if func == 'max':
+        return max(values)
+    return math.fsum(values) / len(values)
\ No newline at end of file
@@ -0,0 +1,312 @@
+"""
+Calculator Result Cache
+Persistent cache of computed results, shared across restarts and processes.
+
+Results are stored in an SQLite database. Expressions are keyed by a
+canonical form of the parsed expression, with every operator and number
+spelled one way (so '2+3' and '( 2 ) + 3' share an entry), followed by the
+values of the variables it reads. Exact factorials and sweep summaries are
+cached under keys of their own. Only results that took at least min_time
+(1 ms by default) to compute are stored, so cheap expressions cost a
+lookup but no write. Domain errors are stored too and come back with the
+same code and message; errors that depend on the session (undefined
+variables, a full history) are not.
+
+The database uses write-ahead logging, so readers do not block writers.
+Writers in other processes wait for each other for up to timeout seconds.
+Write-ahead logging only works within one machine. For a database on a
+network volume shared by several machines, use journal_mode='delete'.
+Entries older than max_age seconds count as misses and are removed. When
+the database holds more than max_entries results or max_bytes of keys and
+values, the least recently used are removed until it is back under 90% of
+both limits. Eviction runs when the cache is opened and every
+EVICTION_INTERVAL stores. The cache is best effort: if the database fails
+(for example, it stays locked past the timeout), the result is computed
+and counted in errors.
+"""
+
+import json
+import math
+import sqlite3
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from calculator import (
+    CIRCULAR_DEFINITION, HISTORY_FULL, INVALID_INPUT, OK, UNDEFINED_VARIABLE, CalculatorError,
+)
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_BYTES = 256 << 20
+EVICTION_INTERVAL = 256
+# Results computed faster than this (seconds) are not stored: a lookup and a
+# write cost more than recomputing them
+DEFAULT_MIN_TIME = 1e-3
+# Last-use times are refreshed at most this often (seconds), so hits rarely write
+ACCESS_RESOLUTION = 60.0
+JOURNAL_MODES = ('wal', 'delete')
+
+# Codes that describe the session rather than the computation
+_UNCACHEABLE = frozenset({UNDEFINED_VARIABLE, INVALID_INPUT, HISTORY_FULL, CIRCULAR_DEFINITION})
+
+# Storage kinds of the value column
+_FLOAT, _INT, _JSON, _ERROR = range(4)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    kind INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    code INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+Status = Tuple[Any, int, Optional[str]]
+
+
+def _encode(value: Any) -> Tuple[int, bytes]:
+    if isinstance(value, float):
+        return _FLOAT, struct.pack('<d', value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        # Bytes rather than digits: huge factorials exceed int-to-str limits
+        return _INT, value.to_bytes(value.bit_length() // 8 + 1, 'little', signed=True)
+    return _JSON, json.dumps(value).encode('utf-8')
+
+
+def _decode(kind: int, value: bytes) -> Any:
+    if kind == _FLOAT:
+        return struct.unpack('<d', value)[0]
+    if kind == _INT:
+        return int.from_bytes(value, 'little', signed=True)
+    return json.loads(value.decode('utf-8'))
+
+
+class ResultCache:
+    """SQLite-backed result cache with size- and age-based eviction."""
+    
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_age: Optional[float] = None,
+                 min_time: float = DEFAULT_MIN_TIME, timeout: float = 30.0, journal_mode: str = 'wal'):
+        """
+        Open (creating if needed) the cache database at path.
+        
+        Only results that took at least min_time seconds to compute are
+        stored; pass 0 to store every result. Raises OSError if the database
+        cannot be opened.
+        """
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("Result cache limits must be positive")
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode: {journal_mode}")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_time = min_time
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                       check_same_thread=False)
+            self._db.execute(f"PRAGMA journal_mode = {journal_mode}")
+            self._db.execute("PRAGMA synchronous = NORMAL")
+            self._db.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            raise OSError(f"Cannot open result cache {path}: {e}") from None
+        self.evict()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    
+    def get(self, key: str) -> Optional[Status]:
+        """The cached (value, OK, None) or (None, code, message) for key, or None."""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT kind, value, code, created, accessed FROM results WHERE key = ?",
+                    (key,)).fetchone()
+                if row is not None and now - row[4] > ACCESS_RESOLUTION:
+                    self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            self.errors += 1
+            row = None
+        if row is None or self.max_age is not None and row[3] < now - self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        kind, value, code, _, _ = row
+        if kind == _ERROR:
+            return None, code, value.decode('utf-8')
+        return _decode(kind, value), OK, None
+    
+    def put(self, key: str, value: Any, code: int = OK, message: Optional[str] = None) -> None:
+        """Store a result, or the error code and message of a failed computation."""
+        if code == OK:
+            kind, data = _encode(value)
+        else:
+            kind, data = _ERROR, (message or '').encode('utf-8')
+        now = time.time()
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, kind, data, code, len(key) + len(data), now, now))
+        except sqlite3.Error:
+            self.errors += 1
+            return
+        self.stores += 1
+        if self.stores % EVICTION_INTERVAL == 0:
+            self.evict()
+    
+    def lookup(self, key: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Return func(*args), computing it only on a miss; cached errors are re-raised."""
+        cached = self.get(key)
+        if cached is None:
+            start = time.perf_counter()
+            try:
+                value = func(*args)
+            except CalculatorError as e:
+                if e.code not in _UNCACHEABLE and time.perf_counter() - start >= self.min_time:
+                    self.put(key, None, e.code, str(e))
+                raise
+            if time.perf_counter() - start >= self.min_time:
+                self.put(key, value)
+            return value
+        value, code, message = cached
+        if code:
+            raise CalculatorError(message, code)
+        return value
+    
+    def try_evaluate(self, compiled, calculator, variables: Optional[Mapping[str, float]] = None
+                     ) -> Status:
+        """
+        CompiledExpression.try_evaluate through the cache.
+        
+        A hit adds one '<expression> = <result> (cached)' entry to the
+        calculator's history instead of one per operation.
+        """
+        key = expression_key(compiled, variables)
+        cached = None if key is None else self.get(key)
+        if cached is not None:
+            value, code, _ = cached
+            if code == OK:
+                calculator.history.append(f"{compiled.source} = {value} (cached)")
+                calculator.last_result = value
+            return cached
+        start = time.perf_counter()
+        value, code, message = compiled.try_evaluate_uncached(calculator, variables)
+        if (key is not None and code not in _UNCACHEABLE
+                and time.perf_counter() - start >= self.min_time):
+            self.put(key, value, code, message)
+        return value, code, message
+    
+    def evict(self) -> int:
+        """Remove expired entries, then least recently used ones over the limits."""
+        removed = 0
+        try:
+            with self._lock:
+                db = self._db
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    if self.max_age is not None:
+                        removed += db.execute("DELETE FROM results WHERE created < ?",
+                                              (time.time() - self.max_age,)).rowcount
+                    count, size = db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+                    if count > self.max_entries or size > self.max_bytes:
+                        target_count = int(self.max_entries * 0.9)
+                        target_size = int(self.max_bytes * 0.9)
+                        victims = []
+                        for key, entry_size in db.execute(
+                                "SELECT key, size FROM results ORDER BY accessed"):
+                            if count <= target_count and size <= target_size:
+                                break
+                            victims.append((key,))
+                            count -= 1
+                            size -= entry_size
+                        db.executemany("DELETE FROM results WHERE key = ?", victims)
+                        removed += len(victims)
+                    db.execute("COMMIT")
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error:
+            self.errors += 1
+            return 0
+        self.evictions += removed
+        return removed
+    
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss, store, eviction and error counters and the entry count."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            'size': len(self),
+            'hit_rate': self.hit_rate,
+        }
+    
+    def clear(self) -> None:
+        """Delete every entry and reset the counters."""
+        with self._lock:
+            self._db.execute("DELETE FROM results")
+        self.hits = self.misses = self.stores = self.evictions = self.errors = 0
+    
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+    
+    def __repr__(self) -> str:
+        return f"ResultCache({self.path!r}, hits={self.hits}, misses={self.misses})"
+
+
+def _variables_text(names, variables: Optional[Mapping[str, float]]) -> Optional[str]:
+    """'a=1.0, b=2.0' for the sorted names, or None if one of them has no value."""
+    parts = []
+    for name in sorted(names):
+        value = None if variables is None else variables.get(name)
+        if value is None:
+            return None
+        parts.append(f"{name}={float(value)!r}")
+    return ', '.join(parts)
+
+
+def expression_key(compiled, variables: Optional[Mapping[str, float]] = None) -> Optional[str]:
+    """Cache key of a compiled expression with its variables, or None if one is undefined."""
+    values = _variables_text(compiled.variables, variables)
+    if values is None:
+        return None
+    return f"expr {compiled.canonical}" + (f" where {values}" if values else "")
+
+
+def sweep_key(expression: str, start: float, stop: float, step: float, variable: str,
+              variables: Optional[Mapping[str, float]] = None) -> Optional[str]:
+    """Cache key of a sweep summary, or None if a variable other than variable is undefined."""
+    from calculator_expr import compile_expression
+    
+    compiled = compile_expression(expression)
+    values = _variables_text(compiled.variables - {variable}, variables)
+    if values is None or not all(map(math.isfinite, (start, stop, step))):
+        return None
+    key = (f"sweep {compiled.canonical} for {variable} = "
+           f"{float(start)!r}..{float(stop)!r} step {float(step)!r}")
+    return key + (f" where {values}" if values else "")
\ No newline at end of file
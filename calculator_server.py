@@ -0,0 +1,195 @@
+"""
+Calculator Server
+asyncio TCP server speaking a line protocol, with one Calculator per session.
+
+Each request is one line and gets exactly one response line, in order:
+
+    <expression>      ->  ok <result>  |  error <message>
+    :session <id>     ->  ok session <id>   (switch this connection's session)
+    :ping             ->  ok pong
+    :quit             ->  closes the connection
+
+Control messages start with CONTROL_PREFIX, a character that cannot start
+an expression, so no expression is ever mistaken for one (a variable named
+quit, say, or a client forwarding whatever its user typed).
+
+A connection that never names a session gets a private calculator that
+lives as long as the connection. It is kept out of the session store, so
+anonymous connections never evict named sessions.
+
+Clients may pipeline any number of requests without waiting for responses.
+Requests are read in blocks, evaluated in order and answered with a single
+write per block; the connection stops reading while its write buffer is above
+the high-water mark, so slow readers apply backpressure to fast writers.
+"""
+
+import argparse
+import asyncio
+from collections import OrderedDict
+from typing import Optional
+
+from calculator_cli import CalculatorCLI
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7878
+DEFAULT_MAX_SESSIONS = 10000
+READ_SIZE = 1 << 16
+MAX_LINE_LENGTH = 1 << 16
+WRITE_HIGH_WATER = 1 << 18
+CONTROL_PREFIX = ':'
+
+
+class SessionStore:
+    """Calculator sessions keyed by id, evicting the least recently used."""
+    
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: 'OrderedDict[str, CalculatorCLI]' = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def get(self, session_id: str) -> CalculatorCLI:
+        """Return the session's CLI, creating it on first use."""
+        sessions = self._sessions
+        cli = sessions.get(session_id)
+        if cli is None:
+            cli = CalculatorCLI(interactive=False)
+            sessions[session_id] = cli
+            if len(sessions) > self.max_sessions:
+                sessions.popitem(last=False)
+        else:
+            sessions.move_to_end(session_id)
+        return cli
+
+
+class CalculatorServer:
+    """Line-protocol calculator server."""
+    
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.host = host
+        self.port = port
+        self.sessions = SessionStore(max_sessions)
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+    
+    async def start(self) -> None:
+        """Start listening; the bound port is stored in self.port."""
+        self._server = await asyncio.start_server(
+            self.handle_connection, self.host, self.port, limit=MAX_LINE_LENGTH)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def serve_forever(self) -> None:
+        """Start (if needed) and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+    
+    def close(self) -> None:
+        """Stop accepting new connections."""
+        if self._server is not None:
+            self._server.close()
+    
+    def new_state(self) -> dict:
+        """Per-connection state; a connection starts without a session."""
+        return {}
+    
+    def respond(self, line: str, state: dict) -> Optional[str]:
+        """Evaluate one request line and return its response (None closes)."""
+        request = line.strip()
+        if not request:
+            return "error Empty request"
+        if request.startswith(CONTROL_PREFIX):
+            name, _, argument = request[len(CONTROL_PREFIX):].strip().partition(' ')
+            return self.control(name.lower(), argument.strip(), state)
+        command = request.lower()
+        cli = state.get('cli')
+        if cli is None:
+            # Private to the connection, outside the store of named sessions
+            cli = state['cli'] = CalculatorCLI(interactive=False)
+        self.requests += 1
+        try:
+            result, code, message = cli.try_parse_expression(command)
+        except Exception as e:
+            return f"error Invalid input: {e}"
+        if code:
+            return f"error {message}"
+        return f"ok {result}"
+    
+    def control(self, name: str, argument: str, state: dict) -> Optional[str]:
+        """Handle one control message and return its response (None closes)."""
+        if name in ('quit', 'exit') and not argument:
+            return None
+        if name == 'ping' and not argument:
+            return "ok pong"
+        if name == 'session' and argument:
+            state['cli'] = self.sessions.get(argument)
+            return f"ok session {argument}"
+        return f"error Unknown control message: {CONTROL_PREFIX}{name}"
+    
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Serve pipelined requests on one connection."""
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+        state = self.new_state()
+        pending = b''
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                if not data:
+                    break
+                pending += data
+                *lines, pending = pending.split(b'\n')
+                if len(pending) > MAX_LINE_LENGTH:
+                    writer.write(b"error Request line too long\n")
+                    break
+                responses = []
+                closing = False
+                for line in lines:
+                    response = self.respond(line.decode('utf-8', 'replace'), state)
+                    if response is None:
+                        closing = True
+                        break
+                    responses.append(response)
+                if responses:
+                    responses.append('')
+                    writer.write('\n'.join(responses).encode('utf-8'))
+                    await writer.drain()
+                if closing:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line argument parser."""
+    parser = argparse.ArgumentParser(description="Calculator line-protocol server")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-sessions', type=int, default=DEFAULT_MAX_SESSIONS)
+    return parser
+
+
+def main() -> None:
+    """Run the server until interrupted."""
+    args = build_parser().parse_args()
+    server = CalculatorServer(args.host, args.port, args.max_sessions)
+    
+    async def run() -> None:
+        await server.start()
+        print(f"Calculator server listening on {server.host}:{server.port}", flush=True)
+        await server.serve_forever()
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,335 @@
+"""
+Calculator Statistics
+Single-pass, constant-memory statistics over streams of numbers.
+
+StreamStats consumes values one at a time or in chunks and keeps:
+
+- count, mean and variance by Welford's algorithm; chunks and merged
+  states are combined with the parallel form of the same update (Chan et
+  al.), so no pass over the data is ever repeated
+- the sum by Neumaier's compensated summation (chunk sums are exactly
+  rounded by math.fsum first, or added value by value when an
+  intermediate sum overflows); a sum reaching inf stays inf, and inf
+  plus -inf gives nan, as in float arithmetic
+- min and max
+- quantiles from a KLL sketch, whose size depends only on k
+
+Every part is mergeable: states built from different chunks, files or
+processes (they pickle) combine with merge() into the state of the whole.
+"""
+
+import math
+import os
+import random
+from itertools import islice
+from typing import IO, Any, Iterable, Iterator, List, Optional, Union
+
+DEFAULT_K = 200
+CHUNK_SIZE = 1 << 14
+
+# Aggregates of Calculator.aggregate
+FUNCTIONS = ('count', 'sum', 'mean', 'variance', 'stdev', 'min', 'max', 'median', 'quantile')
+
+Source = Union[str, 'os.PathLike[str]', IO[str], Iterable[Any]]
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang and Liberty).
+    
+    Items live in levels of compactors; an item at level h stands for 2**h
+    inputs. When a level fills up it is sorted and every other item, from a
+    random offset, moves up one level; with an odd count, the smallest or the
+    largest item (at random) stays behind. Capacities shrink geometrically
+    (by 2/3) below the top level, so the sketch holds O(k) items for any
+    stream length, and the rank error is roughly 1.7 / k.
+    """
+    
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        if k < 8:
+            raise ValueError("k must be at least 8")
+        self.k = k
+        self.count = 0
+        self.levels: List[List[float]] = [[]]
+        self._random = random.Random(seed)
+    
+    def __len__(self) -> int:
+        """Number of items stored (not the number of inputs)."""
+        return sum(map(len, self.levels))
+    
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+    
+    def add(self, value: float) -> None:
+        """Add one value."""
+        self.levels[0].append(value)
+        self.count += 1
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+    
+    def extend(self, values: List[float]) -> None:
+        """Add a list of values."""
+        self.levels[0].extend(values)
+        self.count += len(values)
+        self._compress()
+    
+    def _compress(self) -> None:
+        levels = self.levels
+        level = 0
+        while level < len(levels):
+            items = levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(levels):
+                    levels.append([])
+                items.sort()
+                # An odd item out stays behind so the total weight is preserved;
+                # which end it comes from is random, so neither tail is favoured
+                start, stop = 0, len(items)
+                kept = None
+                if stop % 2:
+                    if self._random.getrandbits(1):
+                        stop -= 1
+                        kept = items[stop]
+                    else:
+                        kept = items[0]
+                        start = 1
+                levels[level + 1].extend(items[start + self._random.getrandbits(1):stop:2])
+                items.clear()
+                if kept is not None:
+                    items.append(kept)
+            level += 1
+    
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """Fold other into this sketch and return it."""
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with k={self.k} and k={other.k}")
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self._compress()
+        return self
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile (0 <= q <= 1), or None if empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("Quantile must be between 0 and 1")
+        if not self.count:
+            return None
+        weighted = sorted((value, 1 << level)
+                          for level, items in enumerate(self.levels) for value in items)
+        target = q * self.count
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return weighted[-1][0]
+
+
+class StreamStats:
+    """Mergeable running count, sum, mean, variance, extremes and quantiles."""
+    
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._sum = 0.0
+        self._compensation = 0.0
+        self.sketch = KLLSketch(k, seed)
+    
+    def add(self, value: float) -> None:
+        """Add one value (Welford's update)."""
+        value = float(value)
+        if value != value:
+            raise ValueError("Cannot aggregate NaN")
+        self.count += 1
+        delta = value - self._mean
+        if math.isinf(delta) and math.isfinite(value):
+            # Both finite, but too far apart to subtract
+            self._mean += value / self.count - self._mean / self.count
+        else:
+            self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        self._add_to_sum(value)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.sketch.add(value)
+    
+    def update(self, values: Iterable[Any]) -> 'StreamStats':
+        """Add every value of an iterable, a chunk at a time; returns self."""
+        iterator = iter(values)
+        while True:
+            chunk = [float(value) for value in islice(iterator, CHUNK_SIZE)]
+            if not chunk:
+                return self
+            self._add_chunk(chunk)
+    
+    def _add_chunk(self, chunk: List[float]) -> None:
+        count = len(chunk)
+        try:
+            total: Optional[float] = math.fsum(chunk)
+        except OverflowError:  # a partial sum of finite values left float range
+            total = None
+        except ValueError:  # both inf and -inf
+            total = math.nan
+        if (total is None or total != total) and any(value != value for value in chunk):
+            raise ValueError("Cannot aggregate NaN")
+        # Scaled first, the mean of finite values is finite even when their sum is not
+        mean = math.fsum([value / count for value in chunk]) if total is None else total / count
+        if math.isfinite(mean):
+            m2 = math.fsum([(value - mean) * (value - mean) for value in chunk])
+        else:
+            m2 = math.nan
+        self._combine(count, mean, m2)
+        if total is None:
+            for value in chunk:
+                self._add_to_sum(value)
+        else:
+            self._add_to_sum(total)
+        low, high = min(chunk), max(chunk)
+        if self.min is None or low < self.min:
+            self.min = low
+        if self.max is None or high > self.max:
+            self.max = high
+        self.sketch.extend(chunk)
+    
+    def _combine(self, count: int, mean: float, m2: float) -> None:
+        """Chan et al.'s pairwise update of count, mean and M2."""
+        total = self.count + count
+        delta = mean - self._mean
+        if not self.count:
+            self._mean, self._m2 = mean, m2
+        else:
+            if math.isinf(delta) and math.isfinite(mean) and math.isfinite(self._mean):
+                # Both means finite, but too far apart to subtract: weight them instead
+                self._mean = self._mean * (self.count / total) + mean * (count / total)
+            else:
+                self._mean += delta * count / total
+            self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+    
+    def _add_to_sum(self, value: float) -> None:
+        """Neumaier's compensated addition; an infinite sum (inf or nan) drops the compensation."""
+        total = self._sum + value
+        if not math.isfinite(total):
+            self._compensation = 0.0
+        elif abs(self._sum) >= abs(value):
+            self._compensation += (self._sum - total) + value
+        else:
+            self._compensation += (value - total) + self._sum
+        self._sum = total
+    
+    def merge(self, other: 'StreamStats') -> 'StreamStats':
+        """Fold the state of other (e.g. another chunk or process) into this one; returns self."""
+        if other.count:
+            self._combine(other.count, other._mean, other._m2)
+            self._add_to_sum(other._sum)
+            self._add_to_sum(other._compensation)
+            if self.min is None or other.min < self.min:
+                self.min = other.min
+            if self.max is None or other.max > self.max:
+                self.max = other.max
+        self.sketch.merge(other.sketch)
+        return self
+    
+    @property
+    def sum(self) -> float:
+        return self._sum + self._compensation
+    
+    @property
+    def mean(self) -> Optional[float]:
+        return self._mean if self.count else None
+    
+    @property
+    def variance(self) -> Optional[float]:
+        """Sample variance (n - 1 denominator); None for fewer than two values."""
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+    
+    @property
+    def population_variance(self) -> Optional[float]:
+        return self._m2 / self.count if self.count else None
+    
+    @property
+    def stdev(self) -> Optional[float]:
+        variance = self.variance
+        return None if variance is None else math.sqrt(variance)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile; exact at 0 and 1."""
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+        return self.sketch.quantile(q)
+    
+    @property
+    def median(self) -> Optional[float]:
+        return self.quantile(0.5)
+    
+    def value(self, func: str, q: float = 0.5) -> Optional[float]:
+        """The aggregate named func (one of FUNCTIONS)."""
+        if func not in FUNCTIONS:
+            raise ValueError(f"Unknown aggregate: {func}")
+        if func == 'quantile':
+            return self.quantile(q)
+        return getattr(self, func)
+    
+    def lines(self) -> List[str]:
+        """Human-readable summary lines."""
+        lines = [f"count: {self.count}", f"sum: {self.sum}"]
+        if self.count:
+            lines += [f"mean: {self.mean}", f"variance: {self.variance}", f"stdev: {self.stdev}",
+                      f"min: {self.min}", f"max: {self.max}",
+                      "quartiles: " + ", ".join(str(self.quantile(q)) for q in (0.25, 0.5, 0.75))]
+        return lines
+    
+    def __repr__(self) -> str:
+        return (f"StreamStats(count={self.count}, sum={self.sum}, mean={self.mean}, "
+                f"variance={self.variance}, min={self.min}, max={self.max})")
+
+
+def read_numbers(source: Union[str, 'os.PathLike[str]', IO[str]]) -> Iterator[float]:
+    """
+    Numbers of a text file (path or open file), streamed.
+    
+    Numbers are separated by whitespace or commas; blank lines and lines
+    starting with '#' are skipped. Raises ValueError naming the first token
+    that is not a number and its line.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from read_numbers(f)
+        return
+    for number, line in enumerate(source, 1):
+        if ',' in line:
+            line = line.replace(',', ' ')
+        tokens = line.split()
+        if not tokens or tokens[0].startswith('#'):
+            continue
+        try:
+            yield from map(float, tokens)
+        except ValueError:
+            raise ValueError(f"Invalid number on line {number}: {_first_invalid(tokens)}") from None
+
+
+def _first_invalid(tokens: List[str]) -> str:
+    for token in tokens:
+        try:
+            float(token)
+        except ValueError:
+            return token
+    return ''
+
+
+def collect(source: Source, k: int = DEFAULT_K) -> StreamStats:
+    """StreamStats of numbers from a path, an open text file or an iterable."""
+    if isinstance(source, (str, os.PathLike)) or hasattr(source, 'read'):
+        source = read_numbers(source)
+    return StreamStats(k).update(source)
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Calculator Sweep
+Tabulates an expression of one variable over an evenly spaced range.
+
+The range is evaluated in chunks of chunk_size points, so memory use does
+not depend on its length. With NumPy each chunk is evaluated as a whole: the
+expression tree is walked once per chunk, applying calculator_batch
+operations to arrays. Expressions using operators calculator_batch does not
+vectorize (factorial, plugin operators), and every expression when NumPy is
+not installed, are evaluated point by point through a function compiled by
+calculator_codegen. Domain errors are reported per point with the usual
+error codes; nothing is added to the calculator's history per point.
+"""
+
+import math
+from array import array
+from typing import IO, Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import calculator_batch
+from calculator import (
+    CALCULATION_ERROR, ERROR_MESSAGES, OK, UNDEFINED_VARIABLE, CalculatorError,
+)
+from calculator_codegen import compile_function
+from calculator_expr import ast_variables, normalize, parse
+from calculator_variables import is_variable_name
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# (x values, results, error codes) of consecutive points; NaN results where failed
+Chunk = Tuple[Any, Any, Any]
+
+
+def sweep_size(start: float, stop: float, step: float) -> int:
+    """Number of points start, start + step, ... up to and including stop (at least one)."""
+    if step == 0 or not all(math.isfinite(v) for v in (start, stop, step)):
+        raise CalculatorError("Sweep range needs finite bounds and a non-zero step")
+    span = (stop - start) / step
+    if span < 0:
+        raise CalculatorError("Sweep range is empty: step has the wrong sign")
+    # Tolerate rounding so that 0 to 1 step 0.1 includes 1
+    return int(math.floor(span + 1e-9)) + 1
+
+
+def iter_sweep(expression: str, start: float, stop: float, step: float,
+               variable: str = 'x', variables: Optional[Mapping[str, float]] = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Chunk]:
+    """
+    Yield (x, results, errors) chunks of expression over the range.
+    
+    The i-th point is start + i * step (no accumulated rounding). Other
+    variables in the expression take their values from variables. Raises
+    ValueError for a malformed expression and CalculatorError for an
+    invalid range or an undefined variable.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    if not is_variable_name(variable):
+        raise ValueError(f"Invalid variable name: {variable}")
+    size = sweep_size(start, stop, step)
+    ast = parse(normalize(expression))
+    names = ast_variables(ast)
+    constants = dict(variables or {})
+    constants.pop(variable, None)
+    for name in names:
+        if name != variable and name not in constants:
+            raise CalculatorError(f"Undefined variable: {name}", UNDEFINED_VARIABLE)
+    np = calculator_batch.np
+    if np is not None and _vectorizable(ast):
+        for first in range(0, size, chunk_size):
+            x = start + step * np.arange(first, min(first + chunk_size, size), dtype=np.float64)
+            values, errors = _evaluate(ast, x, variable, constants)
+            values = np.broadcast_to(values, x.shape)
+            errors = np.broadcast_to(np.asarray(0 if errors is None else errors, dtype=np.uint8), x.shape)
+            yield x, values, errors
+        return
+    others = [name for name in names if name != variable]
+    function = compile_function(expression, [variable] + others, history=False)
+    bound = [float(constants[name]) for name in others]
+    for first in range(0, size, chunk_size):
+        count = min(chunk_size, size - first)
+        x = array('d', (start + step * i for i in range(first, first + count)))
+        values = array('d', bytes(8 * count))
+        errors = array('B', bytes(count))
+        for i, point in enumerate(x):
+            try:
+                values[i] = function(point, *bound)
+            except CalculatorError as e:
+                values[i] = math.nan
+                errors[i] = e.code
+            except (ArithmeticError, ValueError, TypeError):
+                values[i] = math.nan
+                errors[i] = CALCULATION_ERROR
+        yield x, values, errors
+
+
+def _vectorizable(node: tuple) -> bool:
+    """Whether every operation of node has a calculator_batch implementation."""
+    kind = node[0]
+    if kind == 'neg':
+        return _vectorizable(node[1])
+    if kind != 'call':
+        return True
+    _, operator, args, degrees = node
+    return operator.handler in calculator_batch.OPERATIONS and all(map(_vectorizable, args))
+
+
+def _evaluate(node: tuple, x: Any, variable: str, constants: Mapping[str, float]):
+    """(values, errors) of node over the array x; either may be a scalar or None."""
+    np = calculator_batch.np
+    kind = node[0]
+    if kind == 'num':
+        return node[1], None
+    if kind == 'var':
+        return (x if node[1] == variable else float(constants[node[1]])), None
+    if kind == 'neg':
+        values, errors = _evaluate(node[1], x, variable, constants)
+        return -values, errors
+    _, operator, args, degrees = node
+    operands = [_evaluate(arg, x, variable, constants) for arg in args]
+    a = operands[0][0]
+    b = operands[1][0] if len(operands) > 1 else None
+    result = calculator_batch.evaluate(operator.handler, a, b, degrees)
+    errors = result.errors
+    # An argument's error takes precedence, the leftmost first, as in the interpreter
+    for _, arg_errors in reversed(operands):
+        if arg_errors is not None:
+            errors = np.where(arg_errors != OK, arg_errors, errors)
+    if np.ndim(a) == 0 and (b is None or np.ndim(b) == 0):
+        return float(result.values[0]), (int(errors[0]) or None)
+    return result.values, errors
+
+
+class SweepSummary:
+    """Streaming summary of a sweep: extremes and a trapezoid integral."""
+    
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.min: Optional[float] = None
+        self.argmin: Optional[float] = None
+        self.max: Optional[float] = None
+        self.argmax: Optional[float] = None
+        # Trapezoid rule over pairs of neighbouring points that both succeeded
+        self.integral = 0.0
+        self._last: Optional[Tuple[float, float]] = None
+    
+    def add(self, x: Any, values: Any, errors: Any) -> None:
+        """Fold one chunk into the summary."""
+        np = calculator_batch.np
+        if np is not None and isinstance(values, np.ndarray):
+            self._add_numpy(np, x, values, errors)
+            return
+        last = self._last
+        for point, value, code in zip(x, values, errors):
+            self.count += 1
+            if code != OK:
+                self.errors += 1
+                last = None
+                continue
+            if self.min is None or value < self.min:
+                self.min, self.argmin = value, point
+            if self.max is None or value > self.max:
+                self.max, self.argmax = value, point
+            if last is not None:
+                self.integral += (point - last[0]) * (value + last[1]) / 2
+            last = (point, value)
+        self._last = last
+    
+    def _add_numpy(self, np, x, values, errors) -> None:
+        count = len(x)
+        valid = errors == OK
+        self.count += count
+        self.errors += count - int(np.count_nonzero(valid))
+        if valid.any():
+            masked = np.where(valid, values, np.inf)
+            i = int(np.argmin(masked))
+            if self.min is None or masked[i] < self.min:
+                self.min, self.argmin = float(masked[i]), float(x[i])
+            masked = np.where(valid, values, -np.inf)
+            i = int(np.argmax(masked))
+            if self.max is None or masked[i] > self.max:
+                self.max, self.argmax = float(masked[i]), float(x[i])
+        if self._last is not None:
+            x = np.concatenate(([self._last[0]], x))
+            values = np.concatenate(([self._last[1]], values))
+            valid = np.concatenate(([True], valid))
+        pairs = valid[1:] & valid[:-1]
+        if pairs.any():
+            areas = np.diff(x) * (values[1:] + values[:-1]) / 2
+            self.integral += float(areas[pairs].sum())
+        self._last = (float(x[-1]), float(values[-1])) if valid[-1] else None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """The summary as plain data (for the result cache)."""
+        return {name: value for name, value in vars(self).items() if not name.startswith('_')}
+    
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'SweepSummary':
+        summary = cls()
+        vars(summary).update(data)
+        return summary
+    
+    def lines(self) -> List[str]:
+        """Human-readable summary lines."""
+        lines = [f"points: {self.count}", f"errors: {self.errors}"]
+        if self.min is not None:
+            lines.append(f"min: {self.min} at x = {self.argmin}")
+            lines.append(f"max: {self.max} at x = {self.argmax}")
+            lines.append(f"integral: {self.integral}")
+        return lines
+    
+    def __repr__(self) -> str:
+        return (f"SweepSummary(count={self.count}, errors={self.errors}, min={self.min}, "
+                f"argmin={self.argmin}, max={self.max}, argmax={self.argmax}, "
+                f"integral={self.integral})")
+
+
+def write_chunk(output: IO[str], x: Any, values: Any, errors: Any) -> None:
+    """Write one 'x<TAB>result' (or 'x<TAB>error: message') line per point."""
+    lines = []
+    append = lines.append
+    for point, value, code in zip(x.tolist(), values.tolist(), errors.tolist()):
+        if code:
+            append(f"{point!r}\terror: {ERROR_MESSAGES.get(code, ERROR_MESSAGES[CALCULATION_ERROR])}\n")
+        else:
+            append(f"{point!r}\t{value!r}\n")
+    output.write(''.join(lines))
+
+
+def sweep(expression: str, start: float, stop: float, step: float, variable: str = 'x',
+          output: Optional[IO[str]] = None, variables: Optional[Mapping[str, float]] = None,
+          chunk_size: int = DEFAULT_CHUNK_SIZE, cache=None) -> SweepSummary:
+    """
+    Evaluate expression over the range and return its summary.
+    
+    With output, every point is also written to it as a line, chunk by chunk.
+    Otherwise, with a ResultCache, a cached summary is returned without
+    evaluating anything.
+    """
+    if cache is not None and output is None:
+        from calculator_result_cache import sweep_key
+        
+        key = sweep_key(expression, start, stop, step, variable, variables)
+        if key is not None:
+            data = cache.lookup(key, lambda: sweep(expression, start, stop, step, variable,
+                                                   None, variables, chunk_size).to_dict())
+            return SweepSummary.from_dict(data)
+    summary = SweepSummary()
+    for chunk in iter_sweep(expression, start, stop, step, variable, variables, chunk_size):
+        summary.add(*chunk)
+        if output is not None:
+            write_chunk(output, *chunk)
+    if output is not None:
+        output.flush()
+    return summary
\ No newline at end of file
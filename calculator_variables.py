@@ -0,0 +1,207 @@
+"""
+Calculator Variables
+Named variables defined by expressions, recomputed incrementally like
+spreadsheet cells.
+
+Each definition is compiled once; the names its expression reads are its
+dependencies. Redefining a variable recomputes it and, in dependency order,
+only the variables that depend on it, directly or through others, so
+changing one input of thousands of definitions costs as much as the cells
+downstream of it. A variable may refer to names that are not defined yet:
+it evaluates to an UNDEFINED_VARIABLE error until they are, and is
+recomputed when they get defined. Definitions that would make a variable
+depend on itself are rejected with CIRCULAR_DEFINITION.
+"""
+
+from __future__ import annotations
+
+from calculator import (
+    CALCULATION_ERROR, CIRCULAR_DEFINITION, ERROR_MESSAGES, INVALID_INPUT, OK, UNDEFINED_VARIABLE,
+    Calculator, CalculatorError,
+)
+from calculator_expr import try_compile_expression
+from calculator_operators import registry
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Names that read as something else at the prompt
+RESERVED_NAMES = frozenset({
+    'deg', 'q', 'quit', 'exit', 'help', 'history', 'stats', 'clear', 'reset',
+    'mr', 'mc', 'ms', 'deps', 'recalc', 'vars', 'sweep',
+    'sum', 'mean', 'var', 'stdev', 'median', 'quantile', 'describe', 'matrix', 'exact',
+    'factor', 'primes',
+})
+
+_NAME_START = frozenset('abcdefghijklmnopqrstuvwxyz_')
+_NAME_CHARS = _NAME_START | frozenset('0123456789')
+
+
+def is_variable_name(name: str) -> bool:
+    """Whether name can be assigned: an identifier that is no operator or command."""
+    return (name[:1] in _NAME_START and all(char in _NAME_CHARS for char in name)
+            and name not in RESERVED_NAMES and name not in registry)
+
+
+class Cell:
+    """One variable: its definition, dependencies and last computed state."""
+    
+    __slots__ = ('name', 'source', 'compiled', 'dependencies', 'value', 'code', 'message')
+    
+    def __init__(self, name: str, compiled):
+        self.name = name
+        self.source = compiled.source
+        self.compiled = compiled
+        self.dependencies = compiled.variables
+        self.value: Optional[float] = None
+        self.code = OK
+        self.message: Optional[str] = None
+    
+    def __repr__(self) -> str:
+        state = self.value if self.code == OK else self.message
+        return f"Cell({self.name!r}, {self.source!r}, {state!r})"
+
+
+class VariableGraph:
+    """Variables with a dependency graph for incremental recomputation."""
+    
+    def __init__(self, calculator: Optional[Calculator] = None):
+        self.calculator = calculator if calculator is not None else Calculator()
+        self.cells: Dict[str, Cell] = {}
+        # Current values of the variables that evaluated successfully; this is
+        # the mapping expressions read their variables from
+        self.values: Dict[str, float] = {}
+        # name -> names of the variables whose definitions read it (defined or not)
+        self._dependents: Dict[str, Set[str]] = {}
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.cells
+    
+    def __len__(self) -> int:
+        return len(self.cells)
+    
+    def __iter__(self) -> Iterator[Cell]:
+        """Cells in definition order."""
+        return iter(self.cells.values())
+    
+    def get(self, name: str) -> Optional[Cell]:
+        """The cell of a defined variable, or None."""
+        return self.cells.get(name)
+    
+    def dependencies(self, name: str) -> List[str]:
+        """Sorted names the definition of name reads."""
+        cell = self.cells.get(name)
+        return sorted(cell.dependencies) if cell is not None else []
+    
+    def dependents(self, name: str) -> List[str]:
+        """Sorted names of the variables that read name directly."""
+        return sorted(self._dependents.get(name, ()))
+    
+    def try_define(self, name: str, source: str) -> Tuple[Optional[float], int, Optional[str]]:
+        """
+        Define or redefine name as source and recompute what depends on it.
+        
+        Returns the new value as (value, OK, None), or (None, code, message)
+        if the definition is rejected (invalid name or expression, a cycle),
+        in which case nothing changes, or if it evaluates to an error, which
+        the variable then holds.
+        """
+        if name in RESERVED_NAMES or name in registry:
+            return None, INVALID_INPUT, f"Invalid input: {name} is a reserved name"
+        if not is_variable_name(name):
+            return None, INVALID_INPUT, f"Invalid input: Invalid variable name: {name}"
+        compiled = try_compile_expression(source)
+        if compiled.error is not None:
+            return compiled.try_evaluate(self.calculator)
+        dependencies = compiled.variables
+        reserved = sorted(dependencies & RESERVED_NAMES)
+        if reserved:
+            # Could never be defined, so the variable would never get a value
+            return None, INVALID_INPUT, f"Invalid input: {reserved[0]} is a reserved name"
+        if not dependencies.isdisjoint(self._downstream((name,))):
+            return None, CIRCULAR_DEFINITION, f"Circular definition: {name} depends on itself"
+        old = self.cells.get(name)
+        if old is not None:
+            for dependency in old.dependencies:
+                self._dependents[dependency].discard(name)
+        for dependency in dependencies:
+            self._dependents.setdefault(dependency, set()).add(name)
+        cell = self.cells[name] = Cell(name, compiled)
+        self.recalculate([name])
+        return cell.value, cell.code, cell.message
+    
+    def define(self, name: str, source: str) -> float:
+        """Define name as source; raises CalculatorError or ValueError like evaluation."""
+        value, code, message = self.try_define(name, source)
+        if code == INVALID_INPUT:
+            raise ValueError(message[len("Invalid input: "):])
+        if code:
+            raise CalculatorError(message, code)
+        return value
+    
+    def recalculate(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Recompute names and everything downstream of them (all variables if
+        None), each after its dependencies. Returns the recomputed names in
+        evaluation order.
+        """
+        if names is None:
+            names = list(self.cells)
+        else:
+            names = [name for name in names if name in self.cells]
+        order = self._order(self._downstream(names))
+        calculator = self.calculator
+        values = self.values
+        for name in order:
+            cell = self.cells[name]
+            try:
+                cell.value, cell.code, cell.message = cell.compiled.try_evaluate(calculator, values)
+            except Exception as e:  # keep going: the other cells must not go stale
+                cell.value, cell.code = None, CALCULATION_ERROR
+                cell.message = f"{ERROR_MESSAGES[CALCULATION_ERROR]}: {e}"
+            if cell.code == OK:
+                values[name] = cell.value
+                continue
+            values.pop(name, None)
+            if cell.code == UNDEFINED_VARIABLE:
+                missing = self.cells.get(cell.message.rpartition(': ')[2])
+                if missing is not None:
+                    cell.message = f"Variable {missing.name} has an error: {missing.message}"
+        return order
+    
+    def _downstream(self, names: Iterable[str]) -> Set[str]:
+        """names plus every variable that transitively depends on them."""
+        seen = set(names)
+        stack = list(seen)
+        dependents = self._dependents
+        while stack:
+            for dependent in dependents.get(stack.pop(), ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        return seen
+    
+    def _order(self, names: Set[str]) -> List[str]:
+        """Topological order of the defined names among names (Kahn's algorithm)."""
+        cells = self.cells
+        pending = {name: sum(1 for dependency in cells[name].dependencies if dependency in names)
+                   for name in names if name in cells}
+        ready = [name for name, count in pending.items() if count == 0]
+        order = []
+        dependents = self._dependents
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for dependent in dependents.get(name, ()):
+                if dependent in pending:
+                    pending[dependent] -= 1
+                    if pending[dependent] == 0:
+                        ready.append(dependent)
+        return order
+    
+    def clear(self) -> None:
+        """Remove every variable."""
+        self.cells.clear()
+        self.values.clear()
+        self._dependents.clear()
\ No newline at end of file
@@ -4,8 +4,45 @@ Tests all calculator operations, memory functions, and error handling.
 """
 
 import unittest
+import asyncio
+import bisect
+import contextlib
+import io
+import json
 import math
+import os
+import pickle
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import tempfile
+import time
+import benchmark
+import calculator
+import calculator_batch
+import calculator_cli
+import calculator_client
+import calculator_expr
+import calculator_factorial
+import calculator_matrix
+import calculator_number_theory
+import calculator_operators
+import calculator_stats
 from calculator import Calculator, CalculatorError
+from calculator_cli import CalculatorCLI
+from calculator_concurrent import ConcurrentCalculator
+from calculator_history import OP_ADD
+from calculator_history_log import COMPACT_MIN_DEAD, HistoryLog
+from calculator_memo import MemoCache
+from calculator_metrics import Metrics
+from calculator_parallel import evaluate_parallel
+from calculator_result_cache import ResultCache
+from calculator_server import CalculatorServer
+from calculator_stats import StreamStats
+from calculator_variables import VariableGraph
 
 
 class TestCalculator(unittest.TestCase):
@@ -96,6 +133,31 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(CalculatorError):
             self.calc.factorial(200)
     
+    def test_exact_factorial(self):
+        """Test exact big-integer factorials beyond the float limit."""
+        self.assertEqual(self.calc.factorial(200, exact=True), math.factorial(200))
+        n = calculator_factorial.PRIME_SWING_THRESHOLD + 1
+        self.assertEqual(calculator_factorial.factorial_exact(n), math.factorial(n))
+        self.assertEqual(self.calc.get_history()[-1], "200! = <375-digit integer>")
+        self.assertEqual(self.calc.get_last_result(), math.factorial(200))
+        
+        # Test the size guard
+        self.assertEqual(calculator_factorial.factorial_digits(1000), len(str(math.factorial(1000))))
+        with self.assertRaises(CalculatorError):
+            self.calc.factorial(10 ** 7, exact=True)
+        with self.assertRaises(CalculatorError) as cm:
+            self.calc.factorial(1000, exact=True, max_digits=100)
+        self.assertEqual(str(cm.exception), "Number too large for factorial calculation: "
+                                            "1000! would have about 2568 digits (limit 100)")
+    
+    def test_factorial_approx(self):
+        """Test the log-gamma approximation of huge factorials."""
+        mantissa, exponent = self.calc.factorial_approx(100000)
+        self.assertEqual(exponent, 456573)
+        self.assertAlmostEqual(mantissa, 2.824229408, places=6)
+        mantissa, exponent = self.calc.factorial_approx(10)
+        self.assertAlmostEqual(mantissa * 10 ** exponent, 3628800, places=3)
+    
     def test_trigonometric_functions(self):
         """Test trigonometric functions."""
         # Test in radians
@@ -243,6 +305,1839 @@ class TestCalculator(unittest.TestCase):
         self.assertEqual(self.calc.divide(-12, -3), 4.0)
 
 
+class TestCalculatorHistory(unittest.TestCase):
+    """Test cases for the bounded structured history."""
+    
+    def test_rendering(self):
+        """Test that records render the same text as before."""
+        calc = Calculator()
+        calc.sin(90, degrees=True)
+        calc.log(8, 2)
+        calc.factorial(25)
+        calc.memory_store(42)
+        calc.memory_add(8)
+        calc.memory_clear()
+        self.assertEqual(calc.get_history(), [
+            "sin(90°) = 1.0",
+            f"log_2(8) = {math.log(8, 2)}",
+            f"25! = {math.factorial(25)}",
+            "M = 42",
+            "M+ 8 = 50.0",
+            "MC",
+        ])
+    
+    def test_overwrite_policy(self):
+        """Test that the oldest records are evicted when the buffer is full."""
+        calc = Calculator(history_capacity=3)
+        for i in range(5):
+            calc.add(i, 1)
+        self.assertEqual(calc.get_history(),
+                         ["2 + 1 = 3.0", "3 + 1 = 4.0", "4 + 1 = 5.0"])
+        self.assertEqual(calc.history.evicted, 2)
+        self.assertEqual(calc.history[-1], "4 + 1 = 5.0")
+    
+    def test_discard_and_error_policies(self):
+        """Test the policies that keep the oldest records."""
+        calc = Calculator(history_capacity=2, history_policy='discard')
+        for i in range(4):
+            calc.add(i, 1)
+        self.assertEqual(calc.get_history(), ["0 + 1 = 1.0", "1 + 1 = 2.0"])
+        
+        calc = Calculator(history_capacity=1, history_policy='error')
+        calc.add(1, 1)
+        with self.assertRaises(CalculatorError):
+            calc.add(2, 2)
+        
+        with self.assertRaises(ValueError):
+            Calculator(history_policy='unknown')
+    
+    def test_iter_history(self):
+        """Test iterating over the last n entries."""
+        calc = Calculator(history_capacity=4)
+        for i in range(6):
+            calc.multiply(i, 2)
+        self.assertEqual(list(calc.iter_history(last=2)),
+                         ["4 × 2 = 8.0", "5 × 2 = 10.0"])
+        self.assertEqual(len(list(calc.iter_history())), 4)
+        self.assertEqual(list(calc.iter_history(last=10)), calc.get_history())
+    
+    def test_structured_records(self):
+        """Test access to the structured records."""
+        calc = Calculator()
+        calc.divide(9, 3)
+        calc.history.append("note")
+        records = list(calc.history.iter_records())
+        self.assertEqual(records[0][1:], (9, 3, 3.0))
+        self.assertEqual(records[1][1], "note")
+
+
+class TestHistoryLog(unittest.TestCase):
+    """Test cases for the persistent history log."""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'history.log')
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def test_survives_restart(self):
+        """Test that records, text and big integers are reloaded from disk."""
+        calc = Calculator(history_capacity=None, history_path=self.path)
+        calc.add(5, 3)
+        calc.factorial(200, exact=True)
+        calc.history.record(OP_ADD, 2 ** 60, 1, 2 ** 60 + 1)
+        calc.memory_store(7)
+        expected = calc.get_history()
+        calc.close()
+        
+        calc = Calculator(history_capacity=None, history_path=self.path)
+        self.assertEqual(calc.get_history(), expected)
+        self.assertEqual(list(calc.iter_history(last=2)), expected[-2:])
+        self.assertEqual(calc.history[1], "200! = <375-digit integer>")
+        timestamps = [record[0] for record in calc.history.iter_timed()]
+        self.assertEqual(timestamps, sorted(timestamps))
+        calc.close()
+    
+    def test_group_commit(self):
+        """Test that records are written in groups and on reads."""
+        with HistoryLog(self.path, group_size=4, commit_interval=3600) as log:
+            for i in range(3):
+                log.record(OP_ADD, float(i), 1.0, i + 1.0)
+            self.assertEqual(os.path.getsize(self.path), 32)
+            log.record(OP_ADD, 3.0, 1.0, 4.0)
+            self.assertEqual(os.path.getsize(self.path), 32 + 4 * 40)
+            log.record(OP_ADD, 4.0, 1.0, 5.0)
+            self.assertEqual(log[-1], "4.0 + 1.0 = 5.0")
+            self.assertEqual(os.path.getsize(self.path), 32 + 5 * 40)
+    
+    def test_capacity_and_compaction(self):
+        """Test that evicted records are hidden and later compacted away."""
+        with HistoryLog(self.path, capacity=10) as log:
+            for i in range(COMPACT_MIN_DEAD * 2):
+                log.record(OP_ADD, float(i), 1.0, i + 1.0)
+            log.append("note")
+            self.assertEqual(len(log), 10)
+            self.assertEqual(log[-1], "note")
+            self.assertLess(os.path.getsize(self.path), 32 + COMPACT_MIN_DEAD * 40)
+            log.compact()
+            self.assertEqual(os.path.getsize(self.path), 32 + 10 * 40)
+            self.assertEqual(log[-1], "note")
+            self.assertEqual(log[0], f"{COMPACT_MIN_DEAD * 2 - 9}.0 + 1.0 = {COMPACT_MIN_DEAD * 2 - 8}.0")
+        
+        with HistoryLog(self.path) as log:
+            self.assertEqual(len(log), 10)
+            log.clear()
+        with HistoryLog(self.path) as log:
+            self.assertEqual(len(log), 0)
+    
+    def test_torn_write_and_bad_file(self):
+        """Test recovery from a partial record and rejection of other files."""
+        with HistoryLog(self.path) as log:
+            log.record(OP_ADD, 1.0, 1.0, 2.0)
+        with open(self.path, 'ab') as f:
+            f.write(b'partial')
+        with HistoryLog(self.path) as log:
+            self.assertEqual(log.render(), ["1.0 + 1.0 = 2.0"])
+        
+        other = os.path.join(self.directory.name, 'other.log')
+        with open(other, 'wb') as f:
+            f.write(b'not a history log at all' * 4)
+        with self.assertRaises(ValueError):
+            HistoryLog(other)
+    
+    def test_interrupted_compaction(self):
+        """Test that a log whose compaction was cut short reopens with the right sidecar."""
+        with HistoryLog(self.path, capacity=2) as log:
+            for text in ("first", "second", "third"):
+                log.append(text)
+        # Crash before the rename: a half-written next generation is ignored
+        for stale in (self.path + '.compact', self.path + '.text.1'):
+            with open(stale, 'wb') as f:
+                f.write(b'partial')
+        with HistoryLog(self.path) as log:
+            self.assertEqual(log.render(), ["second", "third"])
+            self.assertFalse(os.path.exists(self.path + '.text.1'))
+            log.compact()
+            self.assertEqual(log.render(), ["second", "third"])
+        self.assertFalse(os.path.exists(self.path + '.text'))
+        # Crash after the rename: the log already refers to the new sidecar
+        with open(self.path + '.text', 'wb') as f:
+            f.write(b'stale sidecar')
+        with HistoryLog(self.path) as log:
+            self.assertEqual(log.render(), ["second", "third"])
+            log.append("fourth")
+        self.assertFalse(os.path.exists(self.path + '.text'))
+        with HistoryLog(self.path) as log:
+            self.assertEqual(log.render(), ["second", "third", "fourth"])
+
+
+class TestHistoryQuery(unittest.TestCase):
+    """Test cases for indexed history queries."""
+    
+    def setUp(self):
+        self.calc = Calculator(history_capacity=None)
+        for i in range(1, 5001):
+            self.calc.add(i, 1)
+            self.calc.divide(i, 4)
+        self.calc.memory_clear()
+        self.calc.history.append("note")
+    
+    def brute_force(self, predicate):
+        return [record for record in self.calc.history.iter_timed() if predicate(record)]
+    
+    def test_filters_match_brute_force(self):
+        """Test op, result and time filters against a linear scan."""
+        entries = self.calc.query_history(op='divide', min_result=100, max_result=200)
+        expected = self.brute_force(lambda r: r[1] == 4 and 100 <= r[4] <= 200)
+        self.assertEqual([entry[1:] for entry in entries], expected)
+        self.assertEqual(entries[0].text, "400 ÷ 4 = 100.0")
+        
+        entries = self.calc.query_history(min_result=4990)
+        self.assertEqual(len(entries), 12)
+        self.assertEqual(self.calc.aggregate_history('count', op=['add', 'divide']), 10000)
+        self.assertEqual(self.calc.aggregate_history('count', op='mc'), 1)
+        self.assertEqual(self.calc.aggregate_history('count', since=math.inf), 0)
+        self.assertEqual(self.calc.aggregate_history('count'), 10002)
+        self.assertEqual(len(self.calc.query_history(op='divide', last=3)), 3)
+    
+    def test_aggregates_and_incremental_updates(self):
+        """Test aggregates and that new records are picked up."""
+        self.assertEqual(self.calc.aggregate_history('sum', op='add'), sum(range(2, 5002)))
+        self.assertEqual(self.calc.aggregate_history('max', op='divide'), 1250.0)
+        self.assertEqual(self.calc.aggregate_history('mean', op='divide', max_result=1.0), 0.625)
+        self.assertIsNone(self.calc.aggregate_history('min', op='power'))
+        self.calc.power(10, 7)
+        self.calc.divide(9e6, 1)
+        self.assertEqual(self.calc.aggregate_history('count', min_result=1e6), 2)
+        self.assertEqual(self.calc.query_history(op='power')[0].result, 1e7)
+        with self.assertRaises(ValueError):
+            self.calc.query_history(op='bogus')
+    
+    def test_evicted_records_are_excluded(self):
+        """Test queries on a ring buffer that keeps overwriting records."""
+        calc = Calculator(history_capacity=100)
+        for i in range(50000):
+            calc.add(i, 0)
+            if i % 9999 == 0:
+                self.assertLessEqual(calc.aggregate_history('count', max_result=1e9), 100)
+        self.assertEqual(calc.aggregate_history('count', max_result=49949), 50)
+        self.assertEqual(calc.aggregate_history('min'), 49900)
+        calc.clear_history()
+        self.assertEqual(calc.query_history(), [])
+    
+    def test_parse_conditions(self):
+        """Test the condition syntax used by 'history where'."""
+        from calculator_query import parse_conditions
+        filters = parse_conditions("op = divide,mod and result > 1e6 and result <= 5e6 and within 1h", now=7200.0)
+        self.assertEqual(filters['op'], ['divide', 'mod'])
+        self.assertGreater(filters['min_result'], 1e6)
+        self.assertEqual(filters['max_result'], 5e6)
+        self.assertEqual(filters['since'], 3600.0)
+        with self.assertRaises(ValueError):
+            parse_conditions("result > lots")
+    
+    def test_cli_history_where(self):
+        """Test the history where and aggregate commands."""
+        cli = CalculatorCLI(interactive=False, calculator=self.calc)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            cli.parse_input('history where op = divide and result >= 1250')
+            cli.parse_input('history count where op = add')
+        self.assertEqual(output.getvalue(), " 1. 5000 ÷ 4 = 1250.0\ncount: 5000\n")
+
+
+class TestConcurrentCalculator(unittest.TestCase):
+    """Test cases for the thread-safe calculator."""
+    
+    def run_threads(self, target, count=4):
+        threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+    def test_no_lost_updates(self):
+        """Test that concurrent memory updates and records are all kept."""
+        calc = ConcurrentCalculator(history_capacity=None)
+        
+        def work(index):
+            for i in range(2000):
+                calc.add(index, i)
+                calc.memory_add(1)
+                calc.memory_subtract(0.5)
+        
+        self.run_threads(work)
+        self.assertEqual(calc.memory, 4000.0)
+        self.assertEqual(len(calc.history), 4 * 2000 * 3)
+        timestamps = [record[0] for record in calc.history.iter_timed()]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(calc.aggregate_history('count', op='add'), 8000)
+        self.assertEqual(len(calc.get_history()), 24000)
+        calc.clear_history()
+        self.assertEqual(len(calc.history), 0)
+    
+    def test_exited_threads_leave_no_shards(self):
+        """Test that shards of exited threads are merged into the tail and dropped."""
+        calc = ConcurrentCalculator(history_capacity=None)
+        for request in range(5):
+            self.run_threads(lambda index: [calc.add(request, i) for i in range(100)])
+            self.assertEqual(calc.aggregate_history('count', op='add'), (request + 1) * 400)
+        self.assertEqual(calc.history._shards, [])
+        self.assertEqual(len(calc.history), 2000)
+        timestamps = [record[0] for record in calc.history.iter_timed()]
+        self.assertEqual(timestamps, sorted(timestamps))
+        
+        # The live shard's index is kept and refreshed, not rebuilt
+        calc.add(1, 1)
+        self.assertEqual(calc.aggregate_history('count', op='add'), 2001)
+        shard = calc.history.shard()
+        index = shard.index
+        calc.add(2, 2)
+        self.assertEqual(calc.query_history(op='add', last=2)[-1].result, 4.0)
+        self.assertIs(shard.index, index)
+        self.assertEqual(calc.aggregate_history('max', op='add'), 103.0)
+    
+    def test_last_result_is_per_thread(self):
+        """Test that each thread sees its own last result."""
+        calc = ConcurrentCalculator()
+        results = {}
+        
+        def work(index):
+            for i in range(500):
+                calc.multiply(index, 10)
+            results[index] = calc.get_last_result()
+        
+        self.run_threads(work)
+        self.assertEqual(results, {i: i * 10.0 for i in range(4)})
+        self.assertIsNone(calc.get_last_result())
+        calc.add(1, 1)
+        self.assertEqual(calc.get_last_result(), 2)
+        self.assertEqual(list(calc.iter_history(last=1)), ["1 + 1 = 2.0"])
+
+
+class TestCalculatorMemo(unittest.TestCase):
+    """Test cases for memoization of the pure functions."""
+    
+    def test_hits_still_record_history(self):
+        """Test that cached calls are served from the cache and still recorded."""
+        calc = Calculator(memo=True)
+        self.assertEqual(calc.square_root(16), 4.0)
+        self.assertEqual(calc.square_root(16), 4.0)
+        self.assertAlmostEqual(calc.sin(90, degrees=True), 1.0, places=10)
+        self.assertAlmostEqual(calc.sin(90), math.sin(90), places=10)
+        stats = calc.memo.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 3, 3))
+        self.assertEqual(len(calc.get_history()), 4)
+        self.assertEqual(calc.get_last_result(), math.sin(90))
+    
+    def test_cached_errors(self):
+        """Test that cached calls raise the same CalculatorError."""
+        calc = Calculator(memo=True)
+        messages = []
+        for _ in range(2):
+            with self.assertRaises(CalculatorError) as context:
+                calc.power(10.0, 400)
+            messages.append(str(context.exception))
+        self.assertEqual(messages[0], messages[1])
+        self.assertEqual(calc.memo.hits, 1)
+        
+        with self.assertRaises(CalculatorError):
+            calc.factorial(5.0)
+        self.assertEqual(calc.factorial(5), 120)
+    
+    def test_signed_zero_and_nan_keys(self):
+        """Test that -0.0 gets its own entry and NaN operands bypass the cache."""
+        calc = Calculator(memo=True)
+        self.assertEqual(math.copysign(1.0, calc.sin(0.0)), 1.0)
+        self.assertEqual(math.copysign(1.0, calc.sin(-0.0)), -1.0)
+        self.assertEqual(math.copysign(1.0, calc.power(-0.0, 3)), -1.0)
+        for _ in range(3):
+            self.assertTrue(math.isnan(calc.power(float('nan'), 2)))
+        stats = calc.memo.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (0, 6, 3))
+    
+    def test_shared_cache_and_eviction(self):
+        """Test a cache shared by two calculators with LRU and LFU eviction."""
+        shared = MemoCache(maxsize=2)
+        first = Calculator(memo=shared)
+        second = Calculator(memo=shared)
+        first.log10(100)
+        second.log10(100)
+        self.assertEqual(shared.hits, 1)
+        
+        first.log10(1000)
+        first.log10(10)
+        self.assertEqual(shared.evictions, 1)
+        self.assertEqual(len(shared), 2)
+        
+        lfu = MemoCache(maxsize=2, policy='lfu')
+        calc = Calculator(memo=lfu)
+        calc.cos(1)
+        calc.cos(1)
+        calc.cos(2)
+        calc.cos(3)  # evicts cos(2), the least frequently used
+        calc.cos(1)
+        self.assertEqual(lfu.stats()['hits'], 2)
+
+
+class TestCalculatorMetrics(unittest.TestCase):
+    """Test cases for per-operation metrics."""
+    
+    def test_counts_and_error_reasons(self):
+        """Test that calls, errors and latency are recorded per operation."""
+        calc = Calculator(metrics=True)
+        calc.add(1, 2)
+        calc.add(3, 4)
+        for _ in range(2):
+            with self.assertRaises(CalculatorError):
+                calc.divide(1, 0)
+        with self.assertRaises(CalculatorError):
+            calc.factorial(-3)
+        for base, exponent in ((10.0, 400), (-8, 1 / 3)):
+            with self.assertRaises(CalculatorError):
+                calc.power(base, exponent)
+        
+        operations = calc.metrics.snapshot()['operations']
+        self.assertEqual(operations['add']['calls'], 2)
+        self.assertEqual(operations['divide']['errors'],
+                         {'Division by zero is not allowed': 2})
+        self.assertEqual(operations['power']['errors'],
+                         {'Power operation failed: result too large': 1,
+                          'Power operation failed: result is not a real number': 1})
+        self.assertEqual(sum(operations['add']['buckets']), 2)
+        self.assertGreater(operations['add']['total_seconds'], 0)
+        self.assertEqual(len(calc.get_history()), 2)
+    
+    def test_exports(self):
+        """Test the Prometheus and JSON exports."""
+        metrics = Metrics()
+        calc = Calculator(metrics=metrics)
+        calc.square_root(16)
+        with self.assertRaises(CalculatorError):
+            calc.square_root(-1)
+        text = metrics.to_prometheus()
+        self.assertIn('calculator_operations_total{op="square_root"} 2', text)
+        self.assertIn('calculator_errors_total{op="square_root",'
+                      'reason="Cannot calculate square root of negative number"} 1', text)
+        self.assertIn('calculator_operation_latency_seconds_bucket{op="square_root",le="+Inf"} 2', text)
+        self.assertIn('calculator_operation_latency_seconds_count{op="square_root"} 2', text)
+        data = json.loads(metrics.to_json())
+        self.assertEqual(data['operations']['square_root']['calls'], 2)
+    
+    def test_enable_and_disable(self):
+        """Test that disabled metrics leave the class methods in place."""
+        calc = Calculator()
+        self.assertIsNone(calc.metrics)
+        self.assertNotIn('add', vars(calc))
+        metrics = calc.enable_metrics()
+        calc.add(1, 1)
+        calc.disable_metrics()
+        calc.add(1, 1)
+        self.assertNotIn('add', vars(calc))
+        self.assertEqual(metrics.operation('add').calls, 1)
+    
+    def test_reset_keeps_recording(self):
+        """Test that calls made after a reset are still counted."""
+        calc = Calculator(metrics=True)
+        calc.add(1, 1)
+        with self.assertRaises(CalculatorError):
+            calc.divide(1, 0)
+        calc.metrics.reset()
+        self.assertEqual(calc.metrics.summary()[1:], [])
+        
+        calc.add(2, 2)
+        stats = calc.metrics.operation('add')
+        self.assertEqual(stats.calls, 1)
+        self.assertEqual(sum(stats.buckets), 1)
+        self.assertEqual(calc.metrics.operation('divide').errors, {})
+        summary = calc.metrics.summary()
+        self.assertEqual(len(summary), 2)
+        self.assertTrue(summary[1].startswith('add'))
+    
+    def test_cli_stats_command(self):
+        """Test the stats command of the CLI."""
+        cli = CalculatorCLI(interactive=False)
+        cli.parse_input('stats on')
+        cli.parse_input('5 + 3')
+        cli.parse_input('1 / 0')
+        self.assertEqual(cli.calculator.metrics.operation('divide').calls, 1)
+        cli.parse_input('stats reset')
+        self.assertEqual(cli.calculator.metrics.operation('divide').calls, 0)
+        self.assertEqual(cli.calculator.metrics.summary()[1:], [])
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            cli.parse_input('stats')
+        self.assertEqual(output.getvalue(), "No operations recorded yet.\n")
+        cli.parse_input('stats off')
+        self.assertIsNone(cli.calculator.metrics)
+
+
+class TestCalculatorBatch(unittest.TestCase):
+    """Test cases for vectorized batch operations."""
+    
+    def setUp(self):
+        """Set up a fresh calculator instance for each test."""
+        self.calc = Calculator()
+    
+    def test_batch_arithmetic(self):
+        """Test element-wise arithmetic with broadcasting."""
+        result = self.calc.batch("add", [1, 2, 3], [4, 5, 6])
+        self.assertEqual(list(result.values), [5.0, 7.0, 9.0])
+        self.assertEqual(result.error_count, 0)
+        
+        result = self.calc.batch("multiply", [1, 2, 3], 2)
+        self.assertEqual(list(result.values), [2.0, 4.0, 6.0])
+    
+    def test_batch_domain_errors(self):
+        """Test that domain errors are reported per element instead of raising."""
+        result = self.calc.batch("divide", [6, 1, 9], [3, 0, 3])
+        self.assertEqual(list(result.mask), [False, True, False])
+        self.assertEqual(result.values[0], 2.0)
+        self.assertTrue(math.isnan(result.values[1]))
+        self.assertEqual(list(result.iter_errors()),
+                         [(1, "Division by zero is not allowed")])
+        
+        result = self.calc.batch("square_root", [4, -4])
+        self.assertEqual(list(result.mask), [False, True])
+        
+        result = self.calc.batch("log", [8, 0, 9], [2, 2, 1])
+        self.assertEqual(result.values[0], 3.0)
+        self.assertEqual(result.error_count, 2)
+        
+        result = self.calc.batch("power", [2, -8], [3, 0.5])
+        self.assertEqual(result.values[0], 8.0)
+        self.assertEqual(list(result.mask), [False, True])
+    
+    def test_batch_trigonometry(self):
+        """Test batch trigonometric functions in degrees."""
+        result = self.calc.batch("sin", [0, 90], degrees=True)
+        self.assertAlmostEqual(result.values[0], 0.0, places=10)
+        self.assertAlmostEqual(result.values[1], 1.0, places=10)
+        
+        for operation in ("sin", "cos", "tan"):
+            result = self.calc.batch(operation, [0, math.inf, -math.inf, math.nan])
+            self.assertEqual(list(result.errors), [calculator.OK] + [calculator.DOMAIN_ERROR] * 3)
+            self.assertTrue(all(math.isnan(v) for v in result.values[1:]))
+    
+    def test_batch_history_summary(self):
+        """Test that a batch adds a single summary history entry."""
+        self.calc.batch("divide", [1, 2, 3, 4], [1, 0, 1, 1])
+        history = self.calc.get_history()
+        self.assertEqual(history, ["batch divide[4] = 3 ok, 1 errors"])
+    
+    def test_batch_invalid_operation(self):
+        """Test invalid batch operations and operand counts."""
+        with self.assertRaises(CalculatorError):
+            self.calc.batch("factorial", [1, 2])
+        with self.assertRaises(CalculatorError):
+            self.calc.batch("divide", [1, 2])
+        with self.assertRaises(CalculatorError):
+            self.calc.batch("divide", [1, 2, 3], [1, 2])
+
+
+class TestCalculatorBatchFallback(TestCalculatorBatch):
+    """Run the batch tests against the pure-Python fallback."""
+    
+    def setUp(self):
+        """Disable NumPy for the duration of each test."""
+        super().setUp()
+        self._numpy = calculator_batch.np
+        calculator_batch.np = None
+    
+    def tearDown(self):
+        """Restore the NumPy module."""
+        calculator_batch.np = self._numpy
+
+
+class TestExpressionCompiler(unittest.TestCase):
+    """Test cases for the infix expression compiler and its cache."""
+    
+    def setUp(self):
+        """Set up a fresh calculator and an empty expression cache."""
+        self.calc = Calculator()
+        calculator_expr.clear_cache()
+    
+    def evaluate(self, source):
+        return calculator_expr.compile_expression(source).evaluate(self.calc)
+    
+    def test_precedence_and_parentheses(self):
+        """Test operator precedence, associativity and grouping."""
+        self.assertEqual(self.evaluate("5+3"), 8.0)
+        self.assertEqual(self.evaluate("5 + 3 * 2"), 11.0)
+        self.assertEqual(self.evaluate("(5 + 3) * 2"), 16.0)
+        self.assertEqual(self.evaluate("2 ^ 3 ^ 2"), 512.0)
+        self.assertEqual(self.evaluate("-2 ^ 2"), -4.0)
+        self.assertEqual(self.evaluate("10 - 4 - 3"), 3.0)
+        self.assertEqual(self.evaluate("10 mod 4 * 2"), 4.0)
+        self.assertEqual(self.evaluate("3! + 1"), 7.0)
+    
+    def test_functions(self):
+        """Test prefix functions in juxtaposed and parenthesized form."""
+        self.assertEqual(self.evaluate("sqrt 16"), 4.0)
+        self.assertEqual(self.evaluate("sqrt(16) + 1"), 5.0)
+        self.assertAlmostEqual(self.evaluate("sin 90 deg"), 1.0, places=10)
+        self.assertAlmostEqual(self.evaluate("cos(180 deg)"), -1.0, places=10)
+        self.assertAlmostEqual(self.evaluate("log 8 2"), 3.0, places=10)
+        self.assertAlmostEqual(self.evaluate("log(27, 3)"), 3.0, places=10)
+        self.assertAlmostEqual(self.evaluate("log10 1000"), 3.0, places=10)
+        self.assertEqual(self.evaluate("ln 1"), 0.0)
+    
+    def test_runs_through_calculator(self):
+        """Test that every operation is recorded in the calculator history."""
+        self.evaluate("(5 + 3) * 2")
+        self.assertEqual(self.calc.get_history(),
+                         ["5.0 + 3.0 = 8.0", "8.0 × 2.0 = 16.0"])
+        self.assertEqual(self.calc.get_last_result(), 16.0)
+    
+    def test_errors(self):
+        """Test syntax and domain errors."""
+        for source in ["5 3", "5 +", "(5", "foo 3", "5 $ 3"]:
+            with self.assertRaises(ValueError):
+                self.evaluate(source)
+        with self.assertRaises(CalculatorError):
+            self.evaluate("1 / (2 - 2)")
+        with self.assertRaises(CalculatorError):
+            self.evaluate("2.5!")
+    
+    def test_cache(self):
+        """Test that repeated expressions hit the compiled-expression cache."""
+        first = calculator_expr.compile_expression("5 + 3")
+        second = calculator_expr.compile_expression("  5  +   3 ")
+        self.assertIs(first, second)
+        info = calculator_expr.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+        
+        cache = calculator_expr.ExpressionCache(maxsize=2)
+        for source in ["1 + 1", "2 + 2", "3 + 3"]:
+            cache.get(source)
+        cache.get("1 + 1")
+        self.assertEqual(cache.info().misses, 4)
+
+
+class TestOperatorRegistry(unittest.TestCase):
+    """Test cases for the pluggable operator registry."""
+    
+    def setUp(self):
+        """Set up a calculator and remember the shared registry's operators."""
+        self.calc = Calculator()
+        self.registry = calculator_operators.registry
+        self.saved = (dict(self.registry._operators), dict(self.registry._lazy),
+                      set(self.registry.symbols))
+    
+    def tearDown(self):
+        """Restore the shared registry."""
+        operators, lazy, symbols = self.saved
+        self.registry._operators = operators
+        self.registry._lazy = lazy
+        self.registry.symbols = symbols
+        self.registry.version += 1
+    
+    def evaluate(self, source):
+        return calculator_expr.compile_expression(source).evaluate(self.calc)
+    
+    def test_register_operators(self):
+        """Test infix, prefix and postfix operators with callable handlers."""
+        calculator_operators.register(calculator_operators.Operator(
+            '%', calculator_operators.INFIX, lambda calc, a, b: calc.multiply(a, b) / 100, 2,
+            calculator_operators.MULTIPLICATIVE_BP, description='Percent of'))
+        calculator_operators.register(calculator_operators.Operator(
+            'hypot', calculator_operators.PREFIX, lambda calc, *args: math.hypot(*args), (2, 3)))
+        calculator_operators.register(calculator_operators.Operator(
+            '~', calculator_operators.POSTFIX, lambda calc, a: calc.add(a, 1)))
+        self.assertEqual(self.evaluate("1 + 50 % 8"), 5.0)
+        self.assertEqual(self.evaluate("hypot 3 4"), 5.0)
+        self.assertEqual(self.evaluate("hypot(1, 2, 2) * 2"), 6.0)
+        self.assertEqual(self.evaluate("2 ^ 2~"), 8.0)
+        with self.assertRaises(ValueError):
+            self.evaluate("hypot 3")
+        with self.assertRaises(ValueError):
+            calculator_operators.register(calculator_operators.Operator(
+                '+', calculator_operators.INFIX, 'add', 2))
+        self.assertIn("<num1> % <num2>     Percent of", self.registry.help_text())
+    
+    def test_check(self):
+        """Test that an operator's check rejects arguments before the handler runs."""
+        calls = []
+        
+        def double_positive(calc, value):
+            calls.append(value)
+            return value * 2
+        
+        calculator_operators.register(calculator_operators.Operator(
+            'dbl', calculator_operators.PREFIX, double_positive,
+            check=lambda value: calculator.OK if value > 0 else calculator.DOMAIN_ERROR))
+        self.assertEqual(self.evaluate("dbl 21"), 42.0)
+        compiled = calculator_expr.compile_expression("dbl (1 - 1)")
+        self.assertEqual(compiled.try_evaluate(self.calc),
+                         (None, calculator.DOMAIN_ERROR,
+                          "Argument outside the domain of the operation"))
+        with self.assertRaises(CalculatorError) as context:
+            compiled.evaluate(self.calc)
+        self.assertEqual(context.exception.code, calculator.DOMAIN_ERROR)
+        self.assertEqual(calls, [21.0])
+    
+    def test_replacing_invalidates_cache(self):
+        """Test that cached expressions are recompiled after a registry change."""
+        self.assertEqual(self.evaluate("2 ^ 3"), 8.0)
+        calculator_operators.register(calculator_operators.Operator(
+            '^', calculator_operators.INFIX, 'multiply', 2), replace=True)
+        self.assertEqual(self.evaluate("2 ^ 3"), 6.0)
+    
+    def test_lazy_module(self):
+        """Test that an operator module is imported only when its token is used."""
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'lazy_ops_test.py'), 'w') as f:
+                f.write("from calculator_operators import Operator, PREFIX\n"
+                        "def register_operators(registry):\n"
+                        "    registry.register(Operator('double', PREFIX, "
+                        "lambda calc, x: calc.multiply(x, 2)))\n")
+            sys.path.insert(0, directory)
+            try:
+                calculator_operators.register_lazy('lazy_ops_test', ['double'])
+                self.assertEqual(self.evaluate("1 + 1"), 2.0)
+                self.assertNotIn('lazy_ops_test', sys.modules)
+                self.assertEqual(self.evaluate("double 21"), 42.0)
+                self.assertIn('lazy_ops_test', sys.modules)
+            finally:
+                sys.path.remove(directory)
+                sys.modules.pop('lazy_ops_test', None)
+
+
+class TestNonRaisingEvaluation(unittest.TestCase):
+    """Test cases for the status-returning evaluation API."""
+    
+    def setUp(self):
+        """Set up a CLI without console output."""
+        self.cli = CalculatorCLI(interactive=False)
+        calculator_expr.clear_cache()
+    
+    def test_status_codes(self):
+        """Test result/status tuples for valid input and each kind of error."""
+        cases = {
+            "5 + 3": (8.0, calculator.OK, None),
+            "ms 4": (4.0, calculator.OK, None),
+            "1 / 0": (None, calculator.DIVISION_BY_ZERO, "Division by zero is not allowed"),
+            "7 mod 0": (None, calculator.MODULO_BY_ZERO, "Modulo by zero is not allowed"),
+            "sqrt -4": (None, calculator.NEGATIVE_SQUARE_ROOT,
+                        "Cannot calculate square root of negative number"),
+            "log 8 1": (None, calculator.INVALID_LOG_BASE,
+                        "Logarithm base must be positive and not equal to 1"),
+            "ln 0": (None, calculator.NON_POSITIVE_LOG,
+                     "Logarithm is only defined for positive numbers"),
+            "2.5!": (None, calculator.FACTORIAL_DOMAIN,
+                     "Factorial is only defined for non-negative integers"),
+            "171!": (None, calculator.FACTORIAL_TOO_LARGE,
+                     "Number too large for factorial calculation"),
+            "5 +": (None, calculator.INVALID_INPUT, "Invalid input: Incomplete expression"),
+            "m+ 1 / 0": (None, calculator.DIVISION_BY_ZERO, "Division by zero is not allowed"),
+        }
+        for expression, status in cases.items():
+            self.assertEqual(self.cli.try_parse_expression(expression), status, expression)
+        self.assertEqual(self.cli.calculator.memory, 4.0)
+        code, message = self.cli.try_parse_expression("10 ^ 400")[1:]
+        self.assertEqual(code, calculator.POWER_OVERFLOW)
+        self.assertTrue(message.startswith("Power operation failed"))
+    
+    def test_edge_inputs_do_not_raise(self):
+        """Test that zero to a negative power, complex powers and infinities give statuses."""
+        cases = {
+            "0 ^ -1": calculator.DIVISION_BY_ZERO,
+            "(-8) ^ (1/3)": calculator.POWER_DOMAIN,
+            "sin 1e999": calculator.DOMAIN_ERROR,
+            "tan 1e999 deg": calculator.DOMAIN_ERROR,
+            "1e999!": calculator.DOMAIN_ERROR,
+            "gcd(2.5, 3)": calculator.DOMAIN_ERROR,
+        }
+        metered = CalculatorCLI(interactive=False, calculator=Calculator(metrics=True))
+        for expression, code in cases.items():
+            # Metrics count the error but do not change how it is reported
+            for cli in (self.cli, metered):
+                self.assertEqual(cli.try_parse_expression(expression),
+                                 (None, code, calculator.ERROR_MESSAGES[code]), expression)
+            with self.assertRaises(CalculatorError) as context:
+                self.cli.calculator.compile(expression)()
+            self.assertEqual(context.exception.code, code, expression)
+        operations = metered.calculator.metrics.snapshot()['operations']
+        self.assertEqual(operations['power']['errors'],
+                         {calculator.ERROR_MESSAGES[calculator.DIVISION_BY_ZERO]: 1,
+                          calculator.ERROR_MESSAGES[calculator.POWER_DOMAIN]: 1})
+        self.assertEqual(operations['gcd']['calls'], 1)
+    
+    def test_raising_wrapper(self):
+        """Test that the raising API reports the same taxonomy."""
+        with self.assertRaises(CalculatorError) as context:
+            self.cli.parse_expression("sqrt -1")
+        self.assertEqual(context.exception.code, calculator.NEGATIVE_SQUARE_ROOT)
+        with self.assertRaises(ValueError) as context:
+            self.cli.parse_expression("foo 3")
+        self.assertEqual(str(context.exception), "Unknown function: foo")
+        with self.assertRaises(CalculatorError) as context:
+            Calculator().divide(1, 0)
+        self.assertEqual(context.exception.code, calculator.DIVISION_BY_ZERO)
+    
+    def test_invalid_expressions_are_cached(self):
+        """Test that a repeated malformed line is compiled once."""
+        for _ in range(3):
+            self.assertEqual(self.cli.try_parse_expression("2 $ 3")[1], calculator.INVALID_INPUT)
+        info = calculator_expr.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 1))
+    
+    def test_checks_keep_history_clean(self):
+        """Test that rejected operations never reach the calculator."""
+        self.cli.try_parse_expression("(2 + 2) / 0")
+        self.assertEqual(self.cli.calculator.get_history(), ["2.0 + 2.0 = 4.0"])
+
+
+class TestVariables(unittest.TestCase):
+    """Test cases for variables and incremental recomputation."""
+    
+    def setUp(self):
+        """Set up a CLI and a standalone variable graph."""
+        self.cli = CalculatorCLI(interactive=False)
+        self.graph = VariableGraph(Calculator(history_capacity=0))
+    
+    def test_assignment_and_use(self):
+        """Test defining variables and reading them in expressions."""
+        self.assertEqual(self.cli.parse_expression("x = 3"), 3.0)
+        self.assertEqual(self.cli.parse_expression("y = x ^ 2 + 1"), 10.0)
+        self.assertEqual(self.cli.parse_expression("y * 2"), 20.0)
+        self.assertEqual(self.cli.parse_expression("x=4"), 4.0)
+        self.assertEqual(self.cli.parse_expression("y"), 17.0)
+        self.assertEqual(self.cli.try_parse_expression("z + 1"),
+                         (None, calculator.UNDEFINED_VARIABLE, "Undefined variable: z"))
+        with self.assertRaises(ValueError):
+            self.cli.parse_expression("sqrt = 2")
+        with self.assertRaises(ValueError) as context:
+            self.cli.parse_expression("foo 3")
+        self.assertEqual(str(context.exception), "Unknown function: foo")
+    
+    def test_command_words_in_expressions(self):
+        """Test that a command word followed by an operator is parsed as an expression."""
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(self.cli.parse_input("sum 1 2 3"), 6.0)
+            self.assertEqual(self.cli.parse_input("sum -1 2"), 1.0)
+            self.assertIsNone(self.cli.parse_input("sum + 1"))
+            self.assertIsNone(self.cli.parse_input("factor + 1"))
+            self.assertIsNone(self.cli.parse_input("history = 2"))
+        self.assertEqual(output.getvalue().splitlines(), [
+            "Error: Undefined variable: sum is a reserved name, not a variable",
+            "Error: Undefined variable: factor is a reserved name, not a variable",
+            "Invalid input: history is a reserved name"])
+        self.assertEqual(self.cli.try_parse_expression("x = mean * 2"),
+                         (None, calculator.INVALID_INPUT, "Invalid input: mean is a reserved name"))
+        self.assertIsNone(self.cli.variables.get('x'))
+    
+    def test_incremental_recalculation(self):
+        """Test that a change recomputes only the variables downstream of it."""
+        graph = self.graph
+        graph.define('v0', '1')
+        for i in range(1, 2000):
+            graph.define(f'v{i}', f'v{i - 1} + 1')
+        for i in range(100):
+            graph.define(f'w{i}', f'v1000 * {i}')
+        self.assertEqual(graph.values['v1999'], 2000.0)
+        self.assertEqual(graph.values['w3'], 3003.0)
+        self.assertEqual(len(graph.recalculate(['v1990'])), 10)
+        self.assertEqual(graph.define('v1000', '0'), 0.0)
+        self.assertEqual(graph.values['v1999'], 999.0)
+        self.assertEqual(graph.values['w3'], 0.0)
+        order = graph.recalculate(['v998'])
+        self.assertEqual(len(order), 2)
+        self.assertEqual(len(graph.recalculate()), 2100)
+    
+    def test_forward_references_and_errors(self):
+        """Test variables defined before their inputs and failing definitions."""
+        graph = self.graph
+        self.assertEqual(graph.try_define('total', 'price * count')[1], calculator.UNDEFINED_VARIABLE)
+        graph.define('price', '2.5')
+        graph.define('count', '4')
+        self.assertEqual(graph.values['total'], 10.0)
+        self.assertEqual(graph.try_define('count', '1 / 0')[1], calculator.DIVISION_BY_ZERO)
+        self.assertNotIn('total', graph.values)
+        self.assertEqual(graph.get('total').message,
+                         "Variable count has an error: Division by zero is not allowed")
+        graph.define('count', '2')
+        self.assertEqual(graph.values['total'], 5.0)
+    
+    def test_unexpected_exceptions_do_not_leave_stale_values(self):
+        """Test that a cell whose evaluation raises holds an error and its dependents follow."""
+        graph = self.graph
+        graph.define("x", "4")
+        graph.define("y", "sqrt x")
+        graph.define("z", "y * 2")
+        
+        def failing_square_root(number):
+            raise RuntimeError("backend failure")
+        
+        graph.calculator.square_root = failing_square_root
+        value, code, message = graph.try_define("x", "9")
+        self.assertEqual((value, code), (9.0, calculator.OK))
+        for name in ("y", "z"):
+            cell = graph.get(name)
+            self.assertIsNone(cell.value)
+            self.assertEqual(cell.code, calculator.CALCULATION_ERROR if name == "y" else
+                             calculator.UNDEFINED_VARIABLE)
+            self.assertNotIn(name, graph.values)
+        self.assertIn("backend failure", graph.get("y").message)
+        value, code, message = graph.try_define("w", "sqrt x + 1")
+        self.assertEqual((value, code), (None, calculator.CALCULATION_ERROR))
+        self.assertNotIn("w", graph.values)
+    
+    def test_cycles_are_rejected(self):
+        """Test that a definition closing a cycle leaves the graph unchanged."""
+        graph = self.graph
+        graph.define('a', '1')
+        graph.define('b', 'a + 1')
+        graph.define('c', 'b * 2')
+        for source in ('c + 1', 'a'):
+            value, code, message = graph.try_define('a', source)
+            self.assertEqual(code, calculator.CIRCULAR_DEFINITION)
+        self.assertEqual(graph.get('a').source, '1')
+        self.assertEqual(graph.dependencies('c'), ['b'])
+        self.assertEqual(graph.dependents('a'), ['b'])
+        graph.define('b', '5')
+        graph.define('a', 'c + 1')
+        self.assertEqual(graph.values['a'], 11.0)
+    
+    def test_cli_commands(self):
+        """Test the vars, deps and recalc commands."""
+        cli = CalculatorCLI()
+        cli.parse_input("x = 2")
+        cli.parse_input("y = x * 3")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            cli.parse_input("deps y")
+            cli.parse_input("deps x")
+            cli.parse_input("recalc x")
+            cli.parse_input("recalc")
+            cli.parse_input("recalc nope")
+            cli.parse_input("vars")
+        self.assertEqual(output.getvalue().splitlines(), [
+            "y = x * 3", "Depends on: x", "Used by: (nothing)",
+            "x = 2", "Depends on: (nothing)", "Used by: y",
+            "Recalculated 2 variables.", "Recalculated 2 variables.", "Unknown variable: nope",
+            "  x = 2  ->  2.0", "  y = x * 3  ->  6.0",
+        ])
+
+
+class TestCompiledFunctions(unittest.TestCase):
+    """Test cases for expressions compiled to Python functions."""
+    
+    def setUp(self):
+        """Set up a fresh calculator."""
+        self.calc = Calculator()
+    
+    def test_matches_interpreted_evaluation(self):
+        """Test compiled results and history against the bytecode interpreter."""
+        formulas = ["sqrt(x^2 + y^2)", "log(x, 2) * sin(y) + x / (y + 1)",
+                    "-x mod 3 + y! - cos y deg", "log10 x - ln y + tan(x) ^ 2"]
+        for formula in formulas:
+            function = self.calc.compile(formula, params=['x', 'y'])
+            for x, y in [(3, 4), (8.5, 5), (100, 1)]:
+                interpreter = Calculator()
+                expected = calculator_expr.compile_expression(formula).evaluate(
+                    interpreter, {'x': float(x), 'y': float(y)})
+                self.calc.clear_history()
+                self.assertAlmostEqual(function(x, y), expected, places=12)
+                self.assertEqual(self.calc.get_history(), interpreter.get_history())
+    
+    def test_domain_errors(self):
+        """Test that compiled functions raise the same errors as the methods."""
+        cases = [("1 / x", 0, calculator.DIVISION_BY_ZERO),
+                 ("5 mod x", 0, calculator.MODULO_BY_ZERO),
+                 ("sqrt(x - 1)", 0, calculator.NEGATIVE_SQUARE_ROOT),
+                 ("log x", -1, calculator.NON_POSITIVE_LOG),
+                 ("log 8 x", 1, calculator.INVALID_LOG_BASE),
+                 ("x!", 2.5, calculator.FACTORIAL_DOMAIN),
+                 ("x!", 171, calculator.FACTORIAL_TOO_LARGE),
+                 ("10 ^ x", 400, calculator.POWER_OVERFLOW)]
+        for formula, value, code in cases:
+            with self.assertRaises(CalculatorError) as context:
+                self.calc.compile(formula)(value)
+            self.assertEqual(context.exception.code, code, formula)
+        with self.assertRaises(CalculatorError):
+            self.calc.compile("x + 1 / 0")(1)
+        # Only operations that succeeded are recorded, as with the methods
+        self.assertEqual(self.calc.get_history(), ["0.0 - 1.0 = -1.0"])
+    
+    def test_params_and_history_free_mode(self):
+        """Test default parameters, parameter validation and history=False."""
+        function = self.calc.compile("b * 2 + a", history=False)
+        self.assertEqual(function.params, ('b', 'a'))
+        self.assertEqual(function(5, 1), 11.0)
+        self.assertEqual(self.calc.get_history(), [])
+        self.assertEqual(self.calc.compile("x + 1", params=['x', 'unused'])(1, 2), 2.0)
+        for formula, params in [("x + y", ['x']), ("x", ['x', 'x']), ("x", ['sqrt']), ("x +", None)]:
+            with self.assertRaises(ValueError):
+                self.calc.compile(formula, params)
+
+
+class TestSweep(unittest.TestCase):
+    """Test cases for tabulating expressions over a range."""
+    
+    def setUp(self):
+        """Set up a fresh calculator."""
+        self.calc = Calculator()
+    
+    def test_rows_and_errors(self):
+        """Test streamed rows, per-point errors and the single history entry."""
+        output = io.StringIO()
+        summary = self.calc.sweep("log x 2", -1, 2, 1, output=output, chunk_size=2)
+        self.assertEqual(output.getvalue().splitlines(), [
+            "-1.0\terror: Logarithm is only defined for positive numbers",
+            "0.0\terror: Logarithm is only defined for positive numbers",
+            "1.0\t0.0", "2.0\t1.0",
+        ])
+        self.assertEqual((summary.count, summary.errors), (4, 2))
+        self.assertEqual(self.calc.get_history(), ["sweep log x 2 for x = -1..2 step 1 = 2 ok, 2 errors"])
+    
+    def test_summary_statistics(self):
+        """Test extremes and the trapezoid integral across chunk boundaries."""
+        summary = self.calc.sweep("sin x", 0, math.pi, math.pi / 1000, chunk_size=64)
+        self.assertEqual(summary.count, 1001)
+        self.assertAlmostEqual(summary.integral, 2.0, places=5)
+        self.assertAlmostEqual(summary.max, 1.0)
+        self.assertAlmostEqual(summary.argmax, math.pi / 2)
+        self.assertAlmostEqual(summary.min, 0.0)
+        summary = self.calc.sweep("(x - a) ^ 2 + 1 / (x - 1)", 0, 3, 0.5, variables={'a': 2})
+        self.assertEqual(summary.errors, 1)
+        self.assertEqual((summary.min, summary.argmin), (0.25, 0.5))
+        summary = self.calc.sweep("x! + 2 * 3", 0, 4, 1, chunk_size=3)
+        self.assertEqual((summary.max, summary.argmax, summary.integral), (30.0, 4.0, 45.5))
+        with self.assertRaises(CalculatorError):
+            self.calc.sweep("x + y", 0, 1, 0.5)
+        with self.assertRaises(CalculatorError):
+            self.calc.sweep("x", 0, 1, 0)
+        with self.assertRaisesRegex(CalculatorError, "step has the wrong sign"):
+            self.calc.sweep("x", 0, 10, -1)
+    
+    def test_cli_command(self):
+        """Test the sweep command with summary and file output."""
+        cli = CalculatorCLI()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'Sweep.txt')
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                cli.parse_input("k = 3")
+                cli.parse_input("sweep k * x x from 0 to 1 step 0.5")
+                cli.parse_input("sweep x x from 0 to 2 step 1 summary")
+                cli.parse_input(f"sweep x ^ 2 x from 0 to 2 step 1 > {path}")
+                cli.parse_input("sweep x x from 0 to 10 step -1")
+                cli.parse_input("sweep x from 0 to 1")
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), "0.0\t0.0\n1.0\t1.0\n2.0\t4.0\n")
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[:3], ["0.0\t0.0", "0.5\t1.5", "1.0\t3.0"])
+        self.assertEqual(lines[3:8], ["points: 3", "errors: 0", "min: 0.0 at x = 0.0",
+                                      "max: 2.0 at x = 2.0", "integral: 2.0"])
+        self.assertEqual(lines[8], f"Wrote 3 points to {path}.")
+        self.assertEqual(lines[-2], "Error: Sweep range is empty: step has the wrong sign")
+        self.assertTrue(lines[-1].startswith("Usage: sweep"))
+
+
+class TestSweepFallback(TestSweep):
+    """Run the sweep tests against the point-by-point fallback."""
+    
+    def setUp(self):
+        """Disable NumPy for the duration of each test."""
+        super().setUp()
+        self._numpy = calculator_batch.np
+        calculator_batch.np = None
+    
+    def tearDown(self):
+        """Restore the NumPy module."""
+        calculator_batch.np = self._numpy
+
+
+class TestStreamingStatistics(unittest.TestCase):
+    """Test cases for single-pass statistics and the KLL sketch."""
+    
+    def setUp(self):
+        """Generate a reproducible sample."""
+        rng = random.Random(7)
+        self.values = [rng.gauss(100, 15) for _ in range(50000)]
+    
+    def test_moments_and_sum(self):
+        """Test Welford moments per value and per chunk, and compensated sums."""
+        stats = calculator_stats.collect(self.values)
+        self.assertAlmostEqual(stats.mean, statistics.fmean(self.values), places=9)
+        self.assertAlmostEqual(stats.variance, statistics.variance(self.values), places=6)
+        self.assertEqual((stats.min, stats.max), (min(self.values), max(self.values)))
+        single = StreamStats()
+        for value in self.values[:1000]:
+            single.add(value)
+        self.assertAlmostEqual(single.variance, statistics.variance(self.values[:1000]), places=9)
+        self.assertEqual(calculator_stats.collect([1e100, 1.0, -1e100, 1.0]).sum, 2.0)
+        with self.assertRaises(ValueError):
+            calculator_stats.collect([1.0, math.nan])
+    
+    def test_overflow_and_infinities(self):
+        """Test sums that leave float range and infinite inputs."""
+        self.assertEqual(calculator_stats.collect([1e308, 1e308]).sum, math.inf)
+        stats = calculator_stats.collect([1e308, 1e308, -1e308])
+        self.assertEqual(stats.sum, math.inf)
+        self.assertAlmostEqual(stats.mean, 1e308 / 3, delta=1e293)
+        self.assertEqual(stats.variance, math.inf)
+        self.assertTrue(math.isnan(calculator_stats.collect([math.inf, -math.inf]).sum))
+        self.assertEqual(calculator_stats.collect([math.inf, 1.0]).mean, math.inf)
+        single = StreamStats()
+        for value in (1e308, 1e308, -1e308):
+            single.add(value)
+        self.assertEqual(single.sum, math.inf)
+        self.assertAlmostEqual(single.mean, 1e308 / 3, delta=1e293)
+        
+        cli = CalculatorCLI(interactive=False)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(cli.parse_input("sum 1e308 1e308"), math.inf)
+            self.assertTrue(math.isnan(cli.parse_input("sum inf -inf")))
+            cli.parse_input("describe 1e308 1e308 -1e308")
+        self.assertIn("sum: inf", output.getvalue().splitlines())
+    
+    def test_quantiles_in_constant_memory(self):
+        """Test sketch accuracy and size on a stream much larger than k."""
+        stats = StreamStats(seed=1).update(self.values)
+        ordered = sorted(self.values)
+        for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+            rank = bisect.bisect_left(ordered, stats.quantile(q)) / len(ordered)
+            self.assertLess(abs(rank - q), 0.02, q)
+        self.assertLess(len(stats.sketch), 3 * calculator_stats.DEFAULT_K + 100)
+        self.assertEqual((stats.quantile(0), stats.quantile(1)), (ordered[0], ordered[-1]))
+    
+    def test_quantile_rank_error_bound(self):
+        """Test that sketch quantiles of a large uniform stream stay within 1.7 / k in rank."""
+        rng = random.Random(7)
+        values = [rng.random() for _ in range(200000)]
+        ordered = sorted(values)
+        bound = 1.7 / calculator_stats.DEFAULT_K
+        errors = []
+        for seed in range(4):
+            stats = StreamStats(seed=seed).update(values)
+            for q in [i / 20 for i in range(1, 20)]:
+                error = bisect.bisect_left(ordered, stats.quantile(q)) / len(ordered) - q
+                self.assertLess(abs(error), bound, (seed, q))
+                errors.append(error)
+        # Neither tail is favoured
+        self.assertLess(abs(statistics.mean(errors)), bound / 4)
+    
+    def test_merge(self):
+        """Test that merged partial states (through pickle) match one pass."""
+        whole = calculator_stats.collect(self.values)
+        parts = [pickle.loads(pickle.dumps(calculator_stats.collect(self.values[i:i + 12000])))
+                 for i in range(0, len(self.values), 12000)]
+        merged = StreamStats()
+        for part in parts:
+            merged.merge(part)
+        self.assertEqual(merged.count, whole.count)
+        self.assertAlmostEqual(merged.mean, whole.mean, places=9)
+        self.assertAlmostEqual(merged.variance, whole.variance, places=6)
+        self.assertAlmostEqual(merged.sum, whole.sum, places=6)
+        self.assertEqual(merged.sketch.count, len(self.values))
+        self.assertAlmostEqual(merged.median, whole.median, delta=1.0)
+    
+    def test_calculator_and_cli(self):
+        """Test aggregate/describe history entries and the CLI commands."""
+        calc = Calculator()
+        self.assertEqual(calc.aggregate('sum', [0.1] * 10), 1.0)
+        self.assertEqual(calc.get_last_result(), 1.0)
+        self.assertEqual(calc.describe(iter([1, 2, 3])).variance, 1.0)
+        self.assertEqual(calc.get_history(), ["sum[10] = 1.0", "describe[3] = mean 2.0, stdev 1.0"])
+        with self.assertRaises(CalculatorError):
+            calc.aggregate('mode', [1])
+        cli = CalculatorCLI()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'Numbers.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("# header\n1, 2, 3\n\n4 5\n")
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(cli.parse_input(f"mean @{path}"), 3.0)
+                self.assertEqual(cli.parse_input("var 1 2 3 4"), 1.6666666666666667)
+                self.assertEqual(cli.parse_input(f"quantile 1 @{path}"), 5.0)
+                self.assertIsNone(cli.parse_input("sum 1 x"))
+                self.assertIsNone(cli.parse_input("describe 2 4"))
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "Error: Invalid number on line 1: x")
+        self.assertEqual(lines[1:4], ["count: 2", "sum: 6.0", "mean: 3.0"])
+
+
+class TestMatrices(unittest.TestCase):
+    """Test cases for matrix operations with the NumPy backend."""
+    
+    def setUp(self):
+        """Set up a fresh calculator and a well-conditioned test matrix."""
+        self.calc = Calculator()
+        rng = random.Random(3)
+        self.a = [[rng.uniform(-1, 1) + (10 if i == j else 0) for j in range(70)] for i in range(70)]
+        self.b = [[rng.uniform(-1, 1) for _ in range(3)] for _ in range(70)]
+    
+    def assertMatrixAlmostEqual(self, actual, expected, places=9):
+        """Compare a matrix with nested lists element by element."""
+        actual = calculator_matrix.as_matrix(actual).tolist()
+        self.assertEqual(len(actual), len(expected))
+        for row, expected_row in zip(actual, expected):
+            self.assertEqual(len(row), len(expected_row))
+            for value, expected_value in zip(row, expected_row):
+                self.assertAlmostEqual(value, expected_value, places=places)
+    
+    def test_linear_algebra(self):
+        """Test multiply, transpose, solve, inverse and determinant."""
+        a, b = self.a, self.b
+        product = self.calc.matrix('matmul', a, b)
+        expected = [[math.fsum(a[i][k] * b[k][j] for k in range(70)) for j in range(3)] for i in range(70)]
+        self.assertMatrixAlmostEqual(product, expected)
+        self.assertMatrixAlmostEqual(self.calc.matrix('transpose', b), [list(column) for column in zip(*b)])
+        x = self.calc.matrix('solve', a, b)
+        self.assertMatrixAlmostEqual(self.calc.matrix('matmul', a, x), b)
+        identity = [[float(i == j) for j in range(70)] for i in range(70)]
+        self.assertMatrixAlmostEqual(self.calc.matrix('matmul', a, self.calc.matrix('inverse', a)), identity)
+        self.assertAlmostEqual(self.calc.matrix('determinant', [[4, 7], [2, 6]]), 10.0)
+        self.assertAlmostEqual(self.calc.get_last_result(), 10.0)
+        self.assertEqual(self.calc.matrix('determinant', [[1, 2], [2, 4]]), 0.0)
+    
+    def test_elementwise_and_errors(self):
+        """Test element-wise operations and shape, singular and domain errors."""
+        self.assertMatrixAlmostEqual(self.calc.matrix('divide', [[1, 2], [3, 4]], 2), [[0.5, 1.0], [1.5, 2.0]])
+        self.assertMatrixAlmostEqual(self.calc.matrix('power', [[1, 2]], [[3, 2]]), [[1.0, 4.0]])
+        with self.assertRaises(CalculatorError) as cm:
+            self.calc.matrix('divide', [[1, 2], [3, 4]], [[1, 1], [0, 1]])
+        self.assertEqual(cm.exception.code, calculator.DIVISION_BY_ZERO)
+        self.assertEqual(str(cm.exception), "Division by zero is not allowed (row 2, column 1)")
+        with self.assertRaises(CalculatorError) as cm:
+            self.calc.matrix('solve', [[1, 2], [2, 4]], [[1], [2]])
+        self.assertEqual(cm.exception.code, calculator.SINGULAR_MATRIX)
+        for operation, a, b in (('matmul', self.b, self.b), ('add', self.a, self.b),
+                                ('inverse', self.b, None), ('add', [[1, 2], [3]], 1)):
+            with self.assertRaises(CalculatorError) as cm:
+                self.calc.matrix(operation, a, b)
+            self.assertEqual(cm.exception.code, calculator.SHAPE_MISMATCH)
+        with self.assertRaises(CalculatorError):
+            self.calc.matrix('trace', self.a)
+    
+    def test_load_and_save(self):
+        """Test CSV and .npy round trips; .npy files are memory-mapped."""
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ('b.csv', 'b.npy'):
+                path = os.path.join(directory, name)
+                calculator_matrix.save(path, self.b)
+                loaded = calculator_matrix.load(path)
+                self.assertEqual(calculator_matrix.as_matrix(loaded).tolist(), self.b)
+            mapped = calculator_matrix.load(path)
+            if calculator_batch.np is not None:
+                self.assertIsInstance(mapped, calculator_batch.np.memmap)
+            else:
+                self.assertIsInstance(mapped.data, memoryview)
+            self.assertEqual(calculator_matrix.shape_text(self.calc.matrix('matmul', mapped, self.a[:3])), "70x70")
+            del mapped, loaded
+            path = os.path.join(directory, 'bad.csv')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("# header\n1, 2\n3\n")
+            with self.assertRaises(ValueError):
+                calculator_matrix.load(path)
+    
+    def test_history_and_cli(self):
+        """Test that history records shapes only, and the matrix commands."""
+        self.calc.matrix('matmul', self.a, self.b)
+        self.assertEqual(self.calc.get_history(), ["matrix matmul 70x70, 70x3 = 70x3"])
+        cli = CalculatorCLI()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            cli.parse_input("matrix A = [4 7; 2 6]")
+            cli.parse_input("matrix B = [1, 2]")
+            cli.parse_input("matrix C = matmul B A")
+            self.assertEqual(cli.parse_input("matrix det A"), cli.calculator.get_last_result())
+            cli.parse_input("matrix D = matmul A B")
+            cli.parse_input("matrix E = add A Y")
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[:3], ["A (2x2) =", "[4.0 7.0]", "[2.0 6.0]"])
+        self.assertEqual(lines[5:7], ["C (1x2) =", "[ 8.0 19.0]"])
+        self.assertEqual(lines[-2:], ["Error: Cannot multiply 2x2 by 1x2", "Error: Unknown matrix: Y"])
+        self.assertEqual(sorted(cli.matrices), ['A', 'B', 'C'])
+
+
+class TestMatrixFallback(TestMatrices):
+    """Run the matrix tests against the blocked pure-Python implementation."""
+    
+    def setUp(self):
+        """Disable NumPy for the duration of each test."""
+        super().setUp()
+        self._numpy = calculator_batch.np
+        calculator_batch.np = None
+    
+    def tearDown(self):
+        """Restore the NumPy module."""
+        calculator_batch.np = self._numpy
+
+
+class TestResultCache(unittest.TestCase):
+    """Test cases for the persistent result cache."""
+    
+    def setUp(self):
+        """Create a temporary directory for the cache database."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'results.db')
+    
+    def tearDown(self):
+        """Remove the cache database."""
+        self.directory.cleanup()
+    
+    def test_warm_start_skips_recomputation(self):
+        """Test that a second calculator reuses results keyed by the canonical expression."""
+        cache = ResultCache(self.path, min_time=0)
+        cold = CalculatorCLI(interactive=False, calculator=Calculator(result_cache=cache))
+        self.assertEqual(cold.parse_expression("sqrt(3^2 + 4^2)"), 5.0)
+        cold.parse_expression("x = 2")
+        self.assertEqual(cold.parse_expression("x * 10"), 20.0)
+        cache.close()
+        
+        warm = CalculatorCLI(interactive=False, calculator=Calculator(result_cache=self.path, metrics=True))
+        self.assertEqual(warm.parse_expression("sqrt ( 3 ^ 2+4^2 )"), 5.0)
+        self.assertEqual(warm.calculator.get_history(), ["sqrt ( 3 ^ 2+4^2 ) = 5.0 (cached)"])
+        self.assertEqual(warm.calculator.get_last_result(), 5.0)
+        self.assertEqual(warm.calculator.metrics.operations['power'].calls, 0)
+        warm.parse_expression("x = 3")
+        self.assertEqual(warm.parse_expression("x * 10"), 30.0)
+        self.assertEqual(warm.calculator.metrics.operations['multiply'].calls, 1)
+        stats = warm.calculator.metrics.snapshot()['caches']['results']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertIn('calculator_cache_hit_ratio{cache="results"}', warm.calculator.metrics.to_prometheus())
+    
+    def test_errors_factorials_and_sweeps(self):
+        """Test cached errors, exact factorials and sweep summaries."""
+        calc = Calculator(result_cache=ResultCache(self.path, min_time=0))
+        cli = CalculatorCLI(interactive=False, calculator=calc)
+        self.assertEqual(cli.try_parse_expression("log(0)")[1], calculator.NON_POSITIVE_LOG)
+        self.assertEqual(cli.try_parse_expression("y + 1")[1], calculator.UNDEFINED_VARIABLE)
+        exact = calc.factorial(2000, exact=True)
+        summary = calc.sweep("x ^ 2", 0, 1, 0.25)
+        self.assertEqual(len(calc.result_cache), 3)
+        
+        warm = Calculator(result_cache=ResultCache(self.path))
+        with self.assertRaises(CalculatorError) as cm:
+            CalculatorCLI(interactive=False, calculator=warm).parse_expression("log 0")
+        self.assertEqual(cm.exception.code, calculator.NON_POSITIVE_LOG)
+        self.assertEqual(warm.factorial(2000, exact=True), exact)
+        self.assertEqual(warm.sweep("x^2", 0.0, 1.0, 0.25).to_dict(), summary.to_dict())
+        self.assertEqual(warm.result_cache.stats()['hits'], 3)
+    
+    def test_fast_results_are_not_stored(self):
+        """Test that results computed in under min_time are looked up but not written."""
+        calc = Calculator(result_cache=self.path)
+        cli = CalculatorCLI(interactive=False, calculator=calc)
+        self.assertEqual(cli.parse_expression("1 + 1"), 2.0)
+        self.assertEqual(cli.parse_expression("1 + 1"), 2.0)
+        calc.factorial(200, exact=True)
+        stats = calc.result_cache.stats()
+        self.assertEqual((stats['stores'], stats['misses'], stats['size']), (0, 3, 0))
+        calc.close()
+    
+    def test_eviction(self):
+        """Test age-based expiry and least-recently-used eviction over the limits."""
+        cache = ResultCache(self.path, max_entries=10)
+        for i in range(20):
+            cache.put(f"k{i}", float(i))
+        self.assertEqual(cache.evict(), 11)
+        self.assertEqual(len(cache), 9)
+        self.assertIsNone(cache.get("k10"))
+        self.assertEqual(cache.get("k19"), (19.0, calculator.OK, None))
+        cache.close()
+        
+        # Each entry takes 11 bytes (3 of key, 8 of value); opening evicts down to 45
+        cache = ResultCache(self.path, max_bytes=50)
+        self.assertEqual(len(cache), 4)
+        self.assertIsNotNone(cache.get("k19"))
+        cache.close()
+        
+        cache = ResultCache(self.path, max_age=0.05)
+        cache.put("fresh", 1.0)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("fresh"))
+        self.assertGreater(cache.evict(), 0)
+        self.assertEqual(len(cache), 0)
+    
+    def test_shared_between_processes(self):
+        """Test that worker processes and the command line share one cache."""
+        # Each nextprime takes a few milliseconds, over the default min_time; 2 ^ 2 does not
+        lines = [f"nextprime(10^60 * {i % 5 + 1})" for i in range(20)] + ["2 ^ 2"]
+        rows = list(evaluate_parallel(lines, workers=2, chunk_size=5, result_cache=self.path))
+        expected = [calculator_number_theory.next_prime(1e60 * k) for k in range(1, 6)]
+        self.assertEqual([row[2] for row in rows[:5]], expected)
+        self.assertEqual(rows[-1][2], 4.0)
+        self.assertEqual(len(ResultCache(self.path)), 5)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            self.assertEqual(calculator_cli.main(['--cache', self.path, '-e', 'nextprime(10^60*5)']), 0)
+        self.assertEqual(stdout.getvalue(), f"{expected[-1]}\n")
+        self.assertEqual(len(ResultCache(self.path)), 5)
+
+
+class TestPowerEngine(unittest.TestCase):
+    """Test cases for exact powers and modular exponentiation with NumPy."""
+    
+    def setUp(self):
+        """Set up a fresh calculator and random operands covering every branch."""
+        self.calc = Calculator()
+        rng = random.Random(5)
+        self.bases = [rng.randrange(-10 ** 12, 10 ** 12) for _ in range(300)]
+        self.exponents = [rng.randrange(2 ** 62) for _ in range(300)]
+        self.moduli = [rng.choice([1, -1, 0, rng.randrange(-2 ** 32 + 1, 2 ** 32)]) for _ in range(300)]
+    
+    def test_exact_power(self):
+        """Test exact integer powers beyond float range and the digit limit."""
+        self.assertEqual(self.calc.power(3, 1000, exact=True), 3 ** 1000)
+        self.assertEqual(self.calc.power(-2.0, 3, exact=True), -8)
+        self.assertEqual(self.calc.get_history()[-1], "-2 ^ 3 = -8")
+        self.assertEqual(self.calc.power(7, 100, exact=True), 7 ** 100)
+        self.assertEqual(self.calc.get_history()[-1], "7 ^ 100 = <85-digit integer>")
+        self.assertEqual(self.calc.get_last_result(), 7 ** 100)
+        with self.assertRaises(CalculatorError) as cm:
+            self.calc.power(10, 10 ** 7, exact=True)
+        self.assertEqual(cm.exception.code, calculator.POWER_OVERFLOW)
+        self.assertTrue(str(cm.exception).startswith(calculator.ERROR_MESSAGES[calculator.POWER_OVERFLOW] + ": "))
+        with self.assertRaises(CalculatorError) as cm:
+            self.calc.power(2, 0.5, exact=True)
+        self.assertEqual(cm.exception.code, calculator.POWER_DOMAIN)
+        with self.assertRaises(CalculatorError):
+            self.calc.power(10, 400)
+    
+    def test_powmod(self):
+        """Test modular powers, inverses and argument errors."""
+        m = 2 ** 127 - 1
+        self.assertEqual(self.calc.powmod(3, 10 ** 30, m), pow(3, 10 ** 30, m))
+        self.assertEqual(self.calc.powmod(3, -1, 7), 5)
+        self.assertEqual(self.calc.powmod(5, 3, -7), pow(5, 3, -7))
+        self.assertEqual(self.calc.get_history()[-1], "powmod(5, 3, -7) = -1")
+        for args, code in (((2, 3, 0), calculator.MODULO_BY_ZERO),
+                           ((2, -1, 4), calculator.POWER_DOMAIN),
+                           ((2.5, 2, 3), calculator.DOMAIN_ERROR),
+                           ((2, 3, 10 ** 2000), calculator.POWER_OVERFLOW)):
+            with self.assertRaises(CalculatorError) as cm:
+                self.calc.powmod(*args)
+            self.assertEqual(cm.exception.code, code)
+            self.assertTrue(str(cm.exception).startswith(calculator.ERROR_MESSAGES[code]))
+        self.assertEqual(self.calc.powmod(2, 3, 10 ** 2000 + 1, max_digits=None), 8)
+        cli = CalculatorCLI(interactive=False)
+        self.assertEqual(cli.parse_expression("powmod(3, 200, 1000007) + 1"), pow(3, 200, 1000007) + 1)
+        self.assertEqual(cli.try_parse_expression("powmod 2 3 0")[1], calculator.MODULO_BY_ZERO)
+        result = cli.parse_expression("powmod(3, 200, 1e18)")
+        self.assertEqual((type(result), result), (int, pow(3, 200, 10 ** 18)))
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(cli.parse_input("exact powmod 0x10 -1 1000000007"), pow(16, -1, 1000000007))
+            self.assertEqual(cli.parse_input("exact 2 ^ 200"), 2 ** 200)
+            self.assertIsNone(cli.parse_input("exact 3 ^ 20000"))
+        self.assertEqual(output.getvalue(), "<9543-digit integer>\n")
+    
+    def test_powmod_batch(self):
+        """Test element-wise modular powers against pow."""
+        result = self.calc.powmod_batch(self.bases, self.exponents, self.moduli)
+        for i, (b, e, m) in enumerate(zip(self.bases, self.exponents, self.moduli)):
+            if m == 0:
+                self.assertEqual(result.errors[i], calculator.MODULO_BY_ZERO)
+            else:
+                self.assertEqual(result.errors[i], calculator.OK)
+                self.assertEqual(result.values[i], pow(b, e, m))
+        self.assertEqual(self.calc.get_history()[-1],
+                         f"batch powmod[300] = {300 - result.error_count} ok, {result.error_count} errors")
+        # Big moduli and negative exponents take the per-element path
+        result = self.calc.powmod_batch([3, 2, 4.5], [-1, 10 ** 20, 2], [7, 2 ** 89 - 1, 5])
+        self.assertEqual(list(result.values), [5, pow(2, 10 ** 20, 2 ** 89 - 1), 0])
+        self.assertEqual(list(result.errors), [calculator.OK, calculator.OK, calculator.DOMAIN_ERROR])
+        with self.assertRaises(CalculatorError):
+            self.calc.powmod_batch([1, 2], [1, 2, 3], 5)
+
+
+class TestPowerEngineFallback(TestPowerEngine):
+    """Run the power engine tests without NumPy."""
+    
+    def setUp(self):
+        """Disable NumPy for the duration of each test."""
+        super().setUp()
+        self._numpy = calculator_batch.np
+        calculator_batch.np = None
+    
+    def tearDown(self):
+        """Restore the NumPy module."""
+        calculator_batch.np = self._numpy
+
+
+class TestNumberTheory(unittest.TestCase):
+    """Test cases for primality, factorization, gcd/lcm and the prime sieve."""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Find the primes below 200000 by trial division."""
+        cls.primes = [n for n in range(2, 200000) if all(n % p for p in range(2, math.isqrt(n) + 1))]
+    
+    def setUp(self):
+        """Set up a fresh calculator."""
+        self.calc = Calculator()
+    
+    def test_primality_and_next_prime(self):
+        """Test Miller-Rabin and next_prime against trial division and known primes."""
+        primes = set(self.primes)
+        for n in range(-2, 5000):
+            self.assertEqual(self.calc.is_prime(n), n in primes, n)
+        # Strong pseudoprimes to several bases, and primes around 2**64
+        for n in (3215031751, 3825123056546413051, 318665857834031151167461):
+            self.assertFalse(self.calc.is_prime(n))
+        self.assertTrue(self.calc.is_prime(2 ** 64 - 59))
+        self.assertTrue(self.calc.is_prime(2 ** 127 - 1))
+        self.assertEqual(self.calc.next_prime(2 ** 64), 2 ** 64 + 13)
+        self.assertEqual(self.calc.next_prime(-5), 2)
+        self.assertEqual([self.calc.next_prime(p) for p in self.primes[:-1]], self.primes[1:])
+        self.assertEqual(self.calc.get_history()[-1], f"nextprime({self.primes[-2]}) = {self.primes[-1]}")
+        with self.assertRaises(CalculatorError) as cm:
+            self.calc.is_prime(2.5)
+        self.assertEqual(cm.exception.code, calculator.DOMAIN_ERROR)
+        self.assertEqual(str(cm.exception), "Argument outside the domain of the operation: "
+                                            "primality is only defined for integers")
+    
+    def test_factorize_gcd_lcm(self):
+        """Test factorization with trial division and Pollard rho, and gcd/lcm."""
+        for n in (1, 2, 360, 2 ** 64 - 1, (2 ** 31 - 1) * (2 ** 61 - 1), 1000000007 ** 3 * 12):
+            factors = self.calc.factorize(n)
+            self.assertEqual(math.prod(p ** e for p, e in factors.items()), n)
+            self.assertEqual(list(factors), sorted(factors))
+            self.assertTrue(all(self.calc.is_prime(p) for p in factors))
+        self.assertEqual(self.calc.factorize(360), {2: 3, 3: 2, 5: 1})
+        self.assertIn("factor(360) = 2^3 × 3^2 × 5", self.calc.get_history())
+        with self.assertRaises(CalculatorError):
+            self.calc.factorize(0)
+        self.assertEqual(self.calc.gcd(12, 18, 30), 6)
+        self.assertEqual(self.calc.lcm(4, 6, 10), 60)
+        self.assertEqual(self.calc.lcm(0, 5), 0)
+        self.assertEqual(self.calc.get_last_result(), 0)
+        cli = CalculatorCLI(interactive=False)
+        self.assertEqual(cli.parse_expression("gcd(12, 18) + lcm(3, 4) + isprime 97"), 19.0)
+        self.assertEqual(cli.try_parse_expression("nextprime 2.5")[1], calculator.DOMAIN_ERROR)
+        for expression, expected in (("nextprime 1e20", 10 ** 20 + 39),
+                                     ("lcm(2^60, 3^30)", 2 ** 60 * 3 ** 30)):
+            result = cli.parse_expression(expression)
+            self.assertEqual((type(result), result), (int, expected), expression)
+        self.assertEqual(cli.try_parse_expression("sin lcm(nextprime 1e300, nextprime 1e299)")[1],
+                         calculator.CALCULATION_ERROR)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            cli.parse_input("factor 0xffffffffffffffff")
+            cli.parse_input("primes 90 110")
+            self.assertEqual(cli.parse_input(f"exact gcd {2 ** 70} 6**20"), 2 ** 20)
+        self.assertEqual(output.getvalue().splitlines(), [
+            "18446744073709551615 = 3 × 5 × 17 × 257 × 641 × 65537 × 6700417",
+            "97 101 103 107 109", "5 primes in [90, 110)"])
+    
+    def test_segmented_sieve(self):
+        """Test range counts and listings across segments, warm-up and the memory bound."""
+        sieve = calculator_number_theory.PrimeSieve(max_segments=2)
+        span = calculator_number_theory.SEGMENT_SPAN
+        self.assertEqual(list(sieve.primes(0, 200000)), self.primes)
+        low = [p for p in self.primes if p < 1000]
+        for start, stop in ((0, 3), (3, 4), (1, 2), (100, 200), (997, 998)):
+            expected = [p for p in low if start <= p < stop]
+            self.assertEqual(list(sieve.primes(start, stop)), expected)
+            self.assertEqual(sieve.count(start, stop), len(expected))
+        # pi(3 * 2**20) = 226549 spans three segments, more than the cache holds
+        self.assertEqual(sieve.count(0, 3 * span), 226549)
+        self.assertEqual(len(sieve), 2)
+        self.assertEqual(self.calc.prime_count(10 ** 9, 10 ** 9 + 10 ** 6), 48155)
+        with self.assertRaises(CalculatorError):
+            sieve.count(0, sieve.limit + 1)
+        # Queries in an uncached segment switch to the bitset after WARM_QUERIES
+        sieve = calculator_number_theory.PrimeSieve()
+        warm = calculator_number_theory.WARM_QUERIES
+        base = 10 ** 9 + 1
+        for n in range(base, base + 2 * (warm - 1), 2):
+            self.assertIsNone(sieve.is_prime(n))
+        self.assertEqual(len(sieve), 0)
+        for n in range(base, base + 2000):
+            self.assertEqual(sieve.is_prime(n), calculator_number_theory.is_prime(n))
+            self.assertEqual(sieve.next_prime(n), calculator_number_theory.next_prime(n))
+        self.assertEqual(sieve.sieved, 1)
+
+
+class TestOneShotMode(unittest.TestCase):
+    """Test cases for one-shot evaluation from the command line."""
+    
+    def run_main(self, argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            status = calculator_cli.main(argv)
+        return status, stdout.getvalue(), stderr.getvalue()
+    
+    def test_positional_and_eval(self):
+        """Test positional expressions and repeated -e options."""
+        self.assertEqual(self.run_main(['5', '+', '3']), (0, "8.0\n", ""))
+        self.assertEqual(self.run_main(['-2', '^', '2']), (0, "-4.0\n", ""))
+        self.assertEqual(self.run_main(['-e', 'sqrt 16', '--eval', '2 ^ 10']),
+                         (0, "4.0\n1024.0\n", ""))
+        status, output, errors = self.run_main(['-e', '1 / 0', '-e', '1 + 1'])
+        self.assertEqual((status, output), (1, "2.0\n"))
+        self.assertEqual(errors, "Error: Division by zero is not allowed\n")
+    
+    def test_fast_path_detection(self):
+        """Test which command lines skip argparse."""
+        self.assertEqual(calculator_cli._one_shot_arguments(['1', '+', '2']), ['1 + 2'])
+        self.assertEqual(calculator_cli._one_shot_arguments(['-e', 'a', '-e', 'b']), ['a', 'b'])
+        self.assertIsNone(calculator_cli._one_shot_arguments([]))
+        self.assertIsNone(calculator_cli._one_shot_arguments(['-e', 'a', '--batch']))
+        self.assertIsNone(calculator_cli._one_shot_arguments(['--batch', 'file']))
+    
+    def test_minimal_imports(self):
+        """Test that one-shot evaluation imports no heavy modules."""
+        code = ("import sys; import calculator_cli; calculator_cli.main(['2', '+', '2']); "
+                "print(sorted({'typing', 're', 'argparse', 'json', 'csv', 'array'} & set(sys.modules)))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        self.assertEqual(result.stdout, "4.0\n[]\n")
+
+
+class TestBatchMode(unittest.TestCase):
+    """Test cases for the non-interactive batch mode of the CLI."""
+    
+    def run_batch(self, text, output_format='plain'):
+        cli = CalculatorCLI(interactive=False)
+        output = io.StringIO()
+        errors = cli.run_batch(io.StringIO(text), output, output_format)
+        return errors, output.getvalue()
+    
+    def test_plain_output(self):
+        """Test one result or error per expression, skipping blank lines."""
+        errors, output = self.run_batch("5 + 3\n\n# comment\n1 / 0\nms 2\n")
+        self.assertEqual(errors, 1)
+        self.assertEqual(output, "8.0\nerror: Division by zero is not allowed\n2.0\n")
+    
+    def test_csv_output(self):
+        """Test CSV output with line numbers."""
+        errors, output = self.run_batch("2 ^ 3\nsqrt -1\n", 'csv')
+        self.assertEqual(output.splitlines(), [
+            "line,expression,result,error",
+            "1,2 ^ 3,8.0,",
+            "2,sqrt -1,,Cannot calculate square root of negative number",
+        ])
+    
+    def test_json_output(self):
+        """Test JSON-lines output."""
+        errors, output = self.run_batch("1 + 1\nfoo\n", 'json')
+        rows = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(rows[0], {"line": 1, "expression": "1 + 1", "result": 2.0})
+        self.assertEqual(rows[1]["line"], 2)
+        self.assertIn("error", rows[1])
+
+
+class TestParallelEvaluation(unittest.TestCase):
+    """Test cases for the process-pool evaluator."""
+    
+    def test_matches_serial_order(self):
+        """Test that parallel rows match the serial loop in input order."""
+        lines = ["5 + 3", "1 / 0", "sqrt 16", "", "2 ^ 8", "foo"] * 5
+        serial = list(CalculatorCLI(interactive=False).evaluate_lines(lines))
+        parallel = list(evaluate_parallel(lines, workers=2, chunk_size=4))
+        self.assertEqual(parallel, serial)
+    
+    def test_history_merge(self):
+        """Test that worker history is merged in input order."""
+        calc = Calculator()
+        lines = ["1 + 1", "2 + 2", "3 + 3"]
+        list(evaluate_parallel(lines, workers=2, chunk_size=1,
+                               history='merge', calculator=calc))
+        self.assertEqual(calc.get_history(),
+                         ["1.0 + 1.0 = 2.0", "2.0 + 2.0 = 4.0", "3.0 + 3.0 = 6.0"])
+        
+        with self.assertRaises(ValueError):
+            list(evaluate_parallel(lines, history='merge'))
+    
+    def test_history_merge_keeps_timestamps(self):
+        """Test that merged records keep the time the worker evaluated them."""
+        with tempfile.TemporaryDirectory() as directory:
+            for calc in (Calculator(), Calculator(history_path=os.path.join(directory, 'h.log'))):
+                # Slow consumer: records would be stamped 0.2 s apart if restamped on merge
+                for _ in evaluate_parallel(["1 + 1", "2 + 2", "3 + 3"], workers=1, chunk_size=1,
+                                           history='merge', calculator=calc):
+                    time.sleep(0.2)
+                timestamps = [record[0] for record in calc.history.iter_timed()]
+                self.assertEqual(len(timestamps), 3)
+                self.assertLess(timestamps[-1] - timestamps[0], 0.2)
+                calc.close()
+    
+    def test_variables_do_not_leak_between_chunks(self):
+        """Test that a variable defined in one chunk is unknown in the next."""
+        lines = ["x = 5", "x + 1", "x + 1", "x + 1"]
+        rows = list(evaluate_parallel(lines, workers=1, chunk_size=2))
+        self.assertEqual(rows[1][2], 6.0)
+        self.assertIsNone(rows[2][2])
+        self.assertIsNone(rows[3][2])
+
+
+class TestCalculatorServer(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the asyncio line-protocol server."""
+    
+    async def asyncSetUp(self):
+        """Start a server on a free local port."""
+        self.server = CalculatorServer(port=0)
+        await self.server.start()
+    
+    async def asyncTearDown(self):
+        """Stop the server."""
+        self.server.close()
+    
+    async def request_lines(self, lines):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.server.port)
+        writer.write("".join(line + "\n" for line in lines).encode())
+        responses = [(await reader.readline()).decode().rstrip("\n") for _ in lines]
+        writer.close()
+        return responses
+    
+    async def test_pipelined_requests(self):
+        """Test that pipelined requests are answered in order."""
+        responses = await self.request_lines(["5 + 3", "1 / 0", ":ping", "sqrt 16"])
+        self.assertEqual(responses, [
+            "ok 8.0", "error Division by zero is not allowed", "ok pong", "ok 4.0"])
+    
+    async def test_control_messages_need_the_prefix(self):
+        """Test that control words without the prefix are evaluated as expressions."""
+        responses = await self.request_lines(["quit", "session alice", ":nope", "1 + 1"])
+        self.assertTrue(responses[0].startswith("error Undefined variable"))
+        self.assertTrue(responses[1].startswith("error Invalid input"))
+        self.assertEqual(responses[2:], ["error Unknown control message: :nope", "ok 2.0"])
+        self.assertEqual(len(self.server.sessions), 0)
+    
+    async def test_sessions_keep_state(self):
+        """Test that memory persists per session across connections."""
+        await self.request_lines([":session alice", "ms 42", ":session bob", "ms 1"])
+        responses = await self.request_lines([":session alice", "m+ 0"])
+        self.assertEqual(responses, ["ok session alice", "ok 42.0"])
+        self.assertEqual(len(self.server.sessions), 2)
+    
+    async def test_anonymous_connections_do_not_evict_sessions(self):
+        """Test that connections without a session keep their state outside the store."""
+        self.server.sessions.max_sessions = 2
+        await self.request_lines([":session alice", "ms 42"])
+        for i in range(5):
+            self.assertEqual(await self.request_lines([f"ms {i}", "m+ 0"]),
+                             [f"ok {float(i)}", f"ok {float(i)}"])
+        self.assertEqual(len(self.server.sessions), 1)
+        self.assertEqual(await self.request_lines([":session alice", "m+ 0"]),
+                         ["ok session alice", "ok 42.0"])
+
+
+class TestCalculatorDaemon(unittest.TestCase):
+    """Test cases for the Unix socket daemon and its thin client."""
+    
+    def setUp(self):
+        """Use a private socket path in a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'calc.sock')
+    
+    def tearDown(self):
+        """Stop the daemon if it is still running."""
+        try:
+            calculator_client.request([':shutdown'], self.path, spawn=False)
+        except OSError:
+            pass
+        self.directory.cleanup()
+    
+    def test_state_persists_across_calls(self):
+        """Test that the client spawns a daemon that keeps memory between calls."""
+        self.assertEqual(calculator_client.request(['ms 40', '5 + 3'], self.path),
+                         ["ok 40.0", "ok 8.0"])
+        self.assertTrue(os.path.exists(self.path + '.pid'))
+        self.assertEqual(calculator_client.request(['m+ 2', 'mr', '1 / 0'], self.path, spawn=False),
+                         ["ok 42.0", "ok 42.0", "error Division by zero is not allowed"])
+    
+    def test_control_words_are_expressions(self):
+        """Test that 'calc.py --daemon quit' or 'shutdown' cannot end the session or daemon."""
+        responses = calculator_client.request(['quit', 'shutdown', 'exit', '2 + 2'], self.path)
+        self.assertTrue(all(response.startswith("error ") for response in responses[:3]))
+        self.assertEqual(responses[3], "ok 4.0")
+        self.assertEqual(calculator_client.request([':ping'], self.path, spawn=False), ["ok pong"])
+    
+    def test_single_daemon_per_socket(self):
+        """Test that the lock file keeps a second daemon from starting."""
+        calculator_client.spawn_daemon(self.path)
+        result = subprocess.run([sys.executable, 'calculator_daemon.py', '--socket', self.path],
+                                capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("already running", result.stderr)
+        self.assertEqual(calculator_client.request([':ping'], self.path, spawn=False), ["ok pong"])
+    
+    def test_idle_timeout(self):
+        """Test that an idle daemon exits and removes its socket and lock files."""
+        calculator_client.spawn_daemon(self.path, idle_timeout=0.2)
+        deadline = time.monotonic() + 5
+        while (os.path.exists(self.path) or os.path.exists(self.path + '.pid')) \
+                and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path + '.pid'))
+        with self.assertRaises(OSError):
+            calculator_client.request([':ping'], self.path, spawn=False)
+    
+    def test_partial_response_is_not_resent(self):
+        """Test that a connection dropped mid-request raises instead of resending."""
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.path)
+        listener.listen()
+        received = []
+        
+        def answer_once():
+            connection, _ = listener.accept()
+            received.append(connection.recv(1024))
+            connection.sendall(b"ok 1.0\n")
+            connection.close()
+        
+        thread = threading.Thread(target=answer_once)
+        thread.start()
+        with self.assertRaises(ConnectionError):
+            calculator_client.request(['1', 'm+ 2'], self.path)
+        thread.join()
+        listener.close()
+        os.unlink(self.path)
+        self.assertEqual(len(received), 1)
+        self.assertFalse(os.path.exists(self.path + '.pid'))
+    
+    def test_default_socket_directory_must_be_private(self):
+        """Test that a foreign or shared fallback socket directory is refused."""
+        saved = dict(os.environ)
+        self.addCleanup(lambda: (os.environ.clear(), os.environ.update(saved)))
+        os.environ['TMPDIR'] = self.directory.name
+        for name in ('CALCULATOR_SOCKET', 'XDG_RUNTIME_DIR'):
+            os.environ.pop(name, None)
+        path = calculator_client.default_socket_path()
+        directory = os.path.dirname(path)
+        self.assertEqual(os.lstat(directory).st_mode & 0o777, 0o700)
+        
+        os.chmod(directory, 0o755)
+        with self.assertRaises(PermissionError):
+            calculator_client.default_socket_path()
+        os.rmdir(directory)
+        os.symlink(self.directory.name, directory)
+        with self.assertRaises(PermissionError):
+            calculator_client.default_socket_path()
+        
+        os.environ['XDG_RUNTIME_DIR'] = self.directory.name
+        self.assertEqual(calculator_client.default_socket_path(),
+                         os.path.join(self.directory.name, 'calculator.sock'))
+
+
+class TestBenchmarkCompare(unittest.TestCase):
+    """Test cases for regression detection in the benchmark suite."""
+    
+    def test_compare_flags_regressions(self):
+        """Test that only slowdowns beyond the threshold are flagged."""
+        baseline = {'results': {
+            'op.add': {'ns_per_op': 100.0},
+            'op.sin': {'ns_per_op': 100.0},
+            'history.grow_10000': {'ns_per_op': 100.0, 'peak_bytes': 1000},
+        }}
+        current = {'results': {
+            'op.add': {'ns_per_op': 105.0},
+            'op.sin': {'ns_per_op': 150.0},
+            'history.grow_10000': {'ns_per_op': 90.0, 'peak_bytes': 2000},
+            'op.new': {'ns_per_op': 1.0},
+        }}
+        rows, regressions = benchmark.compare(baseline, current, threshold=0.10)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(regressions, ['op.sin.ns_per_op', 'history.grow_10000.peak_bytes'])
+
+
 class TestCalculatorIntegration(unittest.TestCase):
     """Integration tests for calculator operations."""
     